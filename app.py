@@ -10,7 +10,9 @@ from flask_swagger_ui import get_swaggerui_blueprint
 from dotenv import load_dotenv
 from utils.swagger import get_swagger_json  # Update the import path for swagger
 from routes.flight_routes import flight_bp
-from database import init_db
+from database import init_db, engine
+from utils.rate_limit import install_traffic_controls, pool_usage_for
+from utils.traffic import install_traffic_capture
 
 # Load environment variables from .env and force overwrite
 load_dotenv(override=True)
@@ -36,6 +38,12 @@ logging.info("Flask application is starting...")
 # Enable CORS for the app
 CORS(app)
 
+# Record sanitized traffic for replay when TRAFFIC_CAPTURE_PATH is set
+install_traffic_capture(flight_bp)
+
+# Rate limit and shed search traffic before it reaches the database
+install_traffic_controls(flight_bp, pool_usage=pool_usage_for(engine))
+
 # Register blueprints with BASE_URL
 app.register_blueprint(flight_bp, url_prefix=app.config["BASE_URL"])
 
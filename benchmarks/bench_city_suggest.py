@@ -0,0 +1,94 @@
+"""
+Benchmark of city autocomplete lookups against a large synthetic set of locations.
+
+Builds a ``CityIndex`` over generated multi-word city names with skewed popularity and
+times ``suggest`` for typed prefixes of one to six characters, compared with scanning every
+name the way a ``LIKE 'prefix%'`` query without an index would::
+
+    python -m benchmarks.bench_city_suggest --cities 100000 200000 --queries 20000
+"""
+
+import time
+import random
+import string
+import argparse
+from utils.city_index import CityIndex
+
+WORDS = ["san", "new", "port", "lake", "fort", "north", "saint", "east", "west", "mount"]
+
+def generate_weights(count, seed=7):
+    """
+    Return ``count`` distinct city names mapped to a Zipf-like reservation count.
+    """
+    rng = random.Random(seed)
+    weights = {}
+    while len(weights) < count:
+        name = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))).title()
+        if rng.random() < 0.3:
+            name = f"{rng.choice(WORDS).title()} {name}"  # Shared first words, like "San ..."
+        weights[name] = int(1000 / rng.paretovariate(1.2))
+    return weights
+
+def naive_suggest(weights, query, limit):
+    """
+    Scan every name for a matching word and sort the matches by popularity.
+    """
+    query = query.casefold()
+    matches = [city for city in weights
+               if any(word.startswith(query) for word in city.casefold().split())]
+    return sorted(matches, key=lambda city: (-weights[city], city))[:limit]
+
+def percentile(samples, fraction):
+    """
+    Return the ``fraction`` percentile of sorted ``samples``.
+    """
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+def run(count, queries, seed=7):
+    """
+    Print build time and lookup latency percentiles for ``count`` cities.
+    """
+    weights = generate_weights(count, seed)
+    started = time.perf_counter()
+    index = CityIndex(weights)
+    build = time.perf_counter() - started
+
+    rng = random.Random(seed + 1)
+    names = list(weights)
+    prefixes = []
+    for _ in range(queries):
+        word = rng.choice(rng.choice(names).split())
+        prefixes.append(word[:rng.randint(1, min(6, len(word)))])
+
+    latencies = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        index.suggest(prefix, 10)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    scan = prefixes[:20]
+    started = time.perf_counter()
+    for prefix in scan:
+        assert naive_suggest(weights, prefix, 10) == index.suggest(prefix, 10)
+    naive = (time.perf_counter() - started) / len(scan)
+
+    print(f"{count} cities: build {build:.2f}s, "
+          f"p50 {percentile(latencies, 0.5) * 1e6:.0f}us, "
+          f"p99 {percentile(latencies, 0.99) * 1e6:.0f}us, "
+          f"max {latencies[-1] * 1e6:.0f}us, "
+          f"full scan {naive * 1e3:.1f}ms")
+
+def main():
+    """
+    Parse arguments and run the benchmark for each city count.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cities", type=int, nargs="+", default=[100_000, 200_000])
+    parser.add_argument("--queries", type=int, default=20_000)
+    args = parser.parse_args()
+    for count in args.cities:
+        run(count, args.queries)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark of contended read-modify-write updates under optimistic concurrency control.
+
+Several threads add bags to the same reservation, each increment retried with
+``retry_on_conflict`` until its version check succeeds. Prints the update throughput and
+how many attempts conflicted::
+
+    python -m benchmarks.bench_concurrency --threads 1 4 8 --increments 50
+"""
+
+import os
+import time
+import logging
+import argparse
+import tempfile
+import threading
+from datetime import date, datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database.base import Base
+from models.models import Flight, Passenger, Reservation
+from utils.concurrency import ConflictStats, retry_on_conflict
+import utils.concurrency
+
+def build_session_factory(path):
+    """
+    Create a file-backed SQLite database holding one reservation with no bags.
+    """
+    engine = create_engine(f"sqlite:///{path}",
+                           connect_args={"check_same_thread": False, "timeout": 60})
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add(Flight(id=1, flight_number="BM1", operating_airlines="Bench Air",
+                      departure_city="AUS", arrival_city="NYC", date_of_departure=date(2024, 2, 5),
+                      estimated_departure_time=datetime(2024, 2, 5, 8, 0), price=100.0))
+        db.add(Passenger(id=1, first_name="Bench", last_name="User", email="bench@example.com"))
+        db.add(Reservation(id=1, passenger_id=1, flight_id=1, amount=100.0, number_of_bags=0))
+        db.commit()
+    return factory
+
+def run(threads, increments, directory, think_time=0.0005):
+    """
+    Print updates per second and conflict counts for ``threads`` concurrent writers.
+    """
+    factory = build_session_factory(os.path.join(directory, f"occ{threads}.db"))
+    utils.concurrency.stats = ConflictStats()
+
+    @retry_on_conflict(max_attempts=100, base_delay=0.001, conflict_response=lambda: False)
+    def add_bag():
+        with factory() as db:
+            reservation = db.get(Reservation, 1)
+            bags = reservation.number_of_bags
+            time.sleep(think_time)  # Widen the read-modify-write window
+            reservation.number_of_bags = bags + 1
+            db.commit()
+            return True
+
+    def worker():
+        for _ in range(increments):
+            add_bag()
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with factory() as db:
+        bags = db.get(Reservation, 1).number_of_bags
+    counters = utils.concurrency.stats
+    print(f"{threads} thread(s): {threads * increments / elapsed:8.0f} updates/s, "
+          f"{counters.conflicts} conflicts over {counters.attempts} attempts, "
+          f"{counters.exhausted} gave up, {bags}/{threads * increments} bags")
+
+def main():
+    """
+    Parse arguments and run the benchmark for each thread count.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--increments", type=int, default=50)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # One warning per conflict
+    with tempfile.TemporaryDirectory() as directory:
+        for threads in args.threads:
+            run(threads, args.increments, directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark of fare calendar month views against a large synthetic flight snapshot.
+
+Builds a ``FareSnapshot`` over randomly generated flights spread over a year and a set of
+routes, then times ``calendar`` for month views of random routes::
+
+    python -m benchmarks.bench_fare_calendar --flights 1000000 --routes 200 --queries 2000
+"""
+
+import time
+import random
+import argparse
+from datetime import date
+import numpy as np
+from utils.fare_analytics import FareSnapshot, month_bounds
+
+EPOCH = date(1970, 1, 1).toordinal()
+
+def percentile(samples, fraction):
+    """
+    Return the ``fraction`` percentile of sorted ``samples``.
+    """
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+def run(flights, route_count, queries, seed=3):
+    """
+    Print build time and month view latency percentiles for ``flights`` flights.
+    """
+    rng = np.random.default_rng(seed)
+    routes = [(f"C{i}", f"C{i + 1}") for i in range(route_count)]
+    first_day = date(2024, 1, 1).toordinal() - EPOCH
+    route_idx = rng.integers(0, route_count, flights)
+    days = rng.integers(first_day, first_day + 365, flights)
+    prices = rng.uniform(50, 900, flights)
+    started = time.perf_counter()
+    snapshot = FareSnapshot(routes, route_idx, days, prices)
+    build = time.perf_counter() - started
+
+    picker = random.Random(seed + 1)
+    latencies = []
+    for _ in range(queries):
+        departure, arrival = picker.choice(routes)
+        bounds = month_bounds(f"2024-{picker.randint(1, 12):02d}")
+        started = time.perf_counter()
+        snapshot.calendar(departure, arrival, *bounds)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    print(f"{flights} flights on {route_count} routes: build {build:.2f}s, "
+          f"p50 {percentile(latencies, 0.5) * 1e3:.2f}ms, "
+          f"p99 {percentile(latencies, 0.99) * 1e3:.2f}ms, "
+          f"max {latencies[-1] * 1e3:.2f}ms")
+
+def main():
+    """
+    Parse arguments and run the benchmark for each flight count.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--flights", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("--routes", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=2_000)
+    args = parser.parse_args()
+    for flights in args.flights:
+        run(flights, args.routes, args.queries)
+
+if __name__ == "__main__":
+    main()
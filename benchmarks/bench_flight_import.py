@@ -0,0 +1,79 @@
+"""
+Benchmark of the flight schedule import with a generated schedule file.
+
+Writes a CSV schedule of ``--rows`` flights (with a share of repeated and invalid rows) and
+imports it into a SQLite file twice: once into an empty table and once more, updating
+every flight::
+
+    python -m benchmarks.bench_flight_import --rows 1000000
+"""
+
+import os
+import time
+import random
+import argparse
+import tempfile
+from datetime import date, timedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from database.base import Base
+from database.sharding import ShardRouter
+from utils.flight_import import FIELDS, import_stream
+
+def write_schedule(path, rows, seed=11):
+    """
+    Write ``rows`` schedule lines; about 1% repeat an earlier flight and 0.1% are invalid.
+    """
+    rng = random.Random(seed)
+    cities = [f"C{i:03d}" for i in range(500)]
+    first_day = date(2025, 1, 1)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(",".join(FIELDS) + "\n")
+        for number in range(rows):
+            if number and rng.random() < 0.01:
+                number = rng.randrange(number)
+            day = first_day + timedelta(days=number // 5000)
+            departure, arrival = rng.sample(cities, 2)
+            price = "n/a" if rng.random() < 0.001 else f"{rng.uniform(50, 900):.2f}"
+            file.write(f"XX{number % 5000},Bench Air,{departure},{arrival},{day.isoformat()},"
+                       f"{rng.randrange(24):02d}:{rng.randrange(60):02d},{price}\n")
+
+def run(path, database_path, chunk_size):
+    """
+    Import the schedule and return the report.
+    """
+    engine = create_engine(f"sqlite:///{database_path}")
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(connection, _record):
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+
+    Base.metadata.create_all(engine)
+    router = ShardRouter([sessionmaker(bind=engine)])
+    with open(path, "rb") as file:
+        return import_stream(file, "csv", router=router, chunk_size=chunk_size)
+
+def main():
+    """
+    Parse arguments and print the import throughput.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=5_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        schedule = os.path.join(directory, "schedule.csv")
+        started = time.perf_counter()
+        write_schedule(schedule, args.rows)
+        print(f"Generated {args.rows} rows in {time.perf_counter() - started:.1f}s")
+        database_path = os.path.join(directory, "flights.db")
+        for label in ("insert", "update"):
+            summary = run(schedule, database_path, args.chunk_size).as_dict()
+            print(f"{label}: {summary['rows']} rows, {summary['imported']} flights, "
+                  f"{summary['duplicates']} duplicates, {summary['rejected']} rejected "
+                  f"in {summary['seconds']:.1f}s ({summary['rows_per_second']} rows/s)")
+
+if __name__ == "__main__":
+    main()
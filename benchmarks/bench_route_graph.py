@@ -0,0 +1,76 @@
+"""
+Benchmark of multi-leg connection searches against a large synthetic flight schedule.
+
+Builds a ``RouteGraph`` over randomly generated flights between a set of cities spread over
+ten days, then times ``search`` for random origin and destination pairs::
+
+    python -m benchmarks.bench_route_graph --flights 200000 --cities 300 --queries 200
+"""
+
+import time
+import random
+import argparse
+from datetime import date, datetime, timedelta
+from utils.route_graph import Leg, RouteGraph
+
+def generate_legs(count, cities, seed=7):
+    """
+    Return ``count`` random two-hour legs between ``cities`` departing over ten days.
+    """
+    rng = random.Random(seed)
+    legs = []
+    for flight_id in range(count):
+        origin, destination = rng.sample(cities, 2)
+        departure = datetime(2024, 2, 1) + timedelta(minutes=rng.randrange(0, 10 * 24 * 60))
+        legs.append(Leg(flight_id, f"F{flight_id}", "Test Air", origin, destination,
+                        departure, departure + timedelta(hours=2), rng.uniform(50, 500)))
+    return legs
+
+def percentile(samples, fraction):
+    """
+    Return the ``fraction`` percentile of sorted ``samples``.
+    """
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+def run(flights, city_count, queries, max_legs, seed=7):
+    """
+    Print build time and search latency percentiles for ``flights`` flights.
+    """
+    cities = [f"C{i:03d}" for i in range(city_count)]
+    legs = generate_legs(flights, cities, seed)
+    started = time.perf_counter()
+    graph = RouteGraph()
+    graph.load(legs)
+    build = time.perf_counter() - started
+
+    rng = random.Random(seed + 1)
+    latencies = []
+    found = 0
+    for _ in range(queries):
+        origin, destination = rng.sample(cities, 2)
+        started = time.perf_counter()
+        found += bool(graph.search(origin, destination, date(2024, 2, 5), max_legs=max_legs))
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    print(f"{flights} flights between {city_count} cities: build {build:.2f}s, "
+          f"p50 {percentile(latencies, 0.5) * 1e3:.1f}ms, "
+          f"p99 {percentile(latencies, 0.99) * 1e3:.1f}ms, "
+          f"max {latencies[-1] * 1e3:.1f}ms, "
+          f"{found}/{queries} searches with connections")
+
+def main():
+    """
+    Parse arguments and run the benchmark for each flight count.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--flights", type=int, nargs="+", default=[200_000])
+    parser.add_argument("--cities", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--max-legs", type=int, default=3)
+    args = parser.parse_args()
+    for flights in args.flights:
+        run(flights, args.cities, args.queries, args.max_legs)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark of booking write throughput as the number of reservation shards grows.
+
+Each shard is a separate SQLite file. SQLite serializes writers per database file, like a
+single primary does, so spreading bookings over more files shows how throughput scales::
+
+    python -m benchmarks.bench_sharding --shards 1 2 4 --writers 8 --bookings 2000
+
+On fast storage the run is bound by Python CPU time instead of commit latency.
+``--commit-delay-ms`` holds each write transaction open for that long before committing,
+emulating the durable commit latency of a networked MySQL primary.
+"""
+
+import os
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from database.base import Base
+from database.sharding import ShardRouter
+from models.models import Flight, Passenger, Reservation
+
+FLIGHTS = 64
+
+def build_router(directory, shard_count):
+    """
+    Create ``shard_count`` SQLite databases with the schema and the flight reference data.
+    """
+    factories = []
+    for shard in range(shard_count):
+        engine = create_engine(
+            f"sqlite:///{os.path.join(directory, f'shard{shard_count}_{shard}.db')}",
+            connect_args={"check_same_thread": False, "timeout": 60},
+        )
+
+        @event.listens_for(engine, "connect")
+        def _pragmas(connection, _record):
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+
+        Base.metadata.create_all(engine)
+        factories.append(sessionmaker(bind=engine))
+    router = ShardRouter(factories, worker_id=0)
+    router.broadcast(lambda db: db.add_all([
+        Flight(id=flight_id, flight_number=f"BM{flight_id}", operating_airlines="Bench Air",
+               departure_city="AUS", arrival_city="NYC", date_of_departure=date(2024, 2, 5),
+               estimated_departure_time=datetime(2024, 2, 5, 8, 0), price=100.0)
+        for flight_id in range(1, FLIGHTS + 1)
+    ]))
+    return router
+
+def book(router, flight_id, commit_delay):
+    """
+    Write one passenger and reservation on the flight's shard, like ``create_reservation``.
+    """
+    shard = router.shard_for_flight(flight_id)
+    with router.session(shard) as db:
+        passenger_id = router.next_id(shard)
+        db.add(Passenger(id=passenger_id, first_name="Bench", last_name="User",
+                         email="bench@example.com"))
+        db.add(Reservation(id=router.next_id(shard), passenger_id=passenger_id,
+                           flight_id=flight_id, amount=100.0))
+        if commit_delay:
+            db.flush()  # Takes the shard's write lock
+            time.sleep(commit_delay)
+        db.commit()
+
+def run(shard_count, writers, bookings, directory, commit_delay=0.0):
+    """
+    Return bookings per second for ``shard_count`` shards.
+    """
+    router = build_router(directory, shard_count)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(lambda i: book(router, i % FLIGHTS + 1, commit_delay), range(bookings)))
+    return bookings / (time.perf_counter() - started)
+
+def main():
+    """
+    Parse arguments and print throughput per shard count.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--bookings", type=int, default=2000)
+    parser.add_argument("--commit-delay-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = None
+        for shard_count in args.shards:
+            throughput = run(shard_count, args.writers, args.bookings, directory,
+                             args.commit_delay_ms / 1000)
+            baseline = baseline or throughput
+            print(f"{shard_count} shard(s): {throughput:8.0f} bookings/s "
+                  f"({throughput / baseline:.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -2,4 +2,4 @@
 Database package initialization for the Flight Reservation Flask Application.
 """
 
-from .database import engine, SessionLocal, init_db, get_db
+from .database import engine, SessionLocal, router, init_db, get_db
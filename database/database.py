@@ -9,6 +9,7 @@ from dotenv import load_dotenv
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from utils.sql_utils import execute_sql_script  # Import the utility function
+from database.sharding import ShardRouter
 
 # Load environment variables
 load_dotenv()
@@ -37,16 +38,28 @@ if not DATABASE_URL:
 engine = create_engine(DATABASE_URL, echo=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Reservation shards: SHARD_DATABASE_URLS lists extra databases after the primary one.
+# Shard 0 is always the primary database, so a single-database setup is unchanged.
+shard_engines = [engine] + [
+    create_engine(url.strip(), echo=False)
+    for url in os.getenv("SHARD_DATABASE_URLS", "").split(",") if url.strip()
+]
+router = ShardRouter([SessionLocal] + [
+    sessionmaker(autocommit=False, autoflush=False, bind=shard_engine)
+    for shard_engine in shard_engines[1:]
+])
+
 def init_db():
     """
-    Initialize the database by executing the schema SQL script.
+    Initialize every shard database by executing the schema SQL script.
     """
     retries = 5  # Number of retries
     while retries > 0:
         try:
-            with engine.connect() as connection:
-                execute_sql_script(connection, "sql-scripts/1-schema.sql")  # Use utility function
-                break  # Exit the loop if successful
+            for shard_engine in shard_engines:
+                with shard_engine.connect() as connection:
+                    execute_sql_script(connection, "sql-scripts/1-schema.sql")
+            break  # Exit the loop if successful
         except Exception as e:
             logging.error("Database connection failed: %s. Retrying in 5 seconds...", e)
             retries -= 1
@@ -54,12 +67,34 @@ def init_db():
     if retries == 0:
         raise Exception("Failed to connect to the database after multiple retries.")
 
-def get_db():
+def get_db(shard=0):
     """
-    Dependency to get the database session.
+    Dependency to get the database session for a shard (the primary database by default).
     """
-    db = SessionLocal()  # Create a new database session
+    db = router.session(shard)  # Create a new database session
     try:
         yield db  # Provide the session to the caller
     finally:
         db.close()  # Ensure the session is closed after use
+
+def shard_for(flight_id=None, reservation_id=None):
+    """
+    Return the shard holding a flight's or a reservation's bookings.
+    Falls back to the primary database when the key is missing or unknown.
+    """
+    try:
+        if flight_id is not None:
+            return router.shard_for_flight(int(flight_id))
+        if reservation_id is not None:
+            shard = router.shard_for_reservation(int(reservation_id))
+            return 0 if shard is None else shard
+    except ValueError:
+        pass
+    return 0
+
+def new_id(shard):
+    """
+    Return a globally unique id for a row created on ``shard``, or ``None`` to let a
+    single database assign its own auto-increment id.
+    """
+    return router.next_id(shard) if router.sharded else None
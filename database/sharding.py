@@ -0,0 +1,206 @@
+"""
+Horizontal sharding of reservations by flight for the Flight Reservation Flask Application.
+
+``Reservation`` and ``Passenger`` rows live on the shard chosen by ``flight_id`` so the
+booking write rate grows with the number of databases. The ``flight`` table is reference
+data and is expected on every shard (see ``ShardRouter.broadcast``).
+
+Rows created on a sharded deployment get globally unique 63-bit ids from ``IdGenerator``:
+``1 (generated id marker) | milliseconds since EPOCH_MS (39 bits) | worker (8 bits) |
+shard (6 bits) | sequence (9 bits)``. The worker bits come from ``WORKER_ID``, which must
+be unique to each process that books, so workers never hand out the same id. The marker bit
+tells generated ids from auto-increment ones, so the shard can be read back from a
+generated reservation id; ids that predate sharding are found with a scatter-gather query
+across all shards.
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select
+
+EPOCH_MS = 1_704_067_200_000  # 2024-01-01T00:00:00Z
+GENERATED_ID_BIT = 1 << 62  # Auto-increment ids never get this large
+WORKER_BITS = 8
+SHARD_BITS = 6
+SEQUENCE_BITS = 9
+MAX_WORKERS = 1 << WORKER_BITS
+MAX_SHARDS = 1 << SHARD_BITS
+
+class IdGenerator:
+    """
+    Thread-safe generator of time-ordered, globally unique ids for one shard and worker.
+    """
+
+    def __init__(self, shard, worker=0, clock=time.time):
+        if not 0 <= shard < MAX_SHARDS:
+            raise ValueError(f"shard must be between 0 and {MAX_SHARDS - 1}")
+        if not 0 <= worker < MAX_WORKERS:
+            raise ValueError(f"worker must be between 0 and {MAX_WORKERS - 1}")
+        self.shard = shard
+        self.worker = worker
+        self._clock = clock
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        """
+        Return the next id. Waits for the next millisecond if the sequence is exhausted.
+        """
+        with self._lock:
+            now_ms = int(self._clock() * 1000) - EPOCH_MS
+            if now_ms < self._last_ms:
+                now_ms = self._last_ms  # Clock went backwards, keep ids increasing
+            if now_ms == self._last_ms:
+                self._sequence = (self._sequence + 1) & ((1 << SEQUENCE_BITS) - 1)
+                if self._sequence == 0:
+                    while now_ms <= self._last_ms:
+                        now_ms = int(self._clock() * 1000) - EPOCH_MS
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+            return GENERATED_ID_BIT \
+                | (now_ms << (WORKER_BITS + SHARD_BITS + SEQUENCE_BITS)) \
+                | (self.worker << (SHARD_BITS + SEQUENCE_BITS)) \
+                | (self.shard << SEQUENCE_BITS) | self._sequence
+
+def shard_from_id(row_id):
+    """
+    Return the shard encoded in an id from ``IdGenerator``, or ``None`` for legacy ids.
+    """
+    if not row_id & GENERATED_ID_BIT:
+        return None
+    return (row_id >> SEQUENCE_BITS) & (MAX_SHARDS - 1)
+
+def worker_id_from_env():
+    """
+    Return this process's ``WORKER_ID``. Raises ValueError when it is missing or invalid.
+    """
+    value = os.getenv("WORKER_ID", "").strip()
+    if not value.isdigit() or not 0 <= int(value) < MAX_WORKERS:
+        raise ValueError(f"WORKER_ID must be set to a number between 0 and {MAX_WORKERS - 1}, "
+                         "unique to each process, when reservations are sharded")
+    return int(value)
+
+class ShardMap:
+    """
+    Maps a flight to the shard holding its reservations.
+    """
+
+    def __init__(self, shard_count):
+        if not 0 < shard_count <= MAX_SHARDS:
+            raise ValueError(f"shard_count must be between 1 and {MAX_SHARDS}")
+        self.shard_count = shard_count
+
+    def shard_for_flight(self, flight_id):
+        """
+        Return the shard index for ``flight_id``.
+        """
+        return int(flight_id) % self.shard_count
+
+class ShardRouter:
+    """
+    Shard-aware session factory.
+
+    With a single shard it behaves exactly like the plain ``SessionLocal`` factory. With
+    several shards, ``worker_id`` defaults to ``WORKER_ID`` and the router refuses to be
+    created without a valid one, so a misconfigured worker fails at startup.
+    """
+
+    def __init__(self, session_factories, shard_map=None, worker_id=None):
+        self.session_factories = list(session_factories)
+        self.shard_map = shard_map or ShardMap(len(self.session_factories))
+        if worker_id is None and self.sharded:
+            worker_id = worker_id_from_env()  # Fail at startup, not at the first booking
+        self.worker_id = worker_id
+        self._id_generators = None
+        if worker_id is not None:
+            self._id_generators = self._create_id_generators(worker_id)
+        self._id_lock = threading.Lock()
+        self._executor = None
+
+    def _create_id_generators(self, worker):
+        return [IdGenerator(shard, worker) for shard in range(len(self.session_factories))]
+
+    @property
+    def sharded(self):
+        """
+        True when reservations are spread over more than one database.
+        """
+        return len(self.session_factories) > 1
+
+    def session(self, shard=0):
+        """
+        Open a session on ``shard``.
+        """
+        return self.session_factories[shard]()
+
+    def shard_for_flight(self, flight_id):
+        """
+        Return the shard index holding the reservations of ``flight_id``.
+        """
+        return self.shard_map.shard_for_flight(flight_id)
+
+    def next_id(self, shard):
+        """
+        Return a globally unique id for a row created on ``shard``.
+        """
+        if self._id_generators is None:  # A single database read WORKER_ID only if ids are needed
+            with self._id_lock:
+                if self._id_generators is None:
+                    self._id_generators = self._create_id_generators(worker_id_from_env())
+        return self._id_generators[shard].next_id()
+
+    def scatter(self, func):
+        """
+        Run ``func(session)`` on every shard in parallel and return the results in shard order.
+        """
+        if not self.sharded:
+            with self.session(0) as db:
+                return [func(db)]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=len(self.session_factories), thread_name_prefix="shard"
+            )
+
+        def run(shard):
+            with self.session(shard) as db:
+                return func(db)
+        return list(self._executor.map(run, range(len(self.session_factories))))
+
+    def broadcast(self, func):
+        """
+        Run ``func(session)`` and commit on every shard, e.g. to write flight reference data.
+        """
+        def run(db):
+            result = func(db)
+            db.commit()
+            return result
+        return self.scatter(run)
+
+    def shard_for_reservation(self, reservation_id):
+        """
+        Return the shard holding ``reservation_id``, or ``None`` if no shard has it.
+
+        The shard is decoded from the id when possible and checked with a primary key
+        lookup, since rows can be moved to another shard (see migration 004); otherwise all
+        shards are queried.
+        """
+        if not self.sharded:
+            return 0
+        from models.models import Reservation  # pylint: disable=import-outside-toplevel  # models imports database
+
+        def exists(db):
+            return db.execute(
+                select(Reservation.id).where(Reservation.id == reservation_id)
+            ).first() is not None
+
+        shard = shard_from_id(int(reservation_id))
+        if shard is not None and shard < len(self.session_factories):
+            with self.session(shard) as db:
+                if exists(db):
+                    return shard
+        found = self.scatter(exists)
+        return next((shard for shard, hit in enumerate(found) if hit), None)
@@ -2,7 +2,11 @@
 SQLAlchemy models for the Flight Reservation Flask Application.
 """
 
-from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Boolean, Float
+from sqlalchemy import (
+    Column, Integer, String, Date, DateTime, ForeignKey, Boolean, Float, Text, LargeBinary,
+    UniqueConstraint,
+)
+from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database.base import Base  # Import Base from the new base module
 
@@ -11,14 +15,20 @@ class Flight(Base):  # pylint: disable=too-few-public-methods
     Represents a flight in the system.
     """
     __tablename__ = "flight"
+    __table_args__ = (
+        # A flight number is operated once per day
+        UniqueConstraint("flight_number", "date_of_departure", name="uq_flight_number_date"),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    flight_number = Column(String, unique=True, nullable=False)
+    flight_number = Column(String(20), nullable=False)
     operating_airlines = Column(String(20), nullable=False)
     departure_city = Column(String(20), nullable=False)
     arrival_city = Column(String(20), nullable=False)
     date_of_departure = Column(Date, nullable=False)
     estimated_departure_time = Column(DateTime, nullable=False)
     price = Column(Float(10, 2), nullable=False, default=0.0)
+    version = Column(Integer, nullable=False, default=1)  # Optimistic concurrency control
+    __mapper_args__ = {"version_id_col": version}
 
 class Passenger(Base):  # pylint: disable=too-few-public-methods
     """
@@ -42,8 +52,102 @@ class Reservation(Base):  # pylint: disable=too-few-public-methods
     number_of_bags = Column(Integer, nullable=True)
     passenger_id = Column(Integer, ForeignKey("passenger.id", ondelete="CASCADE"), nullable=False)
     flight_id = Column(Integer, ForeignKey("flight.id"), nullable=False)
-    created = Column(DateTime, nullable=False)
+    created = Column(DateTime, nullable=False, server_default=func.now())
     card_number = Column(String(20), nullable=True)
     amount = Column(Float(10, 2), nullable=False, default=0.0)
+    version = Column(Integer, nullable=False, default=1)  # Optimistic concurrency control
     passenger = relationship("Passenger")
     flight = relationship("Flight")
+    __mapper_args__ = {"version_id_col": version}
+
+class OutboxMessage(Base):  # pylint: disable=too-few-public-methods
+    """
+    Represents a side effect to run after a transaction commits (transactional outbox).
+    """
+    __tablename__ = "outbox_message"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    topic = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON document
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False, index=True)
+    last_error = Column(Text, nullable=True)
+    created = Column(DateTime, nullable=False, server_default=func.now())
+
+class OutboxDeadLetter(Base):  # pylint: disable=too-few-public-methods
+    """
+    Represents an outbox message that failed too many times and was set aside.
+    """
+    __tablename__ = "outbox_dead_letter"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    message_id = Column(Integer, nullable=False)
+    topic = Column(String(100), nullable=False)
+    payload = Column(Text, nullable=False)
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(Text, nullable=True)
+    failed_at = Column(DateTime, nullable=False, server_default=func.now())
+
+class IdempotencyKey(Base):  # pylint: disable=too-few-public-methods
+    """
+    Represents the stored outcome of a request sent with an Idempotency-Key header.
+    """
+    __tablename__ = "idempotency_key"
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is running
+    body = Column(LargeBinary, nullable=True)  # zlib-compressed response body
+    content_type = Column(String(100), nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    locked_until = Column(DateTime, nullable=True)  # Lease of the request that is running
+
+class FlightStats(Base):  # pylint: disable=too-few-public-methods
+    """
+    Represents the booking counters of one flight, kept up to date with its reservations.
+    """
+    __tablename__ = "flight_stats"
+    flight_id = Column(Integer, primary_key=True)  # No foreign key, so flights can be archived
+    date_of_departure = Column(Date, nullable=False, index=True)
+    reservations = Column(Integer, nullable=False, default=0)
+    checked_in = Column(Integer, nullable=False, default=0)
+    bags = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float(12, 2), nullable=False, default=0.0)
+
+class DailyStats(Base):  # pylint: disable=too-few-public-methods
+    """
+    Represents the booking counters of all flights departing on one day.
+    """
+    __tablename__ = "daily_stats"
+    date_of_departure = Column(Date, primary_key=True)
+    reservations = Column(Integer, nullable=False, default=0)
+    checked_in = Column(Integer, nullable=False, default=0)
+    bags = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float(12, 2), nullable=False, default=0.0)
+
+class FlightArchive(Base):  # pylint: disable=too-few-public-methods
+    """
+    Represents a departed flight moved out of the ``flight`` table by the archiver.
+    """
+    __tablename__ = "flight_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    flight_number = Column(String(20), nullable=False)
+    operating_airlines = Column(String(20), nullable=False)
+    departure_city = Column(String(20), nullable=False)
+    arrival_city = Column(String(20), nullable=False)
+    date_of_departure = Column(Date, nullable=False, index=True)
+    estimated_departure_time = Column(DateTime, nullable=False)
+    price = Column(Float(10, 2), nullable=False)
+    archived_at = Column(DateTime, nullable=False, server_default=func.now())
+
+class ReservationArchive(Base):  # pylint: disable=too-few-public-methods
+    """
+    Represents a reservation of an archived flight.
+    """
+    __tablename__ = "reservation_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    checked_in = Column(Boolean, nullable=False)
+    number_of_bags = Column(Integer, nullable=True)
+    passenger_id = Column(Integer, nullable=False)
+    flight_id = Column(Integer, nullable=False, index=True)
+    created = Column(DateTime, nullable=True)
+    card_number = Column(String(20), nullable=True)
+    amount = Column(Float(10, 2), nullable=False)
+    archived_at = Column(DateTime, nullable=False, server_default=func.now())
@@ -2,16 +2,35 @@
 Routes for handling flight-related operations in the Flight Reservation Flask Application.
 """
 
+import os
+import csv
+import hmac
 import logging
 import random  # Import standard libraries first
-from datetime import datetime
-from flask import Blueprint, jsonify, request, render_template, current_app
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, jsonify, request, render_template, current_app
+from flask import stream_with_context
 from sqlalchemy.exc import SQLAlchemyError  # Import third-party modules first
-from database.database import get_db  # Import first-party modules
-from models.models import Passenger, Reservation, Flight  # Fix import path
+import database.database
+from database.database import get_db, shard_for, new_id  # Import first-party modules
+from models.models import Passenger, Reservation, Flight, FlightStats, DailyStats  # Fix import path
+from utils.route_graph import get_route_graph
+from utils.fare_analytics import get_fare_snapshot, month_bounds
+from utils.flight_catalog import get_flight_catalog
+from utils.outbox import enqueue
+from utils.concurrency import retry_on_conflict
+from utils.idempotency import idempotent
+from utils.booking_stats import stats_to_dict
+from utils.archiver import active_window_start, only_active
+from utils.flight_import import detect_format, import_stream
+from utils.city_index import MAX_SUGGESTIONS, get_city_index
+from utils.events import long_poll, publish_reservation_event, reservation_topic, sse_stream
 
 flight_bp = Blueprint("flights", __name__)
 
+# Flight.price is a Float(10, 2), which SQLAlchemy reads as a Decimal with 10 decimal places
+PRICE_DECIMALS = 10
+
 @flight_bp.context_processor
 def inject_base_url():
     """
@@ -19,23 +38,49 @@ def inject_base_url():
     """
     return {"BASE_URL": current_app.config["BASE_URL"]}
 
+def parse_departure_date(value):
+    """
+    Parse a departure date given as MM/DD/YYYY or YYYY-MM-DD.
+    Raises ValueError for any other format.
+    """
+    for fmt in ("%m/%d/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date: {value}")
+
+def flight_to_dict(flight):
+    """
+    Serialize a ``Flight`` or a catalog ``FlightView`` for a JSON response.
+    The price is the string the ``Decimal`` read from the database has always been serialized
+    as, also when it comes from the catalog's float column.
+    """
+    return {
+        "id": flight.id,
+        "flight_number": flight.flight_number,
+        "operating_airlines": flight.operating_airlines,
+        "departure_city": flight.departure_city,
+        "arrival_city": flight.arrival_city,
+        "date_of_departure": flight.date_of_departure,
+        "estimated_departure_time": flight.estimated_departure_time,
+        "price": f"{flight.price:.{PRICE_DECIMALS}f}"
+    }
+
 @flight_bp.route("/flights", methods=["GET"])
 def get_all_flights():
     """
-    Retrieve all flights from the database.
+    Retrieve all flights in the active window, from the shared flight catalog when one is
+    configured.
     """
     with next(get_db()) as db:  # Get a database session
-        flights = db.query(Flight).all()  # Perform a query
-        return jsonify([{
-            "id": f.id,
-            "flight_number": f.flight_number,
-            "operating_airlines": f.operating_airlines,
-            "departure_city": f.departure_city,
-            "arrival_city": f.arrival_city,
-            "date_of_departure": f.date_of_departure,
-            "estimated_departure_time": f.estimated_departure_time,
-            "price": f.price
-        } for f in flights])
+        catalog = get_flight_catalog(db)
+        if catalog is None:
+            flights = only_active(db.query(Flight)).all()  # Perform a query
+        else:
+            start = active_window_start()
+            flights = [f for f in catalog if start is None or f.date_of_departure >= start]
+        return jsonify([flight_to_dict(f) for f in flights])
 
 @flight_bp.route("/flights/<int:flight_id>", methods=["GET"])
 def get_flight_by_id(flight_id):
@@ -43,19 +88,37 @@ def get_flight_by_id(flight_id):
     Retrieve a specific flight by its ID.
     """
     with next(get_db()) as db:
-        flight = db.query(Flight).filter(Flight.id == flight_id).first()
+        catalog = get_flight_catalog(db)
+        if catalog is not None:
+            flight = catalog.get(flight_id)
+        else:
+            flight = db.query(Flight).filter(Flight.id == flight_id).first()
         if not flight:
             return jsonify({"error": "Flight not found"}), 404
-        return jsonify({
-            "id": flight.id,
-            "flight_number": flight.flight_number,
-            "operating_airlines": flight.operating_airlines,
-            "departure_city": flight.departure_city,
-            "arrival_city": flight.arrival_city,
-            "date_of_departure": flight.date_of_departure,
-            "estimated_departure_time": flight.estimated_departure_time,
-            "price": flight.price
-        })
+        return jsonify(flight_to_dict(flight))
+
+@flight_bp.route("/flights/import", methods=["POST"])
+def import_flights():
+    """
+    Import a flight schedule sent as the request body (CSV or JSON Lines).
+    Disabled unless IMPORT_TOKEN is set; callers send it as a bearer token.
+    """
+    token = os.getenv("IMPORT_TOKEN")
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not token or not hmac.compare_digest(supplied.encode(), token.encode()):
+        return jsonify({"error": "Schedule import is not allowed"}), 403
+    fmt = request.args.get("format") or detect_format("", request.content_type or "")
+    if fmt not in ("csv", "jsonl"):
+        return jsonify({"error": "format must be 'csv' or 'jsonl'"}), 400
+    logging.info("MYLOG: Received flight schedule import (%s)", fmt)
+    try:
+        report = import_stream(request.stream, fmt)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        return jsonify({"error": f"Unreadable schedule: {exc}"}), 400
+    except SQLAlchemyError as exc:
+        logging.error("MYLOG: Error importing flights: %s", exc)
+        return jsonify({"error": f"Failed to import flights: {exc}"}), 500
+    return jsonify(report.as_dict())
 
 @flight_bp.route("/findFlights", methods=["GET"])
 def render_find_flights_page():
@@ -78,22 +141,15 @@ def find_flights():
     # Reformat date_of_departure to YYYY-MM-DD
     if date_of_departure:
         try:
-            date_of_departure = datetime.strptime(
-                date_of_departure, "%m/%d/%Y"
-            ).strftime("%Y-%m-%d")
+            date_of_departure = parse_departure_date(date_of_departure).strftime("%Y-%m-%d")
         except ValueError:
-            try:
-                date_of_departure = datetime.strptime(
-                    date_of_departure, "%Y-%m-%d"
-                ).strftime("%Y-%m-%d")
-            except ValueError:
-                logging.error("MYLOG: Invalid date format for date_of_departure")
-                return jsonify(
-                    {"error": "Invalid date format. Use MM/DD/YYYY or YYYY-MM-DD."}
-                ), 400
+            logging.error("MYLOG: Invalid date format for date_of_departure")
+            return jsonify(
+                {"error": "Invalid date format. Use MM/DD/YYYY or YYYY-MM-DD."}
+            ), 400
 
     with next(get_db()) as db:
-        query = db.query(Flight)
+        query = only_active(db.query(Flight))
         if departure:
             query = query.filter(Flight.departure_city.ilike(f"%{departure}%"))
         if arrival:
@@ -103,6 +159,111 @@ def find_flights():
         flights = query.all()
         return render_template("findFlightsResults.html", flights=flights)
 
+@flight_bp.route("/cities/suggest", methods=["GET"])
+def suggest_cities():
+    """
+    Suggest city names starting with the typed prefix, most booked first.
+    """
+    query = request.args.get("q", "")
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), MAX_SUGGESTIONS)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if len(query) > 100:
+        return jsonify({"error": "q must be at most 100 characters"}), 400
+    index = get_city_index()
+    return jsonify([
+        {"city": city, "popularity": index.weights[city]} for city in index.suggest(query, limit)
+    ])
+
+@flight_bp.route("/connections", methods=["GET"])
+def find_connections():
+    """
+    Search direct and connecting flights using the precomputed route graph.
+    """
+    args = request.args
+    departure = args.get("departure")
+    arrival = args.get("arrival")
+    if not departure or not arrival or not args.get("date_of_departure"):
+        return jsonify({"error": "departure, arrival and date_of_departure are required"}), 400
+    try:
+        date_of_departure = parse_departure_date(args["date_of_departure"])
+        max_legs = int(args.get("max_legs", 3))
+        min_connection = timedelta(minutes=int(args.get("min_connection_minutes", 45)))
+    except ValueError:
+        return jsonify({"error": "Invalid date_of_departure, max_legs or min_connection_minutes"}), 400
+    if min_connection < timedelta(0):
+        return jsonify({"error": "min_connection_minutes must not be negative"}), 400
+    sort = args.get("sort", "price")
+    if sort not in ("price", "duration"):
+        return jsonify({"error": "sort must be 'price' or 'duration'"}), 400
+
+    with next(get_db()) as db:
+        graph = get_route_graph(db)
+    itineraries = graph.search(
+        departure, arrival, date_of_departure,
+        max_legs=min(max(max_legs, 1), 4), min_connection=min_connection, rank_by=sort,
+    )
+    return jsonify([itinerary.to_dict() for itinerary in itineraries])
+
+@flight_bp.route("/fares/calendar", methods=["GET"])
+def get_fare_calendar():
+    """
+    Return the cheapest and median fares per day for a route over one month.
+    """
+    departure = request.args.get("departure")
+    arrival = request.args.get("arrival")
+    month = request.args.get("month")
+    if not departure or not arrival or not month:
+        return jsonify({"error": "departure, arrival and month are required"}), 400
+    try:
+        first_day, last_day = month_bounds(month)
+        bins = int(request.args.get("bins", 10))
+    except ValueError:
+        return jsonify({"error": "Invalid month or bins. Use YYYY-MM for month."}), 400
+
+    with next(get_db()) as db:
+        snapshot = get_fare_snapshot(db)
+    return jsonify({
+        "departure_city": departure.upper(),
+        "arrival_city": arrival.upper(),
+        "month": month,
+        "days": snapshot.calendar(departure, arrival, first_day, last_day),
+        "summary": snapshot.route_summary(departure, arrival, bins=min(max(bins, 1), 100)),
+    })
+
+@flight_bp.route("/stats", methods=["GET"])
+def get_booking_stats():
+    """
+    Return the booking counters of the requested flights and departure days.
+    """
+    try:
+        flight_ids = [int(value) for value in request.args.getlist("flight_id")]
+        days = [datetime.strptime(value, "%Y-%m-%d").date() for value in request.args.getlist("date")]
+    except ValueError:
+        return jsonify({"error": "flight_id must be an integer and date use YYYY-MM-DD"}), 400
+    if not flight_ids and not days:
+        return jsonify({"error": "At least one flight_id or date is required"}), 400
+    if len(flight_ids) + len(days) > 100:
+        return jsonify({"error": "At most 100 flights and days per request"}), 400
+
+    flights = []
+    for flight_id in flight_ids:  # One primary key lookup on the flight's shard
+        with next(get_db(shard_for(flight_id=flight_id))) as db:
+            row = db.get(FlightStats, flight_id)
+            flights.append(dict(stats_to_dict(row), flight_id=flight_id))
+    daily = []
+    if days:  # Every shard holds the counters of its own flights for a day
+        partials = database.database.router.scatter(
+            lambda db: [stats_to_dict(db.get(DailyStats, day)) for day in days]
+        )
+        for position, day in enumerate(days):
+            totals = {name: sum(partial[position][name] for partial in partials)
+                      for name in ("reservations", "checked_in", "bags", "revenue")}
+            totals["revenue"] = round(totals["revenue"], 2)
+            daily.append(dict(totals, date=day.isoformat()))
+    return jsonify({"flights": flights, "days": daily})
+
 @flight_bp.route("/reserve", methods=["GET"])
 def render_reservation_page():
     """
@@ -117,15 +278,18 @@ def render_reservation_page():
         return render_template("reserve.html", flight=flight)
 
 @flight_bp.route("/createReservation", methods=["POST"])
+@idempotent()
 def create_reservation():
     """
     Create a new reservation for a flight.
     """
     logging.info("MYLOG: Received createReservation request")
     data = request.form
-    with next(get_db()) as db:
+    shard = shard_for(flight_id=data.get("flight_id"))
+    with next(get_db(shard)) as db:
         try:
             passenger = Passenger(
+                id=new_id(shard),
                 first_name=data["first_name"],
                 last_name=data["last_name"],
                 middle_name=data.get("middle_name"),
@@ -137,14 +301,20 @@ def create_reservation():
             db.refresh(passenger)
 
             reservation = Reservation(
+                id=new_id(shard),
                 flight_id=data["flight_id"],
                 passenger_id=passenger.id,
                 card_number=data["card_number"],
                 amount=data["amount"]
             )
             db.add(reservation)
+            db.flush()  # Assign the reservation id for the outbox message
+            enqueue(db, "reservation.created", {"reservation_id": reservation.id})
             db.commit()
             db.refresh(reservation)
+            publish_reservation_event(reservation.id, "reservation.created", {
+                "flight_id": reservation.flight_id, "amount": float(reservation.amount)
+            })
 
             return render_template(
                 "reservationConfirmation.html",
@@ -169,13 +339,14 @@ def process_payment(card_number, amount):
     return payment_success
 
 @flight_bp.route("/completeReservation", methods=["POST"])
+@idempotent()
 def complete_reservation():
     """
     Complete a reservation by processing payment.
     """
     data = request.form
     logging.info("MYLOG: Received completeReservation request")
-    with next(get_db()) as db:
+    with next(get_db(shard_for(reservation_id=data.get("reservation_id")))) as db:
         try:
             reservation = db.query(Reservation).filter(
                 Reservation.id == data["reservation_id"]
@@ -197,6 +368,9 @@ def complete_reservation():
                 return jsonify({"error": "Flight not found"}), 404
 
             if payment_success:
+                enqueue(db, "reservation.paid", {"reservation_id": reservation.id})
+                db.commit()
+                publish_reservation_event(reservation.id, "reservation.paid")
                 return render_template(
                     "reservationConfirmation.html",
                     reservation=reservation,
@@ -205,6 +379,7 @@ def complete_reservation():
                     success=True,
                     show_confirm_button=False,
                 )
+            publish_reservation_event(reservation.id, "reservation.payment_failed")
             return render_template(
                 "reserve.html",
                 flight=flight,
@@ -220,25 +395,79 @@ def render_check_in_page():
     Render the check-in page for a reservation.
     """
     reservation_id = request.args.get("reservation_id")
-    with next(get_db()) as db:
+    with next(get_db(shard_for(reservation_id=reservation_id))) as db:
         reservation = db.query(Reservation).filter(Reservation.id == reservation_id).first()
         if not reservation:
             return jsonify({"error": "Reservation not found"}), 404
         return render_template("checkIn.html", reservation=reservation)
 
 @flight_bp.route("/completeCheckIn", methods=["POST"])
+@retry_on_conflict()
 def complete_check_in():
     """
     Complete the check-in process for a reservation.
     """
     data = request.form
-    with next(get_db()) as db:
+    try:
+        number_of_bags = int(data["number_of_bags"])
+    except ValueError:
+        return jsonify({"error": "number_of_bags must be an integer"}), 400
+    with next(get_db(shard_for(reservation_id=data.get("reservation_id")))) as db:
         reservation = db.query(Reservation).filter(Reservation.id == data["reservation_id"]).first()
         if not reservation:
             return jsonify({"error": "Reservation not found"}), 404
 
-        reservation.number_of_bags = data["number_of_bags"]
+        reservation.number_of_bags = number_of_bags
         reservation.checked_in = True
+        enqueue(db, "reservation.checked_in", {
+            "reservation_id": reservation.id, "number_of_bags": number_of_bags
+        })
         db.commit()
+        publish_reservation_event(reservation.id, "reservation.checked_in", {
+            "number_of_bags": number_of_bags
+        })
 
         return render_template("finalDetails.html", reservation=reservation)
+
+def reservation_exists(reservation_id):
+    """
+    Check that a reservation exists, closing the session before a long-lived response.
+    """
+    with next(get_db(shard_for(reservation_id=reservation_id))) as db:
+        return db.get(Reservation, reservation_id) is not None
+
+@flight_bp.route("/reservations/<int:reservation_id>/events", methods=["GET"])
+def stream_reservation_events(reservation_id):
+    """
+    Stream status changes of a reservation as server-sent events.
+    """
+    if not reservation_exists(reservation_id):
+        return jsonify({"error": "Reservation not found"}), 404
+    last_event_id = request.headers.get("Last-Event-ID", request.args.get("since"))
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be an integer"}), 400
+    return Response(
+        stream_with_context(sse_stream(reservation_topic(reservation_id), last_event_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@flight_bp.route("/reservations/<int:reservation_id>/status", methods=["GET"])
+def poll_reservation_events(reservation_id):
+    """
+    Long-poll fallback for clients without server-sent events support.
+    """
+    if not reservation_exists(reservation_id):
+        return jsonify({"error": "Reservation not found"}), 404
+    try:
+        since = int(request.args["since"]) if request.args.get("since") else None
+        timeout = min(max(float(request.args.get("timeout", 25)), 0), 30)
+    except ValueError:
+        return jsonify({"error": "since must be an integer and timeout a number"}), 400
+    events = long_poll(reservation_topic(reservation_id), since, timeout)
+    return jsonify({
+        "events": [{"id": e["id"], "type": e["type"], "data": e["data"]} for e in events],
+        "last_event_id": events[-1]["id"] if events else since,
+    })
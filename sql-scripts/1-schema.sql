@@ -11,7 +11,9 @@ CREATE TABLE IF NOT EXISTS flight (
   date_of_departure DATE NOT NULL,
   estimated_departure_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   price DOUBLE(10,2) NOT NULL DEFAULT 0.0, 
-  PRIMARY KEY (id)
+  version INT NOT NULL DEFAULT 1,
+  PRIMARY KEY (id),
+  UNIQUE KEY uq_flight_number_date (flight_number, date_of_departure)
 );
 
 CREATE TABLE IF NOT EXISTS passenger (
@@ -33,7 +35,91 @@ CREATE TABLE IF NOT EXISTS reservation (
   created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
   card_number VARCHAR(20),
   amount DOUBLE(10,2) NOT NULL DEFAULT 0.0,
+  version INT NOT NULL DEFAULT 1,
   PRIMARY KEY (id),
   FOREIGN KEY (passenger_id) REFERENCES passenger(id) ON DELETE CASCADE,
   FOREIGN KEY (flight_id) REFERENCES flight(id)
 );
+
+CREATE TABLE IF NOT EXISTS outbox_message (
+  id BIGINT NOT NULL AUTO_INCREMENT,
+  topic VARCHAR(100) NOT NULL,
+  payload TEXT NOT NULL,
+  attempts INT NOT NULL DEFAULT 0,
+  available_at DATETIME NOT NULL,
+  last_error TEXT,
+  created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (id),
+  INDEX idx_outbox_available_at (available_at)
+);
+
+CREATE TABLE IF NOT EXISTS outbox_dead_letter (
+  id BIGINT NOT NULL AUTO_INCREMENT,
+  message_id BIGINT NOT NULL,
+  topic VARCHAR(100) NOT NULL,
+  payload TEXT NOT NULL,
+  attempts INT NOT NULL,
+  last_error TEXT,
+  failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS idempotency_key (
+  `key` VARCHAR(255) NOT NULL,
+  fingerprint CHAR(64) NOT NULL,
+  status_code INT,
+  body MEDIUMBLOB,
+  content_type VARCHAR(100),
+  expires_at DATETIME NOT NULL,
+  locked_until DATETIME,
+  PRIMARY KEY (`key`),
+  INDEX idx_idempotency_expires_at (expires_at)
+);
+
+CREATE TABLE IF NOT EXISTS flight_stats (
+  flight_id BIGINT NOT NULL,
+  date_of_departure DATE NOT NULL,
+  reservations INT NOT NULL DEFAULT 0,
+  checked_in INT NOT NULL DEFAULT 0,
+  bags INT NOT NULL DEFAULT 0,
+  revenue DOUBLE(12,2) NOT NULL DEFAULT 0.0,
+  PRIMARY KEY (flight_id),
+  INDEX idx_flight_stats_date (date_of_departure)
+);
+
+CREATE TABLE IF NOT EXISTS daily_stats (
+  date_of_departure DATE NOT NULL,
+  reservations INT NOT NULL DEFAULT 0,
+  checked_in INT NOT NULL DEFAULT 0,
+  bags INT NOT NULL DEFAULT 0,
+  revenue DOUBLE(12,2) NOT NULL DEFAULT 0.0,
+  PRIMARY KEY (date_of_departure)
+);
+
+CREATE TABLE IF NOT EXISTS flight_archive (
+  id BIGINT NOT NULL,
+  flight_number VARCHAR(20) NOT NULL,
+  operating_airlines VARCHAR(20) NOT NULL,
+  departure_city VARCHAR(20) NOT NULL,
+  arrival_city VARCHAR(20) NOT NULL,
+  date_of_departure DATE NOT NULL,
+  estimated_departure_time TIMESTAMP NULL,
+  price DOUBLE(10,2) NOT NULL,
+  archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (id),
+  INDEX idx_flight_archive_date (date_of_departure)
+);
+
+CREATE TABLE IF NOT EXISTS reservation_archive (
+  id BIGINT NOT NULL,
+  checked_in BIT NOT NULL,
+  number_of_bags INT,
+  passenger_id BIGINT NOT NULL,
+  flight_id BIGINT NOT NULL,
+  created TIMESTAMP NULL,
+  card_number VARCHAR(20),
+  amount DOUBLE(10,2) NOT NULL,
+  archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (id),
+  INDEX idx_reservation_archive_flight (flight_id)
+);
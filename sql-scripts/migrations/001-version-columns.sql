@@ -0,0 +1,7 @@
+-- Add optimistic concurrency version columns to databases created before they existed.
+-- New databases get them from 1-schema.sql.
+USE reservation;
+
+ALTER TABLE flight ADD COLUMN version INT NOT NULL DEFAULT 1;
+
+ALTER TABLE reservation ADD COLUMN version INT NOT NULL DEFAULT 1;
@@ -0,0 +1,35 @@
+-- Add the materialized booking counters to databases created before they existed and fill
+-- them from the existing reservations. New databases get the tables from 1-schema.sql.
+-- Run it on every reservation shard while bookings are paused.
+USE reservation;
+
+CREATE TABLE IF NOT EXISTS flight_stats (
+  flight_id BIGINT NOT NULL,
+  date_of_departure DATE NOT NULL,
+  reservations INT NOT NULL DEFAULT 0,
+  checked_in INT NOT NULL DEFAULT 0,
+  bags INT NOT NULL DEFAULT 0,
+  revenue DOUBLE(12,2) NOT NULL DEFAULT 0.0,
+  PRIMARY KEY (flight_id),
+  INDEX idx_flight_stats_date (date_of_departure)
+);
+
+CREATE TABLE IF NOT EXISTS daily_stats (
+  date_of_departure DATE NOT NULL,
+  reservations INT NOT NULL DEFAULT 0,
+  checked_in INT NOT NULL DEFAULT 0,
+  bags INT NOT NULL DEFAULT 0,
+  revenue DOUBLE(12,2) NOT NULL DEFAULT 0.0,
+  PRIMARY KEY (date_of_departure)
+);
+
+INSERT INTO flight_stats (flight_id, date_of_departure, reservations, checked_in, bags, revenue)
+SELECT r.flight_id, f.date_of_departure, COUNT(*), SUM(r.checked_in = 1),
+       COALESCE(SUM(r.number_of_bags), 0), COALESCE(SUM(r.amount), 0)
+FROM reservation r JOIN flight f ON f.id = r.flight_id
+GROUP BY r.flight_id, f.date_of_departure;
+
+INSERT INTO daily_stats (date_of_departure, reservations, checked_in, bags, revenue)
+SELECT date_of_departure, SUM(reservations), SUM(checked_in), SUM(bags), SUM(revenue)
+FROM flight_stats
+GROUP BY date_of_departure;
@@ -0,0 +1,74 @@
+-- Range-partition flight by date_of_departure and reservation by created (MySQL 8).
+-- Optional: apply on each shard once the tables are large enough for it to matter.
+--
+-- Queries filtering on the partition column (ACTIVE_WINDOW_DAYS, see utils/archiver.py) then
+-- only read recent partitions, and whole months can be dropped after they are archived.
+--
+-- MySQL limitations that shape this script:
+--   * Every PRIMARY KEY and UNIQUE key must include the partitioning column, so the
+--     primary keys become (id, date_of_departure) and (id, created). Ids stay unique
+--     because they are generated by AUTO_INCREMENT or the shard id generator.
+--   * Partitioned InnoDB tables can neither have nor be referenced by foreign keys, so the
+--     reservation foreign keys are dropped and integrity is enforced by the application.
+--   * RANGE COLUMNS does not accept TIMESTAMP columns, so reservation is partitioned by
+--     RANGE on UNIX_TIMESTAMP(created), and created must be NOT NULL.
+--
+-- Add the next partition before p_future fills up, e.g. every quarter:
+--   ALTER TABLE flight REORGANIZE PARTITION p_future INTO (
+--     PARTITION p2027q1 VALUES LESS THAN ('2027-04-01'),
+--     PARTITION p_future VALUES LESS THAN (MAXVALUE));
+-- Drop a quarter once it has been archived (much cheaper than DELETE):
+--   ALTER TABLE flight DROP PARTITION p2024q1;
+USE reservation;
+
+-- Foreign key names are the ones MySQL generated for 1-schema.sql
+ALTER TABLE reservation DROP FOREIGN KEY reservation_ibfk_1;
+
+ALTER TABLE reservation DROP FOREIGN KEY reservation_ibfk_2;
+
+ALTER TABLE reservation ADD INDEX idx_reservation_flight (flight_id);
+
+ALTER TABLE reservation ADD INDEX idx_reservation_passenger (passenger_id);
+
+ALTER TABLE flight
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (id, date_of_departure);
+
+ALTER TABLE flight
+  PARTITION BY RANGE COLUMNS (date_of_departure) (
+    PARTITION p2024q1 VALUES LESS THAN ('2024-04-01'),
+    PARTITION p2024q2 VALUES LESS THAN ('2024-07-01'),
+    PARTITION p2024q3 VALUES LESS THAN ('2024-10-01'),
+    PARTITION p2024q4 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p2025q1 VALUES LESS THAN ('2025-04-01'),
+    PARTITION p2025q2 VALUES LESS THAN ('2025-07-01'),
+    PARTITION p2025q3 VALUES LESS THAN ('2025-10-01'),
+    PARTITION p2025q4 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p2026q1 VALUES LESS THAN ('2026-04-01'),
+    PARTITION p2026q2 VALUES LESS THAN ('2026-07-01'),
+    PARTITION p2026q3 VALUES LESS THAN ('2026-10-01'),
+    PARTITION p2026q4 VALUES LESS THAN ('2027-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+  );
+
+ALTER TABLE reservation
+  MODIFY created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (id, created);
+
+ALTER TABLE reservation
+  PARTITION BY RANGE (UNIX_TIMESTAMP(created)) (
+    PARTITION p2024q1 VALUES LESS THAN (UNIX_TIMESTAMP('2024-04-01 00:00:00')),
+    PARTITION p2024q2 VALUES LESS THAN (UNIX_TIMESTAMP('2024-07-01 00:00:00')),
+    PARTITION p2024q3 VALUES LESS THAN (UNIX_TIMESTAMP('2024-10-01 00:00:00')),
+    PARTITION p2024q4 VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+    PARTITION p2025q1 VALUES LESS THAN (UNIX_TIMESTAMP('2025-04-01 00:00:00')),
+    PARTITION p2025q2 VALUES LESS THAN (UNIX_TIMESTAMP('2025-07-01 00:00:00')),
+    PARTITION p2025q3 VALUES LESS THAN (UNIX_TIMESTAMP('2025-10-01 00:00:00')),
+    PARTITION p2025q4 VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00')),
+    PARTITION p2026q1 VALUES LESS THAN (UNIX_TIMESTAMP('2026-04-01 00:00:00')),
+    PARTITION p2026q2 VALUES LESS THAN (UNIX_TIMESTAMP('2026-07-01 00:00:00')),
+    PARTITION p2026q3 VALUES LESS THAN (UNIX_TIMESTAMP('2026-10-01 00:00:00')),
+    PARTITION p2026q4 VALUES LESS THAN (UNIX_TIMESTAMP('2027-01-01 00:00:00')),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+  );
@@ -0,0 +1,52 @@
+-- Make (flight_number, date_of_departure) unique so schedule imports can upsert on it.
+-- Duplicate flights are merged into the one with the lowest id first: their reservations
+-- and booking counters are moved to it. Run it on every shard while bookings are paused.
+--
+-- Sharded deployments: reservations live on the shard of their flight id, and the moved
+-- reservations stay on the shard of the flight they were booked on. Afterwards, for every
+-- row of flight_merge with old_id % N <> keep_id % N, copy the reservations of keep_id and
+-- their passengers from shard old_id % N to shard keep_id % N, delete them from the old
+-- shard, then run `python -m utils.booking_stats rebuild` and drop flight_merge.
+USE reservation;
+
+CREATE TABLE IF NOT EXISTS flight_merge (
+  old_id BIGINT NOT NULL PRIMARY KEY,
+  keep_id BIGINT NOT NULL
+);
+
+INSERT INTO flight_merge (old_id, keep_id)
+SELECT d.id, k.keep_id
+FROM flight d
+  JOIN (
+    SELECT flight_number, date_of_departure, MIN(id) AS keep_id
+    FROM flight
+    GROUP BY flight_number, date_of_departure
+    HAVING COUNT(*) > 1
+  ) k ON k.flight_number = d.flight_number AND k.date_of_departure = d.date_of_departure
+WHERE d.id <> k.keep_id;
+
+-- Merged flights depart on the same day, so daily_stats does not change.
+INSERT INTO flight_stats (flight_id, date_of_departure, reservations, checked_in, bags, revenue)
+SELECT * FROM (
+  SELECT m.keep_id AS flight_id, s.date_of_departure, SUM(s.reservations) AS reservations,
+         SUM(s.checked_in) AS checked_in, SUM(s.bags) AS bags, SUM(s.revenue) AS revenue
+  FROM flight_stats s JOIN flight_merge m ON m.old_id = s.flight_id
+  GROUP BY m.keep_id, s.date_of_departure
+) AS merged
+ON DUPLICATE KEY UPDATE
+  reservations = flight_stats.reservations + merged.reservations,
+  checked_in = flight_stats.checked_in + merged.checked_in,
+  bags = flight_stats.bags + merged.bags,
+  revenue = flight_stats.revenue + merged.revenue;
+
+DELETE s FROM flight_stats s JOIN flight_merge m ON m.old_id = s.flight_id;
+
+UPDATE reservation r JOIN flight_merge m ON m.old_id = r.flight_id
+SET r.flight_id = m.keep_id;
+
+DELETE f FROM flight f JOIN flight_merge m ON m.old_id = f.id;
+
+ALTER TABLE flight ADD UNIQUE KEY uq_flight_number_date (flight_number, date_of_departure);
+
+-- Single-database deployments can drop the merge list right away.
+-- DROP TABLE flight_merge;
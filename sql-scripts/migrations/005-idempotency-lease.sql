@@ -0,0 +1,5 @@
+-- Add the lease of running requests to idempotency keys created before it existed.
+-- New databases get it from 1-schema.sql. Keys without a lease can be taken over by a retry.
+USE reservation;
+
+ALTER TABLE idempotency_key ADD COLUMN locked_until DATETIME;
@@ -4,12 +4,25 @@ Configuration for pytest and test fixtures for the Flight Reservation Flask Appl
 
 import os
 import sys
+from datetime import date, datetime, time
 import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import database.database
 from database import init_db, SessionLocal
+from database.base import Base
+from database.sharding import ShardRouter
+from models.models import Flight  # Also registers the other models on Base
+import utils.route_graph
 
 # Add the project root directory to the Python module search path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+# Keep the rate limiter out of the way of functional tests
+os.environ.setdefault("RATE_LIMIT_SEARCH", "1000,1000")
+os.environ.setdefault("RATE_LIMIT_BOOKING", "1000,1000")
+
 from app import app as flask_app  # Import after modifying sys.path
 
 @pytest.fixture(scope="module")
@@ -39,3 +52,98 @@ def db_session():
     yield session
     session.rollback()
     session.close()
+
+def _memory_engine():
+    """
+    Create an in-memory SQLite database with the schema, shared by all threads.
+    """
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    return engine
+
+@pytest.fixture(scope="function")
+def sqlite_session(monkeypatch, tmp_path_factory):
+    """
+    Point the application at a fresh SQLite database built from the models.
+    Returns the session factory bound to it.
+
+    The database is a file, so each thread gets its own connection and transaction, as with
+    MySQL, and threaded tests do not interleave statements on one shared connection.
+    """
+    path = tmp_path_factory.mktemp("sqlite") / "app.db"  # Outside the test's own tmp_path
+    engine = create_engine(f"sqlite:///{path}",
+                           connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(database.database, "SessionLocal", session_factory)
+    monkeypatch.setattr(database.database, "router", ShardRouter([session_factory]))
+    yield session_factory
+    engine.dispose()
+
+@pytest.fixture(scope="function")
+def sqlite_shards():
+    """
+    Provide a function creating ``count`` in-memory SQLite databases, e.g. to build a
+    ``ShardRouter``. Returns their session factories.
+    """
+    engines = []
+
+    def create(count):
+        engines.extend(_memory_engine() for _ in range(count))
+        return [sessionmaker(autocommit=False, autoflush=False, bind=engine)
+                for engine in engines[-count:]]
+
+    yield create
+    for engine in engines:
+        engine.dispose()
+
+@pytest.fixture(scope="function")
+def make_flight():
+    """
+    Provide a function building a ``Flight`` from AUS to NYC on 2024-02-05 at 03:14 for 200.0.
+    Keyword arguments override columns; ``departure_time`` sets the time on the departure date.
+    """
+    def make(flight_id=1, date_of_departure=date(2024, 2, 5), departure_time=time(3, 14), **columns):
+        values = {
+            "id": flight_id, "flight_number": f"AA{flight_id}",
+            "operating_airlines": "American Airlines", "departure_city": "AUS",
+            "arrival_city": "NYC", "date_of_departure": date_of_departure,
+            "estimated_departure_time": datetime.combine(date_of_departure, departure_time),
+            "price": 200.0,
+        }
+        values.update(columns)
+        return Flight(**values)
+    return make
+
+@pytest.fixture(scope="function")
+def seed_flights(sqlite_session, make_flight):  # pylint: disable=redefined-outer-name
+    """
+    Provide a function adding rows to the SQLite database in one transaction. Integers stand
+    for default flights with that id (see ``make_flight``); other rows, such as passengers and
+    reservations, are added as they are.
+    """
+    def seed(*rows, session_factory=sqlite_session):
+        with session_factory() as db:
+            db.add_all([make_flight(row) if isinstance(row, int) else row for row in rows])
+            db.commit()
+    return seed
+
+@pytest.fixture(scope="function")
+def sqlite_client(sqlite_session):  # pylint: disable=redefined-outer-name,unused-argument
+    """
+    Provide a test client for the Flask app backed by the SQLite database.
+    """
+    flask_app.config["TESTING"] = True
+    return flask_app.test_client()
+
+@pytest.fixture(scope="function")
+def route_graph(monkeypatch):
+    """
+    Start without a process-wide route graph and remove the Session listeners of any graph
+    built during the test.
+    """
+    monkeypatch.setattr(utils.route_graph, "_GRAPH", None)
+    yield
+    utils.route_graph.invalidate_route_graph()
@@ -0,0 +1,122 @@
+"""
+Tests for archiving departed flights and the active window of flight searches.
+"""
+
+import gzip
+import json
+from datetime import date, timedelta
+import pytest
+from models.models import (
+    DailyStats, Flight, FlightArchive, FlightStats, Passenger, Reservation, ReservationArchive,
+)
+from utils.archiver import Archiver, TableSink, main
+from utils.booking_stats import rebuild, reconcile
+from utils.flight_catalog import FlightCatalog
+
+BASE_URL = "/flightreservation-flask-full"
+TODAY = date.today()
+
+@pytest.fixture(name="flights")
+def fixture_flights(sqlite_session, make_flight, seed_flights):
+    """
+    Five flights that departed 100 days ago, two departing soon, and a reservation on each.
+    """
+    rows = [Passenger(id=1, first_name="John", last_name="Doe", email="john.doe@example.com")]
+    for flight_id in range(1, 8):
+        day = TODAY - timedelta(days=100) if flight_id <= 5 else TODAY + timedelta(days=3)
+        rows.append(make_flight(flight_id, date_of_departure=day))
+        rows.append(Reservation(id=flight_id, passenger_id=1, flight_id=flight_id, amount=100.0,
+                                checked_in=True, number_of_bags=1))
+    seed_flights(*rows)
+    return sqlite_session
+
+def test_departed_flights_move_to_archive_tables(flights):
+    """
+    Departed flights and their reservations are moved in batches; counters and passengers stay.
+    """
+    archiver = Archiver(flights, batch_size=2)
+    assert archiver.run(TODAY - timedelta(days=30), max_batches=2) == (4, 4)
+    assert archiver.run(TODAY - timedelta(days=30)) == (1, 1)
+    with flights() as db:
+        assert sorted(f.id for f in db.query(Flight)) == [6, 7]
+        assert sorted(r.id for r in db.query(Reservation)) == [6, 7]
+        assert db.query(FlightArchive).count() == 5
+        archived = db.get(ReservationArchive, 3)
+        assert (archived.flight_id, archived.checked_in, archived.number_of_bags) == (3, True, 1)
+        assert db.get(FlightStats, 3).reservations == 1
+        assert db.get(Passenger, 1) is not None
+
+def test_reservations_are_only_deleted_once_archived(flights):
+    """
+    A reservation booked after the batch was read is left in place rather than lost.
+    """
+    class BookingSink(TableSink):
+        """
+        Books another seat on an archived flight while the batch is written.
+        """
+        def write(self, db, shard, flights, reservations):
+            db.add(Reservation(id=8, passenger_id=1, flight_id=1, amount=100.0))
+            db.flush()
+            super().write(db, shard, flights, reservations)
+
+    assert Archiver(flights, sink=BookingSink()).run(TODAY - timedelta(days=30)) == (5, 5)
+    with flights() as db:
+        assert sorted(r.id for r in db.query(Reservation)) == [6, 7, 8]
+        assert db.get(ReservationArchive, 8) is None
+
+def test_archiving_rewrites_the_flight_catalog(flights, monkeypatch, tmp_path):
+    """
+    The shared catalog file no longer lists archived flights, so every worker drops them.
+    """
+    path = str(tmp_path / "catalog.bin")
+    monkeypatch.setenv("FLIGHT_CATALOG_PATH", path)
+    with flights() as db:
+        FlightCatalog.from_db(db).save(path)
+    Archiver(flights).run(TODAY - timedelta(days=30))
+    assert [view.id for view in FlightCatalog.open(path)] == [6, 7]
+
+def test_counters_of_archived_flights_survive_reconcile(flights):
+    """
+    Reconcile and rebuild keep the counters of flights whose reservations were archived.
+    """
+    Archiver(flights).run(TODAY - timedelta(days=30))
+    with flights() as db:
+        assert reconcile(db, fix=True) == []
+        assert rebuild(db) == 2
+        assert db.get(FlightStats, 3).reservations == 1
+        assert db.get(DailyStats, TODAY - timedelta(days=100)).reservations == 5
+        assert db.get(DailyStats, TODAY + timedelta(days=3)).reservations == 2
+        db.query(Reservation).filter(Reservation.id == 6).delete()  # Bypasses the counters
+        db.commit()
+        assert sorted((table, str(key)) for table, key, _, _ in reconcile(db)) == [
+            ("daily_stats", str(TODAY + timedelta(days=3))), ("flight_stats", "6"),
+        ]
+
+def test_archive_to_compressed_files(flights, tmp_path):
+    """
+    The file sink writes one gzip JSON Lines file per batch.
+    """
+    assert main(["--older-than-days", "30", "--batch-size", "3", "--pause", "0",
+                 "--to-files", str(tmp_path)]) == 0
+    files = sorted(path.name for path in tmp_path.iterdir())
+    assert files == ["shard0-flights-1-3.jsonl.gz", "shard0-flights-4-5.jsonl.gz"]
+    with gzip.open(tmp_path / files[0], "rt", encoding="utf-8") as file:
+        rows = [json.loads(line) for line in file]
+    assert [(row["table"], row["id"]) for row in rows] == [
+        ("flight", 1), ("flight", 2), ("flight", 3),
+        ("reservation", 1), ("reservation", 2), ("reservation", 3),
+    ]
+    with flights() as db:
+        assert db.query(Flight).count() == 2
+        assert db.query(FlightArchive).count() == 0
+
+def test_searches_skip_flights_outside_the_active_window(sqlite_client, flights, monkeypatch):  # pylint: disable=unused-argument
+    """
+    With ACTIVE_WINDOW_DAYS set, listings and searches ignore older departures.
+    """
+    assert len(sqlite_client.get(f"{BASE_URL}/flights").get_json()) == 7
+    monkeypatch.setenv("ACTIVE_WINDOW_DAYS", "30")
+    assert [f["id"] for f in sqlite_client.get(f"{BASE_URL}/flights").get_json()] == [6, 7]
+    response = sqlite_client.post(f"{BASE_URL}/findFlights",
+                                  data={"departure": "AUS", "arrival": "NYC"})
+    assert b"AA6" in response.data and b"AA1<" not in response.data
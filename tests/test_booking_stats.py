@@ -0,0 +1,92 @@
+"""
+Tests for the materialized booking counters and the /stats endpoint.
+"""
+
+from datetime import date
+import pytest
+from sqlalchemy import update
+from models.models import DailyStats, FlightStats, Passenger, Reservation
+from utils.booking_stats import main, rebuild, reconcile
+
+BASE_URL = "/flightreservation-flask-full"
+
+@pytest.fixture(name="flights")
+def fixture_flights(sqlite_session, make_flight, seed_flights):
+    """
+    Two flights on one day and one on the next, with a passenger.
+    """
+    seed_flights(
+        *(make_flight(flight_id, date_of_departure=date(2024, 2, day))
+          for flight_id, day in ((1, 5), (2, 5), (3, 6))),
+        Passenger(id=1, first_name="John", last_name="Doe", email="john.doe@example.com"),
+    )
+    return sqlite_session
+
+def book(client, flight_id, amount):
+    """
+    Book a flight through the endpoint.
+    """
+    response = client.post(f"{BASE_URL}/createReservation", data={
+        "flight_id": flight_id, "first_name": "John", "last_name": "Doe",
+        "email": "john.doe@example.com", "phone": "1234567890",
+        "card_number": "4111111111111111", "amount": amount,
+    })
+    assert response.status_code == 200
+
+def test_counters_follow_bookings_and_check_ins(sqlite_client, flights):
+    """
+    Booking and check-in update the flight and daily counters in the same transaction.
+    """
+    book(sqlite_client, 1, 200.00)
+    book(sqlite_client, 1, 150.50)
+    book(sqlite_client, 2, 99.99)
+    book(sqlite_client, 3, 300.00)
+    with flights() as db:
+        reservation_id = db.query(Reservation.id).filter(Reservation.flight_id == 1).first()[0]
+    for bags in (2, 3):  # Checking in twice replaces the bag count
+        response = sqlite_client.post(f"{BASE_URL}/completeCheckIn",
+                                      data={"reservation_id": reservation_id, "number_of_bags": bags})
+        assert response.status_code == 200
+
+    response = sqlite_client.get(f"{BASE_URL}/stats?flight_id=1&flight_id=4&date=2024-02-05")
+    assert response.get_json() == {
+        "flights": [
+            {"flight_id": 1, "reservations": 2, "checked_in": 1, "bags": 3, "revenue": 350.5},
+            {"flight_id": 4, "reservations": 0, "checked_in": 0, "bags": 0, "revenue": 0.0},
+        ],
+        "days": [
+            {"date": "2024-02-05", "reservations": 3, "checked_in": 1, "bags": 3, "revenue": 450.49},
+        ],
+    }
+    with flights() as db:
+        assert reconcile(db) == []
+        db.delete(db.get(Reservation, reservation_id))
+        db.commit()
+        assert reconcile(db) == []
+        assert db.get(FlightStats, 1).reservations == 1
+    assert sqlite_client.get(f"{BASE_URL}/stats").status_code == 400
+    assert sqlite_client.get(f"{BASE_URL}/stats?date=02/05/2024").status_code == 400
+
+def test_reconcile_repairs_bulk_updates(flights):
+    """
+    Changes made without the ORM are found and repaired by reconcile and rebuild.
+    """
+    with flights() as db:
+        db.add_all([Reservation(id=i, passenger_id=1, flight_id=3, amount=100.0) for i in (1, 2)])
+        db.commit()
+        db.execute(update(Reservation).values(checked_in=True, number_of_bags=1))
+        db.commit()
+        differences = reconcile(db, fix=True)
+        assert {(table, key) for table, key, _, _ in differences} == {
+            ("flight_stats", 3), ("daily_stats", date(2024, 2, 6))
+        }
+        assert reconcile(db) == []
+        assert (db.get(DailyStats, date(2024, 2, 6)).checked_in,
+                db.get(DailyStats, date(2024, 2, 6)).bags) == (2, 2)
+
+        db.execute(update(FlightStats).values(reservations=99))
+        db.commit()
+        assert rebuild(db) == 1
+        assert db.get(FlightStats, 3).reservations == 2
+        assert reconcile(db) == []
+    assert main(["reconcile"]) == 0
@@ -0,0 +1,88 @@
+"""
+Tests for the city autocomplete index and the /cities/suggest endpoint.
+"""
+
+import random
+import string
+from datetime import date
+import pytest
+import utils.city_index
+from models.models import Passenger, Reservation
+from utils.city_index import CityIndex
+
+BASE_URL = "/flightreservation-flask-full"
+
+def test_suggestions_match_a_full_scan():
+    """
+    Precomputed and searched prefixes rank the same cities as scanning every name.
+    """
+    rng = random.Random(3)
+    weights = {}
+    for _ in range(2_000):
+        name = "".join(rng.choices("abc", k=rng.randint(1, 6)))
+        if rng.random() < 0.3:
+            name = f"{rng.choice(['San', 'New'])} {name}"
+        weights[name] = rng.randint(0, 50)
+    index = CityIndex(weights, top_k=5, threshold=8)
+    for prefix in ["a", "ab", "abc", "san", "San a", "new c", "b", "cc", "x", ""]:
+        words = prefix.casefold()
+        expected = sorted(
+            (city for city in weights
+             if any(" ".join(city.casefold().split()[start:]).startswith(words)
+                    for start in range(len(city.split())))),
+            key=lambda city: (-weights[city], city),
+        )[:5] if words else []
+        assert index.suggest(prefix, 5) == expected, prefix
+    assert index.suggest("  SAN   a ", 3) == index.suggest("san a", 3)
+
+def test_large_index_lookups_stay_small():
+    """
+    Every lookup ranks at most ``threshold`` candidates, however short the prefix.
+    """
+    names = {"".join(random.Random(i).choices(string.ascii_lowercase, k=7)): i
+             for i in range(20_000)}
+    index = CityIndex(names, threshold=32)
+    assert len(index.suggest("a", 10)) == 10
+    for prefix in ["a", "ab", "abc", "q", "zz"]:
+        if prefix not in index._top:  # pylint: disable=protected-access
+            assert sum(key.startswith(prefix) for key in index._keys) <= 32  # pylint: disable=protected-access
+
+@pytest.fixture(name="flights")
+def fixture_flights(sqlite_session, monkeypatch, make_flight, seed_flights):
+    """
+    Flights between four cities and a fresh city index refreshed on every request.
+    """
+    monkeypatch.setattr(utils.city_index, "_INDEX", None)
+    monkeypatch.setattr(utils.city_index, "_POPULARITY", None)
+    monkeypatch.setattr(utils.city_index, "REFRESH_SECONDS", -1)
+    seed_flights(
+        *(make_flight(flight_id, departure_city=departure, arrival_city=arrival)
+          for flight_id, (departure, arrival) in enumerate(
+              [("New York", "Dallas"), ("Newark", "Austin"), ("New Orleans", "Dallas")], start=1)),
+        Passenger(id=1, first_name="John", last_name="Doe", email="john.doe@example.com"),
+    )
+    return sqlite_session
+
+def test_suggest_endpoint_ranks_by_bookings(sqlite_client, flights, make_flight, seed_flights):  # pylint: disable=unused-argument
+    """
+    Suggestions follow reservation counts, and new bookings are picked up incrementally.
+    """
+    response = sqlite_client.get(f"{BASE_URL}/cities/suggest?q=new")
+    assert [s["city"] for s in response.get_json()] == ["New Orleans", "New York", "Newark"]
+
+    seed_flights(
+        *(Reservation(id=i, passenger_id=1, flight_id=2, amount=200.0) for i in (1, 2)),
+        Reservation(id=3, passenger_id=1, flight_id=1, amount=200.0),
+        make_flight(4, departure_city="Austin", arrival_city="Newcastle",
+                    date_of_departure=date(2024, 2, 6)),
+    )
+    response = sqlite_client.get(f"{BASE_URL}/cities/suggest?q=NEW&limit=3")
+    assert response.get_json() == [
+        {"city": "Newark", "popularity": 2}, {"city": "New York", "popularity": 1},
+        {"city": "New Orleans", "popularity": 0},
+    ]
+    response = sqlite_client.get(f"{BASE_URL}/cities/suggest?q=york")
+    assert [s["city"] for s in response.get_json()] == ["New York"]
+    assert sqlite_client.get(f"{BASE_URL}/cities/suggest?q=newc").get_json()[0]["city"] == "Newcastle"
+    assert sqlite_client.get(f"{BASE_URL}/cities/suggest?q=").get_json() == []
+    assert sqlite_client.get(f"{BASE_URL}/cities/suggest?q=a&limit=x").status_code == 400
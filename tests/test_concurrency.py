@@ -0,0 +1,138 @@
+"""
+Tests for optimistic concurrency control on reservations, including a threaded stress test.
+"""
+
+import time
+import threading
+import pytest
+from sqlalchemy.orm.exc import StaleDataError
+from models.models import Passenger, Reservation
+from utils.concurrency import ConflictStats, conditional_update, retry_on_conflict
+import utils.concurrency
+import utils.outbox
+
+@pytest.fixture(name="session_factory")
+def fixture_session_factory(sqlite_session, seed_flights):
+    """
+    One reservation without bags in the SQLite database.
+    """
+    seed_flights(1, Passenger(id=1, first_name="John", last_name="Doe", email="john@example.com"),
+                 Reservation(id=1, passenger_id=1, flight_id=1, amount=200.0, number_of_bags=0))
+    return sqlite_session
+
+def test_stale_update_is_rejected(session_factory):
+    """
+    A write based on an outdated read raises instead of overwriting the newer row.
+    """
+    with session_factory() as first, session_factory() as second:
+        mine = first.get(Reservation, 1)
+        theirs = second.get(Reservation, 1)
+        theirs.checked_in = True
+        second.commit()
+
+        mine.number_of_bags = 3
+        with pytest.raises(StaleDataError):
+            first.commit()
+
+    with session_factory() as db:
+        reservation = db.get(Reservation, 1)
+        assert (reservation.checked_in, reservation.number_of_bags, reservation.version) == (True, 0, 2)
+
+def test_conditional_update(session_factory):
+    """
+    Bulk updates only apply when the expected version still matches.
+    """
+    with session_factory() as db:
+        assert conditional_update(db, Reservation, 1, 1, checked_in=True)
+        assert not conditional_update(db, Reservation, 1, 1, number_of_bags=5)
+        db.commit()
+        assert db.get(Reservation, 1).version == 2
+
+def test_interleaved_write_is_retried(session_factory, monkeypatch):
+    """
+    A write committed between our read and our commit makes the increment retry on fresh
+    data instead of overwriting it.
+    """
+    monkeypatch.setattr(utils.concurrency, "stats", ConflictStats())
+
+    @retry_on_conflict(max_attempts=3, base_delay=0, conflict_response=lambda: False)
+    def add_bag(interfere):
+        with session_factory() as db:
+            reservation = db.get(Reservation, 1)
+            if interfere:
+                interfere.pop()
+                with session_factory() as other:  # Both sessions loaded version 1
+                    other.get(Reservation, 1).number_of_bags += 1
+                    other.commit()
+            reservation.number_of_bags += 1
+            db.commit()
+            return True
+
+    assert add_bag([True])
+    with session_factory() as db:
+        reservation = db.get(Reservation, 1)
+        assert (reservation.number_of_bags, reservation.version) == (2, 3)
+    counters = utils.concurrency.stats
+    assert (counters.attempts, counters.conflicts, counters.exhausted) == (2, 1, 0)
+
+def test_no_lost_updates_under_contention(session_factory, monkeypatch):
+    """
+    Concurrent read-modify-write increments all survive thanks to version checks and retries.
+    Throughput is measured by ``benchmarks/bench_concurrency.py``.
+    """
+    monkeypatch.setattr(utils.concurrency, "stats", ConflictStats())
+    threads, increments = 8, 25
+
+    @retry_on_conflict(max_attempts=50, base_delay=0.001, conflict_response=lambda: False)
+    def add_bag():
+        with session_factory() as db:
+            reservation = db.get(Reservation, 1)
+            bags = reservation.number_of_bags
+            time.sleep(0.0005)  # Widen the read-modify-write window
+            reservation.number_of_bags = bags + 1
+            db.commit()
+            return True
+
+    results = []
+
+    def worker():
+        results.extend(add_bag() for _ in range(increments))
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    with session_factory() as db:
+        reservation = db.get(Reservation, 1)
+        assert reservation.number_of_bags == threads * increments
+        assert reservation.version == threads * increments + 1
+    assert all(results)
+    assert utils.concurrency.stats.exhausted == 0
+
+def test_check_in_endpoint_retries_conflicts(sqlite_client, session_factory, monkeypatch):
+    """
+    A conflicting concurrent write makes the check-in handler retry and still succeed.
+    """
+
+    monkeypatch.setattr(utils.concurrency, "stats", ConflictStats())
+    original_enqueue = utils.outbox.enqueue
+    interfered = []
+
+    def enqueue_after_concurrent_write(db, topic, payload):
+        if not interfered:  # Another request updates the row between our read and write
+            interfered.append(True)
+            with session_factory() as other:
+                conditional_update(other, Reservation, 1, 1, card_number="4111")
+                other.commit()
+        return original_enqueue(db, topic, payload)
+
+    monkeypatch.setattr("routes.flight_routes.enqueue", enqueue_after_concurrent_write)
+    response = sqlite_client.post("/flightreservation-flask-full/completeCheckIn",
+                                  data={"reservation_id": 1, "number_of_bags": 2})
+    assert response.status_code == 200
+    assert utils.concurrency.stats.conflicts == 1
+    with session_factory() as db:
+        reservation = db.get(Reservation, 1)
+        assert (reservation.checked_in, reservation.card_number, reservation.version) == (True, "4111", 3)
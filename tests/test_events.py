@@ -0,0 +1,143 @@
+"""
+Tests for reservation status events over server-sent events and long polling.
+"""
+
+import time
+import threading
+import pytest
+import utils.events
+from models.models import Passenger, Reservation
+from utils.events import (
+    EventBroker, LocalBackend, RedisBackend, publish_reservation_event, sse_stream,
+)
+
+BASE_URL = "/flightreservation-flask-full"
+
+@pytest.fixture(name="reservation")
+def fixture_reservation(monkeypatch, seed_flights):
+    """
+    One reservation in the SQLite database and a fresh event broker.
+    """
+    broker = EventBroker(buffer_size=4)
+    monkeypatch.setattr(utils.events, "broker", broker)
+    monkeypatch.setattr(utils.events, "backend", LocalBackend(broker))
+    seed_flights(1, Passenger(id=1, first_name="John", last_name="Doe", email="john.doe@example.com"),
+                 Reservation(id=1, passenger_id=1, flight_id=1, amount=200.0))
+    return broker
+
+def test_long_poll_waits_for_check_in(sqlite_client, reservation):
+    """
+    A pending long poll returns as soon as the reservation is checked in.
+    """
+    results = []
+    poller = threading.Thread(target=lambda: results.append(
+        sqlite_client.get(f"{BASE_URL}/reservations/1/status?timeout=5")
+    ))
+    poller.start()
+    while reservation.subscriber_count() == 0:
+        threading.Event().wait(0.01)
+    response = sqlite_client.post(f"{BASE_URL}/completeCheckIn",
+                                  data={"reservation_id": 1, "number_of_bags": 2})
+    assert response.status_code == 200
+    poller.join(timeout=5)
+
+    body = results[0].get_json()
+    assert [event["type"] for event in body["events"]] == ["reservation.checked_in"]
+    assert body["events"][0]["data"] == {"number_of_bags": 2, "reservation_id": 1}
+    assert reservation.subscriber_count() == 0
+
+    response = sqlite_client.get(f"{BASE_URL}/reservations/1/status?timeout=0&since=0")
+    assert response.get_json()["last_event_id"] == body["last_event_id"]  # Resumed from history
+    assert sqlite_client.get(f"{BASE_URL}/reservations/2/status").status_code == 404
+
+def test_sse_stream_resumes_and_sends_heartbeats(sqlite_client, reservation, monkeypatch):
+    """
+    The stream replays events after Last-Event-ID, then sends heartbeats until it expires.
+    """
+    first = publish_reservation_event(1, "reservation.created")
+    publish_reservation_event(1, "reservation.paid")
+    monkeypatch.setattr(utils.events, "HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(utils.events, "MAX_STREAM_SECONDS", 0.12)
+    response = sqlite_client.get(f"{BASE_URL}/reservations/1/events",
+                                 headers={"Last-Event-ID": str(first["id"])})
+    assert response.mimetype == "text/event-stream"
+    body = response.get_data(as_text=True)
+    assert "event: reservation.paid" in body
+    assert "reservation.created" not in body
+    assert ": heartbeat" in body
+    assert reservation.subscriber_count() == 0
+
+def test_slow_subscriber_buffer_is_bounded(reservation):
+    """
+    A client that stops reading keeps only the most recent events.
+    """
+    stream = sse_stream("reservation:1", heartbeat=0.01, max_duration=1, event_broker=reservation)
+    assert next(stream).startswith("retry:")
+    for number in range(10):
+        publish_reservation_event(1, "reservation.update", {"number": number})
+    subscription = next(iter(reservation._subscribers["reservation:1"]))  # pylint: disable=protected-access
+    assert subscription.dropped == 6
+    messages = [next(stream) for _ in range(4)]
+    assert '"number": 6' in messages[0] and '"number": 9' in messages[-1]
+    stream.close()
+    assert reservation.subscriber_count() == 0
+
+def test_history_is_bounded_by_topics_and_age():
+    """
+    Histories of old or least recently updated topics are dropped.
+    """
+    now = [0.0]
+    broker = EventBroker(history_seconds=60, history_topics=2, clock=lambda: now[0])
+    for number in (1, 2, 3):
+        broker.dispatch({"id": number, "topic": f"reservation:{number}"})
+    assert broker.history("reservation:1") == []
+    assert [event["id"] for event in broker.history("reservation:3")] == [3]
+    now[0] = 61
+    assert broker.history("reservation:3") == []
+    broker.dispatch({"id": 4, "topic": "reservation:4"})
+    assert list(broker._history) == ["reservation:4"]  # pylint: disable=protected-access
+
+class FakePubSub:
+    """
+    Yields the queued messages, then raises the queued error or waits until released.
+    """
+
+    def __init__(self, messages, error, released):
+        self.messages, self.error, self.released = messages, error, released
+        self.closed = False
+
+    def subscribe(self, channel):
+        """Accept the subscription."""
+        assert channel == "reservation-events"
+
+    def listen(self):
+        """Yield messages like ``redis.client.PubSub.listen``."""
+        yield from ({"data": message} for message in self.messages)
+        if self.error:
+            raise self.error
+        self.released.wait()
+
+    def close(self):
+        """Release the connection."""
+        self.closed = True
+
+def test_redis_listener_resubscribes_after_connection_errors():
+    """
+    A lost Redis connection is logged and the listener subscribes again with backoff.
+    """
+    released = threading.Event()
+    subscriptions = [
+        FakePubSub(['{"id": 1, "topic": "reservation:1"}'], ConnectionError("reset"), released),
+        FakePubSub([], ConnectionError("refused"), released),
+        FakePubSub(['{"id": 2, "topic": "reservation:1"}'], None, released),
+    ]
+    client = type("FakeRedis", (), {"pubsub": lambda self, **_: subscriptions.pop(0)})()
+    broker = EventBroker()
+    backend = RedisBackend(broker, client, retry_delay=0.01)
+    deadline = time.monotonic() + 5
+    while len(broker.history("reservation:1")) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    backend.close()
+    released.set()
+    assert [event["id"] for event in broker.history("reservation:1")] == [1, 2]
+    assert subscriptions == []
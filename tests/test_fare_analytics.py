@@ -0,0 +1,74 @@
+"""
+Tests for the vectorized fare analytics and the /fares/calendar endpoint.
+"""
+
+from datetime import date
+import numpy as np
+import utils.fare_analytics
+from utils.fare_analytics import FareSnapshot, month_bounds
+
+def _days(*days):
+    return [date(2024, 2, day).toordinal() - date(1970, 1, 1).toordinal() for day in days]
+
+def test_calendar_groups_fares_per_day():
+    """
+    Per-day min, median and mean are computed per route.
+    """
+    snapshot = FareSnapshot(
+        [("AUS", "NYC"), ("NYC", "DAL")],
+        [0, 0, 0, 1, 0, 0],
+        _days(5, 5, 5, 5, 6, 1),
+        [300.0, 100.0, 200.0, 999.0, 150.0, 400.0],
+    )
+    days = snapshot.calendar("aus", "nyc", date(2024, 2, 2), date(2024, 2, 29))
+    assert days == [
+        {"date": "2024-02-05", "min": 100.0, "median": 200.0, "mean": 200.0, "flights": 3},
+        {"date": "2024-02-06", "min": 150.0, "median": 150.0, "mean": 150.0, "flights": 1},
+    ]
+    assert snapshot.calendar("AUS", "SFO", date(2024, 2, 1), date(2024, 2, 29)) == []
+
+def test_route_summary_and_histogram():
+    """
+    Route aggregates and the histogram cover every flight of the route.
+    """
+    snapshot = FareSnapshot([("AUS", "NYC")], [0] * 4, _days(1, 2, 3, 4), [100.0, 200.0, 300.0, 400.0])
+    summary = snapshot.route_summary("AUS", "NYC", bins=2)
+    assert summary["median"] == 250.0
+    assert summary["histogram"]["counts"] == [2, 2]
+    assert snapshot.route_summary("NYC", "AUS") is None
+
+def test_month_view_on_large_snapshot():
+    """
+    A month view on a 1M flight snapshot has one entry per day of the month. Its latency is
+    measured by ``benchmarks/bench_fare_calendar.py``.
+    """
+    rng = np.random.default_rng(3)
+    size = 1_000_000
+    routes = [(f"C{i}", f"C{i + 1}") for i in range(200)]
+    snapshot = FareSnapshot(
+        routes,
+        rng.integers(0, len(routes), size),
+        rng.integers(_days(1)[0], _days(1)[0] + 365, size),
+        rng.uniform(50, 900, size),
+    )
+    days = snapshot.calendar("C7", "C8", *month_bounds("2024-03"))
+    assert [day["date"] for day in days] == [f"2024-03-{day:02d}" for day in range(1, 32)]
+    assert all(day["min"] <= day["median"] and day["flights"] > 0 for day in days)
+
+def test_fare_calendar_endpoint(sqlite_client, monkeypatch, make_flight, seed_flights):
+    """
+    The endpoint serves the month view from a snapshot of the flight table.
+    """
+    monkeypatch.setattr(utils.fare_analytics, "_SNAPSHOT", None)
+    seed_flights(*(make_flight(flight_id, date_of_departure=date(2024, 2, day), price=price)
+                   for flight_id, (day, price) in enumerate([(5, 200.0), (5, 120.0), (6, 90.0)], start=1)))
+
+    response = sqlite_client.get(
+        "/flightreservation-flask-full/fares/calendar?departure=AUS&arrival=NYC&month=2024-02"
+    )
+    assert response.status_code == 200
+    assert [day["min"] for day in response.json["days"]] == [120.0, 90.0]
+    assert response.json["summary"]["flights"] == 3
+    assert sqlite_client.get(
+        "/flightreservation-flask-full/fares/calendar?departure=AUS&arrival=NYC&month=Feb"
+    ).status_code == 400
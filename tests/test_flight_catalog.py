@@ -0,0 +1,70 @@
+"""
+Tests for the columnar, memory-mapped flight catalog.
+"""
+
+from datetime import date, datetime, time
+import utils.flight_catalog
+from utils.flight_catalog import FlightCatalog, get_flight_catalog
+
+def _flights(make_flight):
+    return [
+        make_flight(5, flight_number="UA1", operating_airlines="United Airlines",
+                    departure_city="NYC", arrival_city="DAL", departure_time=time(10, 14, 7),
+                    price=210.5),
+        make_flight(1, departure_time=time(3, 14, 7)),
+        make_flight(2, date_of_departure=date(2024, 2, 6), departure_time=time(5, 14, 7), price=180.0),
+    ]
+
+def test_views_round_trip_through_memory_mapped_file(tmp_path, make_flight):
+    """
+    A saved catalog reopens through mmap with identical rows, sorted by id.
+    """
+    path = str(tmp_path / "catalog.bin")
+    FlightCatalog.build(_flights(make_flight)).save(path)
+    catalog = FlightCatalog.open(path)
+
+    assert [view.id for view in catalog] == [1, 2, 5]
+    view = catalog.get(5)
+    assert (view.flight_number, view.operating_airlines, view.departure_city,
+            view.arrival_city) == ("UA1", "United Airlines", "NYC", "DAL")
+    assert view.date_of_departure == date(2024, 2, 5)
+    assert view.estimated_departure_time == datetime(2024, 2, 5, 10, 14, 7)
+    assert view.price == 210.5
+    assert catalog.get(3) is None
+    assert not hasattr(view, "__dict__")
+
+    # Cities and airlines are interned once in the string table
+    assert catalog.strings.count("AUS") == 1
+    assert catalog.strings.count("American Airlines") == 1
+
+def test_replaced_catalog_file_is_reopened(sqlite_session, monkeypatch, tmp_path, make_flight):
+    """
+    A worker maps the new catalog file once another process has replaced it.
+    """
+    path = str(tmp_path / "catalog.bin")
+    monkeypatch.setattr(utils.flight_catalog, "_CATALOG", None)
+    monkeypatch.setenv("FLIGHT_CATALOG_PATH", path)
+    FlightCatalog.build(_flights(make_flight)[:1]).save(path)
+    with sqlite_session() as db:
+        catalog = get_flight_catalog(db)
+        assert [view.id for view in catalog] == [5]
+        assert get_flight_catalog(db) is catalog
+        FlightCatalog.build(_flights(make_flight)).save(path)
+        assert [view.id for view in get_flight_catalog(db)] == [1, 2, 5]
+
+def test_flights_endpoint_serves_catalog(sqlite_client, monkeypatch, tmp_path, make_flight, seed_flights):
+    """
+    With FLIGHT_CATALOG_PATH set, /flights returns the same JSON from the catalog file.
+    """
+    seed_flights(*_flights(make_flight))
+    from_db = sqlite_client.get("/flightreservation-flask-full/flights").get_data()
+
+    monkeypatch.setattr(utils.flight_catalog, "_CATALOG", None)
+    monkeypatch.setenv("FLIGHT_CATALOG_PATH", str(tmp_path / "catalog.bin"))
+    from_catalog = sqlite_client.get("/flightreservation-flask-full/flights").get_data()
+    assert from_catalog == from_db
+    assert b'"price":"210.5000000000"' in from_catalog.replace(b" ", b"")
+    assert (tmp_path / "catalog.bin").exists()
+    response = sqlite_client.get("/flightreservation-flask-full/flights/5")
+    assert response.json["flight_number"] == "UA1"
+    assert sqlite_client.get("/flightreservation-flask-full/flights/9").status_code == 404
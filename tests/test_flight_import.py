@@ -0,0 +1,127 @@
+"""
+Tests for the streaming flight schedule import.
+"""
+
+import io
+import json
+from datetime import date, datetime
+from database.sharding import ShardRouter
+from models.models import Flight
+import utils.flight_catalog
+from utils.flight_catalog import get_flight_catalog
+from utils.flight_import import FIELDS, FlightImporter, import_stream, main, read_rows, upsert_flights
+
+BASE_URL = "/flightreservation-flask-full"
+SCHEDULE = """flight_number,operating_airlines,departure_city,arrival_city,date_of_departure,estimated_departure_time,price
+AA1,American Airlines,aus,nyc,2024-02-05,03:14,200
+aa 2,American Airlines,AUS,NYC,02/05/2024,2024-02-05T05:14:07,199.999
+AA1,American Airlines,AUS,NYC,2024-02-05,04:00,180
+UA1,United Airlines,NYC,NYC,2024-02-05,10:14,200
+UA2,United Airlines,NYC,DAL,2024-02-31,10:14,200
+UA3,United Airlines,NYC,DAL,2024-02-05,10:14,cheap
+,United Airlines,NYC,DAL,2024-02-05,10:14,100
+"""
+
+def test_csv_rows_are_validated_deduplicated_and_upserted(sqlite_session, make_flight, seed_flights):
+    """
+    Valid rows are normalized and upserted once per flight; invalid rows are reported.
+    """
+    seed_flights(make_flight(7, flight_number="AA2", price=500.0))
+    progress = []
+    report = import_stream(io.BytesIO(SCHEDULE.encode()), "csv", chunk_size=2,
+                           progress=lambda r: progress.append(r.rows))
+    summary = report.as_dict()
+    assert (summary["rows"], summary["imported"], summary["duplicates"], summary["rejected"]) == (7, 2, 1, 4)
+    assert [(r["line"], r["error"]) for r in summary["rejects"]] == [
+        (5, "departure_city and arrival_city are the same"),
+        (6, "date_of_departure must be YYYY-MM-DD or MM/DD/YYYY"),
+        (7, "price must be a number"),
+        (8, "flight_number is required"),
+    ]
+    assert progress == [2]  # After the first full chunk
+
+    with sqlite_session() as db:
+        flights = {f.flight_number: f for f in db.query(Flight)}
+        assert set(flights) == {"AA1", "AA2"}
+        assert flights["AA1"].estimated_departure_time == datetime(2024, 2, 5, 4, 0)
+        assert flights["AA1"].departure_city == "AUS"
+        assert (flights["AA2"].id, flights["AA2"].version, float(flights["AA2"].price)) == (7, 2, 200.0)
+
+def test_other_dialects_update_then_insert(sqlite_session, make_flight, seed_flights, monkeypatch):
+    """
+    Without a native upsert, existing flights are updated and the others inserted.
+    """
+    seed_flights(make_flight(7, flight_number="AA2", price=500.0))
+    rows = [
+        {name: getattr(make_flight(flight_number=number, price=price), name) for name in FIELDS}
+        for number, price in (("AA2", 200.0), ("AA3", 300.0))
+    ]
+    with sqlite_session() as db:
+        connection = db.connection()
+        monkeypatch.setattr(connection.dialect, "name", "postgresql")
+        upsert_flights(connection, rows)
+        db.commit()
+    monkeypatch.undo()
+
+    with sqlite_session() as db:
+        flights = {f.flight_number: (f.id, f.version, float(f.price)) for f in db.query(Flight)}
+    assert flights["AA2"] == (7, 2, 200.0)
+    assert flights["AA3"][1:] == (1, 300.0)
+
+def test_import_endpoint_requires_a_token(sqlite_client, sqlite_session, monkeypatch, route_graph):  # pylint: disable=unused-argument
+    """
+    The endpoint streams a JSON Lines body and is disabled without IMPORT_TOKEN.
+    """
+    body = "\n".join([
+        json.dumps({"flight_number": "DL5", "operating_airlines": "Delta", "departure_city": "ATL",
+                    "arrival_city": "LAX", "date_of_departure": "2024-03-01",
+                    "estimated_departure_time": "2024-03-01 09:30:00", "price": 321.5}),
+        "{not json",
+    ])
+    url = f"{BASE_URL}/flights/import?format=jsonl"
+    assert sqlite_client.post(url, data=body).status_code == 403
+    monkeypatch.setenv("IMPORT_TOKEN", "secret")
+    assert sqlite_client.post(url, data=body, headers={"Authorization": "Bearer wrong"}).status_code == 403
+    response = sqlite_client.post(url, data=body, headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    assert (response.get_json()["imported"], response.get_json()["rejected"]) == (1, 1)
+    with sqlite_session() as db:
+        assert db.query(Flight).one().arrival_city == "LAX"
+
+    # The route graph was rebuilt, so the new flight is searchable right away
+    response = sqlite_client.get(f"{BASE_URL}/connections?departure=ATL&arrival=LAX"
+                                 "&date_of_departure=2024-03-01")
+    assert [i["legs"][0]["flight_number"] for i in response.get_json()] == ["DL5"]
+
+def test_workers_see_imported_flights_in_the_catalog(sqlite_session, monkeypatch, tmp_path):
+    """
+    A worker still holding the catalog from before the import maps the rewritten file.
+    """
+    monkeypatch.setattr(utils.flight_catalog, "_CATALOG", None)
+    monkeypatch.setenv("FLIGHT_CATALOG_PATH", str(tmp_path / "catalog.bin"))
+    with sqlite_session() as db:
+        stale = get_flight_catalog(db)
+    assert len(stale) == 0
+    import_stream(io.BytesIO(SCHEDULE.encode()), "csv")
+    monkeypatch.setattr(utils.flight_catalog, "_CATALOG", stale)  # As in a worker that did not import
+    with sqlite_session() as db:
+        assert sorted(view.flight_number for view in get_flight_catalog(db)) == ["AA1", "AA2"]
+
+def test_flights_keep_the_same_id_on_every_shard(tmp_path, sqlite_shards, make_flight, seed_flights):
+    """
+    Imported flights get their id on the primary database and keep it on the other shards.
+    """
+    factories = sqlite_shards(3)
+    router = ShardRouter(factories, worker_id=0)
+    seed_flights(make_flight(40, flight_number="ZZ9", date_of_departure=date(2024, 1, 1)),
+                 session_factory=factories[0])  # Ids on the primary already differ from row order
+    rows = read_rows(io.StringIO(SCHEDULE), "csv")
+    assert FlightImporter(router, chunk_size=1).run(rows).imported == 2
+    ids = router.scatter(lambda db: sorted((f.id, f.flight_number) for f in db.query(Flight)
+                                           if f.flight_number != "ZZ9"))
+    assert ids[0] == ids[1] == ids[2] == [(41, "AA1"), (42, "AA2")]
+
+    path = tmp_path / "schedule.csv"
+    path.write_text(SCHEDULE, encoding="utf-8")
+    assert main([str(path), "--rejects", str(tmp_path / "rejects.jsonl")]) == 1  # Some rows rejected
+    assert len((tmp_path / "rejects.jsonl").read_text(encoding="utf-8").splitlines()) == 4
@@ -0,0 +1,119 @@
+"""
+Tests for Idempotency-Key handling on the booking endpoints.
+"""
+
+import time
+import threading
+import pytest
+import utils.idempotency
+from models.models import Passenger, Reservation
+from utils.idempotency import (
+    IN_PROGRESS, MISMATCH, NEW, REPLAY, MemoryIdempotencyStore, SqlIdempotencyStore, StoredResponse,
+)
+
+BASE_URL = "/flightreservation-flask-full"
+BOOKING = {
+    "flight_id": 1, "first_name": "John", "last_name": "Doe",
+    "email": "john.doe@example.com", "phone": "1234567890",
+    "card_number": "4111111111111111", "amount": 200.00,
+}
+
+@pytest.fixture(name="flight")
+def fixture_flight(monkeypatch, seed_flights):
+    """
+    One flight in the SQLite database and a fresh in-memory idempotency store.
+    """
+    monkeypatch.setattr(utils.idempotency, "_STORE", MemoryIdempotencyStore())
+    seed_flights(1)
+
+def test_retried_booking_is_replayed(sqlite_client, sqlite_session, flight):  # pylint: disable=unused-argument
+    """
+    A retry with the same key returns the stored confirmation without a second booking.
+    """
+    headers = {"Idempotency-Key": "booking-1"}
+    first = sqlite_client.post(f"{BASE_URL}/createReservation", data=BOOKING, headers=headers)
+    second = sqlite_client.post(f"{BASE_URL}/createReservation", data=BOOKING, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert second.data == first.data
+    assert second.headers["Idempotent-Replayed"] == "true"
+    with sqlite_session() as db:
+        assert db.query(Reservation).count() == 1
+        assert db.query(Passenger).count() == 1
+
+    changed = dict(BOOKING, amount=300.00)
+    response = sqlite_client.post(f"{BASE_URL}/createReservation", data=changed, headers=headers)
+    assert response.status_code == 422
+
+    sqlite_client.post(f"{BASE_URL}/createReservation", data=BOOKING)
+    with sqlite_session() as db:
+        assert db.query(Reservation).count() == 2  # Requests without a key are not deduplicated
+
+def test_payment_is_processed_once(sqlite_client, flight, monkeypatch):  # pylint: disable=unused-argument
+    """
+    Retrying payment completion does not charge the card again.
+    """
+    sqlite_client.post(f"{BASE_URL}/createReservation", data=BOOKING)
+    charges = []
+    monkeypatch.setattr("routes.flight_routes.process_payment",
+                        lambda card, amount: charges.append(amount) or True)
+    headers = {"Idempotency-Key": "payment-1"}
+    for _ in range(3):
+        response = sqlite_client.post(f"{BASE_URL}/completeReservation",
+                                      data={"reservation_id": 1}, headers=headers)
+        assert response.status_code == 200
+    assert len(charges) == 1
+
+def _concurrent_duplicate(store):
+    store_key, results = "POST:/createReservation:k", []
+    assert store.begin(store_key, "abc") == (NEW, None)
+    waiter = threading.Thread(target=lambda: results.append(store.begin(store_key, "abc")))
+    waiter.start()
+    time.sleep(0.1)
+    assert not results  # Still waiting for the first request
+    store.complete(store_key, StoredResponse(200, b"confirmed", "text/html"))
+    waiter.join(timeout=5)
+    assert results == [(REPLAY, StoredResponse(200, b"confirmed", "text/html"))]
+    assert store.begin(store_key, "other")[0] == MISMATCH
+
+def test_concurrent_duplicate_waits_for_first_request_in_memory():
+    """
+    A duplicate arriving while the first request runs waits and then gets its response.
+    """
+    _concurrent_duplicate(MemoryIdempotencyStore())
+
+def test_concurrent_duplicate_waits_for_first_request_in_database(sqlite_session):
+    """
+    The database store gives the same guarantees across processes.
+    """
+    _concurrent_duplicate(SqlIdempotencyStore(sqlite_session, poll_interval=0.01))
+
+def test_entries_expire_and_failures_can_be_retried(sqlite_session):
+    """
+    Expired or abandoned keys can be used again.
+    """
+    memory = MemoryIdempotencyStore(ttl=0.05)
+    assert memory.begin("k", "abc")[0] == NEW
+    memory.complete("k", StoredResponse(200, b"ok", "text/html"))
+    time.sleep(0.1)
+    assert memory.begin("k", "abc")[0] == NEW
+
+    database = SqlIdempotencyStore(sqlite_session, ttl=-1)
+    assert database.begin("k", "abc")[0] == NEW
+    assert database.purge_expired() == 1
+    assert database.begin("k", "abc")[0] == NEW
+    database.abandon("k")
+    assert database.begin("k", "abc")[0] == NEW
+
+def test_expired_lease_of_a_crashed_request_is_taken_over(sqlite_session):
+    """
+    A key whose request never finished is blocked only until its lease runs out.
+    """
+    crashed = SqlIdempotencyStore(sqlite_session, wait_timeout=0.01, lease=0.05)
+    retry = SqlIdempotencyStore(sqlite_session, wait_timeout=0.01, poll_interval=0.01)
+    assert crashed.begin("k", "abc")[0] == NEW
+    assert retry.begin("k", "abc")[0] == IN_PROGRESS
+    time.sleep(0.1)
+    assert retry.begin("k", "abc")[0] == NEW
+    assert crashed.begin("k", "abc")[0] == IN_PROGRESS  # The new lease is held by the retry
+    retry.complete("k", StoredResponse(200, b"ok", "text/html"))
+    assert retry.begin("k", "abc")[0] == REPLAY
@@ -0,0 +1,111 @@
+"""
+Tests for the transactional outbox and its in-process worker.
+"""
+
+import json
+import time
+from datetime import datetime, timedelta
+from models.models import OutboxDeadLetter, OutboxMessage
+from utils.outbox import OutboxWorker, enqueue
+
+BASE_URL = "/flightreservation-flask-full"
+
+def _topics(session_factory):
+    with session_factory() as db:
+        return [message.topic for message in db.query(OutboxMessage).order_by(OutboxMessage.id)]
+
+def test_booking_flow_writes_outbox_messages(sqlite_client, sqlite_session, seed_flights):
+    """
+    Reservation and check-in commit their side effects to the outbox instead of running them.
+    """
+    seed_flights(1)
+    response = sqlite_client.post(f"{BASE_URL}/createReservation", data={
+        "flight_id": 1, "first_name": "John", "last_name": "Doe",
+        "email": "john.doe@example.com", "phone": "1234567890",
+        "card_number": "4111111111111111", "amount": 200.00,
+    })
+    assert response.status_code == 200
+    response = sqlite_client.post(f"{BASE_URL}/completeCheckIn",
+                                  data={"reservation_id": 1, "number_of_bags": 2})
+    assert response.status_code == 200
+    assert sqlite_client.post(f"{BASE_URL}/completeCheckIn",
+                              data={"reservation_id": 1, "number_of_bags": "two"}).status_code == 400
+    assert _topics(sqlite_session) == ["reservation.created", "reservation.checked_in"]
+
+    delivered = []
+    worker = OutboxWorker(sqlite_session, handlers={
+        "reservation.created": delivered.append,
+        "reservation.checked_in": delivered.append,
+    })
+    assert worker.drain() == 2
+    assert delivered == [{"reservation_id": 1}, {"reservation_id": 1, "number_of_bags": 2}]
+    assert _topics(sqlite_session) == []
+
+def test_rolled_back_transaction_leaves_no_message(sqlite_session):
+    """
+    Messages are only visible if the enclosing transaction commits.
+    """
+    with sqlite_session() as db:
+        enqueue(db, "reservation.created", {"reservation_id": 7})
+        db.rollback()
+    assert _topics(sqlite_session) == []
+
+def test_failed_messages_retry_with_backoff_then_dead_letter(sqlite_session):
+    """
+    A failing handler is retried after a backoff and dead-lettered after max attempts.
+    """
+    now = [datetime(2024, 2, 5, 12, 0)]
+    calls = []
+
+    def flaky(payload):
+        calls.append(payload)
+        raise RuntimeError("mail server down")
+
+    worker = OutboxWorker(sqlite_session, handlers={"reservation.paid": flaky},
+                          max_attempts=3, base_delay=10, clock=lambda: now[0])
+    with sqlite_session() as db:
+        enqueue(db, "reservation.paid", {"reservation_id": 3}).available_at = now[0]
+        db.commit()
+
+    assert worker.run_once() == 1
+    assert worker.run_once() == 0  # Not due until the backoff expires
+    with sqlite_session() as db:
+        message = db.query(OutboxMessage).one()
+        assert message.attempts == 1
+        assert now[0] <= message.available_at <= now[0] + timedelta(seconds=10)
+        assert "mail server down" in message.last_error
+
+    for _ in range(2):
+        now[0] += timedelta(minutes=5)
+        assert worker.run_once() == 1
+
+    with sqlite_session() as db:
+        assert db.query(OutboxMessage).count() == 0
+        dead = db.query(OutboxDeadLetter).one()
+        assert (dead.topic, dead.attempts, json.loads(dead.payload)) == ("reservation.paid", 3,
+                                                                         {"reservation_id": 3})
+    assert len(calls) == 3
+    assert worker.metrics.as_dict()["retried"] == 2
+    assert worker.metrics.dead_lettered == 1
+
+def test_background_worker_drains_in_batches(sqlite_session):
+    """
+    The in-process worker thread delivers queued messages in batches and reports throughput.
+    """
+    with sqlite_session() as db:
+        for reservation_id in range(250):
+            enqueue(db, "reservation.created", {"reservation_id": reservation_id})
+        db.commit()
+
+    delivered = []
+    worker = OutboxWorker(sqlite_session, handlers={"reservation.created": delivered.append},
+                          batch_size=100)
+    worker.start(poll_interval=0.01)
+    deadline = time.monotonic() + 5
+    while len(delivered) < 250 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    worker.stop(timeout=5)
+
+    assert [payload["reservation_id"] for payload in delivered] == list(range(250))
+    assert worker.metrics.batches == 3
+    assert worker.metrics.throughput() > 0
@@ -0,0 +1,178 @@
+"""
+Unit and load tests for rate limiting and admission control.
+"""
+
+import sys
+import time
+import types
+import threading
+from flask import Blueprint, Flask
+from utils.rate_limit import (
+    PRIORITY_HIGH, PRIORITY_LOW, AdmissionController, MemoryBackend, RateLimiter, RedisBackend,
+    RoutePolicy, create_backend, install_traffic_controls,
+)
+
+SEARCH = RoutePolicy("search", PRIORITY_LOW, rate=1000.0, burst=1000)
+BOOKING = RoutePolicy("booking", PRIORITY_HIGH, rate=1000.0, burst=1000)
+
+def test_token_bucket_refills_over_time():
+    """
+    A bucket allows a burst, then refills at the configured rate.
+    """
+    now = [0.0]
+    limiter = RateLimiter(MemoryBackend(), clock=lambda: now[0])
+    policy = RoutePolicy("search", PRIORITY_LOW, rate=1.0, burst=2)
+
+    assert limiter.hit(policy, "1.2.3.4")[0]
+    assert limiter.hit(policy, "1.2.3.4")[0]
+    allowed, retry_after = limiter.hit(policy, "1.2.3.4")
+    assert not allowed
+    assert retry_after == 1.0
+    assert limiter.hit(policy, "5.6.7.8")[0]  # Other clients have their own bucket
+
+    now[0] = 1.0
+    assert limiter.hit(policy, "1.2.3.4")[0]
+
+def test_buckets_are_evicted_by_their_own_refill_time():
+    """
+    Idle buckets are dropped once they refilled at their own policy's rate, and the least
+    recently used ones go first above ``max_keys``.
+    """
+    backend = MemoryBackend(evict_every=1, evict_batch=10)
+    backend.consume("booking:a", rate=0.1, burst=10, now=0.0)  # Full again after 100 s
+    backend.consume("search:b", rate=10.0, burst=10, now=0.0)  # Full again after 1 s
+    backend.consume("search:c", rate=10.0, burst=10, now=5.0)
+    assert list(backend._buckets) == ["booking:a", "search:c"]  # pylint: disable=protected-access
+
+    backend = MemoryBackend(max_keys=2)
+    for second, key in enumerate(["a", "b", "a", "c"]):
+        backend.consume(key, rate=1.0, burst=100, now=float(second))
+    assert list(backend._buckets) == ["a", "c"]  # pylint: disable=protected-access
+
+class FakeRedis:  # pylint: disable=too-few-public-methods
+    """
+    Records token bucket script calls and answers them with queued ``(allowed, tokens)`` replies.
+    """
+
+    def __init__(self, replies=()):
+        self.replies = list(replies)
+        self.calls = []
+
+    def register_script(self, script):
+        """Return a callable standing in for the registered Lua script."""
+        assert "HMGET" in script and "EXPIRE" in script
+
+        def run(keys, args):
+            self.calls.append((keys, args))
+            return self.replies.pop(0)
+        return run
+
+    @classmethod
+    def from_url(cls, _url):
+        """Build a client the way ``redis.Redis.from_url`` does."""
+        return cls()
+
+def test_redis_backend_shares_buckets_through_a_script(monkeypatch):
+    """
+    Buckets are kept in Redis under a prefixed key, and RATE_LIMIT_REDIS_URL selects Redis.
+    """
+    client = FakeRedis(replies=[[1, "1"], [0, "0.25"]])
+    limiter = RateLimiter(RedisBackend(client), clock=lambda: 100.0)
+    policy = RoutePolicy("booking", PRIORITY_HIGH, rate=0.5, burst=2)
+    assert limiter.hit(policy, "1.2.3.4") == (True, 0.0)
+    assert limiter.hit(policy, "1.2.3.4") == (False, 1.5)  # 0.75 tokens missing at 0.5/s
+    assert client.calls[0] == (["ratelimit:booking:1.2.3.4"], [0.5, 2, 100.0, 1])
+
+    monkeypatch.delenv("RATE_LIMIT_REDIS_URL", raising=False)
+    assert isinstance(create_backend(), MemoryBackend)
+    monkeypatch.setenv("RATE_LIMIT_REDIS_URL", "redis://cache:6379/1")
+    monkeypatch.setitem(sys.modules, "redis", types.SimpleNamespace(Redis=FakeRedis))
+    assert isinstance(RateLimiter().backend, RedisBackend)
+
+def test_admission_reserves_slots_for_bookings():
+    """
+    Searches cannot take the slots reserved for bookings.
+    """
+    admission = AdmissionController(max_concurrency=3, reserved_high=1)
+    assert admission.try_admit(PRIORITY_LOW) is None
+    assert admission.try_admit(PRIORITY_LOW) is None
+    assert admission.try_admit(PRIORITY_LOW) == "concurrency"
+    assert admission.try_admit(PRIORITY_HIGH) is None
+    assert admission.try_admit(PRIORITY_HIGH) == "concurrency"
+
+def test_admission_sheds_searches_on_latency_and_pool_usage():
+    """
+    Searches are shed while latency or pool usage is above the threshold.
+    """
+    usage = [0.0]
+    admission = AdmissionController(latency_threshold=0.1, pool_usage=lambda: usage[0])
+    admission.try_admit(PRIORITY_HIGH)
+    admission.release(PRIORITY_HIGH, 5.0)
+    admission.try_admit(PRIORITY_LOW)  # The single probe request is let through
+    assert admission.try_admit(PRIORITY_LOW) == "latency"
+    assert admission.try_admit(PRIORITY_HIGH) is None
+
+    admission = AdmissionController(pool_threshold=0.5, pool_usage=lambda: usage[0])
+    usage[0] = 0.9
+    assert admission.try_admit(PRIORITY_LOW) == "db_pool"
+
+def _build_app(admission):
+    """
+    Build an app whose search endpoint saturates a small fake DB pool.
+    """
+    pool = threading.Semaphore(4)
+    bp = Blueprint("load", __name__)
+
+    @bp.route("/search")
+    def search():
+        with pool:
+            time.sleep(0.05)
+        return "ok"
+
+    @bp.route("/book", methods=["POST"])
+    def book():
+        with pool:
+            time.sleep(0.005)
+        return "ok"
+
+    install_traffic_controls(
+        bp, RateLimiter(), admission, {"load.search": SEARCH, "load.book": BOOKING}
+    )
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+    return app
+
+def test_booking_latency_holds_while_searches_are_shed():
+    """
+    Under a search flood, bookings still succeed quickly and excess searches are shed.
+    """
+    admission = AdmissionController(max_concurrency=6, reserved_high=2, latency_threshold=1.0)
+    app = _build_app(admission)
+    stop = threading.Event()
+    search_statuses = []
+
+    def flood():
+        client = app.test_client()
+        while not stop.is_set():
+            search_statuses.append(client.get("/search").status_code)
+
+    flooders = [threading.Thread(target=flood) for _ in range(16)]
+    for thread in flooders:
+        thread.start()
+    time.sleep(0.1)
+
+    client = app.test_client()
+    latencies = []
+    for _ in range(20):
+        started = time.perf_counter()
+        assert client.post("/book").status_code == 200
+        latencies.append(time.perf_counter() - started)
+    stop.set()
+    for thread in flooders:
+        thread.join()
+
+    latencies.sort()
+    assert latencies[int(len(latencies) * 0.95) - 1] < 0.2
+    assert 503 in search_statuses
+    assert 200 in search_statuses
+    assert admission.shed_count > 0
@@ -0,0 +1,136 @@
+"""
+Tests for the multi-leg route graph and the /connections endpoint.
+"""
+
+import random
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import insert
+import utils.route_graph
+from models.models import Flight
+from utils.route_graph import Leg, RouteGraph, get_route_graph
+
+DAY = date(2024, 2, 5)
+
+def _leg(flight_id, origin, destination, hour, price, block=timedelta(hours=2)):
+    departure = datetime(2024, 2, 5, hour, 14)
+    return Leg(flight_id, f"F{flight_id}", "Test Air", origin, destination,
+               departure, departure + block, price)
+
+def _sample_graph():
+    graph = RouteGraph()
+    graph.load([
+        _leg(1, "AUS", "NYC", 3, 200.0),
+        _leg(4, "AUS", "NYC", 7, 150.0),
+        _leg(5, "NYC", "DAL", 10, 200.0),
+        _leg(6, "AUS", "DAL", 12, 500.0),
+        _leg(7, "AUS", "CHI", 6, 50.0),
+        _leg(8, "CHI", "DAL", 8, 60.0),  # Leaves before the CHI leg lands
+    ])
+    return graph
+
+def test_search_ranks_connections_by_price():
+    """
+    Connections are found through NYC and ranked by total price.
+    """
+    itineraries = _sample_graph().search("aus", "dal", DAY)
+    assert [[leg.flight_id for leg in it.legs] for it in itineraries] == [[4, 5], [1, 5], [6]]
+    assert itineraries[0].price == 350.0
+
+def test_search_respects_connection_time_and_max_legs():
+    """
+    Legs inside the minimum connection time and paths over ``max_legs`` are excluded.
+    """
+    graph = _sample_graph()
+    tight = graph.search("AUS", "DAL", DAY, min_connection=timedelta(hours=2))
+    assert [[leg.flight_id for leg in it.legs] for it in tight] == [[1, 5], [6]]
+    assert [it.legs[0].flight_id for it in graph.search("AUS", "DAL", DAY, max_legs=1)] == [6]
+
+def test_search_by_duration():
+    """
+    Ranking by duration puts the direct flight first.
+    """
+    itineraries = _sample_graph().search("AUS", "DAL", DAY, rank_by="duration")
+    assert [leg.flight_id for leg in itineraries[0].legs] == [6]
+
+def test_incremental_updates():
+    """
+    Upserting and removing flights updates the index without a rebuild.
+    """
+    graph = _sample_graph()
+    graph.upsert(_leg(9, "CHI", "DAL", 10, 60.0))
+    assert [leg.flight_id for leg in graph.search("AUS", "DAL", DAY)[0].legs] == [7, 9]
+    graph.remove(9)
+    graph.upsert(_leg(4, "AUS", "NYC", 9, 150.0))  # Rescheduled, misses the connection
+    assert [[leg.flight_id for leg in it.legs] for it in graph.search("AUS", "DAL", DAY)] == [[1, 5], [6]]
+
+def test_search_on_large_schedule():
+    """
+    On a 20k flight schedule, every itinerary connects within the allowed window and the
+    itineraries are ranked by price. Search latency is measured by
+    ``benchmarks/bench_route_graph.py``.
+    """
+    rng = random.Random(7)
+    cities = [f"C{i:03d}" for i in range(30)]
+    legs = []
+    for flight_id in range(20_000):
+        origin, destination = rng.sample(cities, 2)
+        departure = datetime(2024, 2, 1) + timedelta(minutes=rng.randrange(0, 10 * 24 * 60))
+        legs.append(Leg(flight_id, f"F{flight_id}", "Test Air", origin, destination,
+                        departure, departure + timedelta(hours=2), rng.uniform(50, 500)))
+    graph = RouteGraph()
+    graph.load(legs)
+
+    for origin, destination in zip(cities[:10], cities[10:20]):
+        itineraries = graph.search(origin, destination, date(2024, 2, 5))
+        assert itineraries
+        assert [it.price for it in itineraries] == sorted(it.price for it in itineraries)
+        for it in itineraries:
+            assert (it.legs[0].departure_city, it.legs[-1].arrival_city) == (origin, destination)
+            assert it.legs[0].departure.date() == date(2024, 2, 5) and len(it.legs) <= 3
+            for leg, following in zip(it.legs, it.legs[1:]):
+                assert leg.arrival_city == following.departure_city
+                assert timedelta(minutes=45) <= following.departure - leg.arrival <= timedelta(hours=12)
+
+def test_graph_is_rebuilt_after_ttl(sqlite_session, route_graph):  # pylint: disable=unused-argument
+    """
+    Flights written without the ORM, e.g. by another process, appear once the graph expires.
+    """
+    with sqlite_session() as db:
+        graph = get_route_graph(db)
+        db.execute(insert(Flight).values(
+            id=1, flight_number="AA1", operating_airlines="American Airlines",
+            departure_city="AUS", arrival_city="NYC", date_of_departure=DAY,
+            estimated_departure_time=datetime(2024, 2, 5, 7, 14), price=200.0))
+        db.commit()
+        assert get_route_graph(db) is graph and len(graph) == 0
+        assert len(get_route_graph(db, ttl=0)) == 1
+
+def test_searches_keep_the_old_graph_during_a_rebuild(sqlite_session, route_graph):  # pylint: disable=unused-argument
+    """
+    While one request rebuilds an expired graph, other requests are served the current one
+    instead of waiting for the lock.
+    """
+    with sqlite_session() as db:
+        graph = get_route_graph(db)
+        with utils.route_graph._GRAPH_LOCK:  # pylint: disable=protected-access  # A rebuild in progress
+            assert get_route_graph(db, ttl=0) is graph
+        assert get_route_graph(db, ttl=0) is not graph
+
+def test_connections_endpoint_tracks_committed_flights(sqlite_client, route_graph, make_flight, seed_flights):  # pylint: disable=unused-argument
+    """
+    The endpoint builds the graph once and picks up flights committed afterwards.
+    """
+    seed_flights(make_flight(1, departure_time=time(7, 14)))
+
+    url = "/flightreservation-flask-full/connections?departure=AUS&arrival=DAL&date_of_departure=02/05/2024"
+    assert sqlite_client.get(url).json == []
+
+    seed_flights(make_flight(5, flight_number="UA1", operating_airlines="United Airlines",
+                             departure_city="NYC", arrival_city="DAL", departure_time=time(10, 14)))
+
+    itineraries = sqlite_client.get(url).json
+    assert len(itineraries) == 1
+    assert itineraries[0]["stops"] == 1
+    assert [leg["flight_number"] for leg in itineraries[0]["legs"]] == ["AA1", "UA1"]
+    assert sqlite_client.get(url + "&sort=cheapest").status_code == 400
+    assert sqlite_client.get(url + "&min_connection_minutes=-300").status_code == 400
@@ -0,0 +1,132 @@
+"""
+Tests for sharding reservations by flight across several SQLite databases.
+"""
+
+import threading
+import pytest
+import database.database
+from database.sharding import IdGenerator, ShardMap, ShardRouter, shard_from_id
+from models.models import Passenger, Reservation
+
+BASE_URL = "/flightreservation-flask-full"
+
+@pytest.fixture(name="shards")
+def fixture_shards(monkeypatch, sqlite_shards, make_flight):
+    """
+    Three in-memory SQLite shards, each holding a copy of the flight reference data.
+    """
+    factories = sqlite_shards(3)
+    router = ShardRouter(factories, worker_id=0)
+    router.broadcast(lambda db: db.add_all([make_flight(flight_id) for flight_id in (1, 2, 3)]))
+    monkeypatch.setattr(database.database, "SessionLocal", factories[0])
+    monkeypatch.setattr(database.database, "router", router)
+    return router
+
+def test_ids_are_unique_and_encode_the_shard():
+    """
+    Generated ids never repeat across threads and shards and carry their shard.
+    """
+    generators = [IdGenerator(shard) for shard in range(4)]
+    ids = []
+    lock = threading.Lock()
+
+    def generate(generator):
+        batch = [generator.next_id() for _ in range(5_000)]
+        with lock:
+            ids.extend(batch)
+
+    threads = [threading.Thread(target=generate, args=(generator,))
+               for generator in generators for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == len(ids) == 40_000
+    assert {shard_from_id(row_id) for row_id in ids} == {0, 1, 2, 3}
+    assert shard_from_id(42) is None
+    assert ShardMap(3).shard_for_flight(7) == 1
+
+def test_workers_never_share_ids(monkeypatch):
+    """
+    Generators of different workers on the same shard and clock return different ids;
+    a sharded router cannot be created without a valid WORKER_ID.
+    """
+    clock = lambda: 1_750_000_000.0  # pylint: disable=unnecessary-lambda-assignment
+    first, second = IdGenerator(1, worker=3, clock=clock), IdGenerator(1, worker=4, clock=clock)
+    assert first.next_id() != second.next_id()
+    assert shard_from_id(first.next_id()) == 1
+
+    shards = [lambda: None, lambda: None]
+    monkeypatch.delenv("WORKER_ID", raising=False)
+    with pytest.raises(ValueError, match="WORKER_ID"):
+        ShardRouter(shards)
+    monkeypatch.setenv("WORKER_ID", "256")
+    with pytest.raises(ValueError, match="WORKER_ID"):
+        ShardRouter(shards)
+    with pytest.raises(ValueError, match="worker"):
+        ShardRouter(shards, worker_id=-1)
+    monkeypatch.setenv("WORKER_ID", "7")
+    assert shard_from_id(ShardRouter(shards).next_id(1)) == 1
+
+def test_reservations_are_written_to_the_flight_shard(sqlite_client, shards):
+    """
+    Bookings land on the shard of their flight and check-in finds them by id alone.
+    """
+    reservation_ids = {}
+    for flight_id in (1, 2, 3):
+        response = sqlite_client.post(f"{BASE_URL}/createReservation", data={
+            "flight_id": flight_id, "first_name": "John", "last_name": "Doe",
+            "email": "john.doe@example.com", "phone": "1234567890",
+            "card_number": "4111111111111111", "amount": 200.00,
+        })
+        assert response.status_code == 200
+        counts = shards.scatter(lambda db: db.query(Reservation).count())
+        reservation_ids[flight_id] = shards.scatter(
+            lambda db: [r.id for r in db.query(Reservation)]
+        )[flight_id % 3]
+    assert counts == [1, 1, 1]
+
+    reservation_id = reservation_ids[2][0]
+    assert shards.shard_for_reservation(reservation_id) == 2
+    response = sqlite_client.post(f"{BASE_URL}/completeCheckIn",
+                                  data={"reservation_id": reservation_id, "number_of_bags": 1})
+    assert response.status_code == 200
+    with shards.session(2) as db:
+        assert db.get(Reservation, reservation_id).checked_in
+
+def test_legacy_ids_are_found_by_scatter_gather(shards):
+    """
+    Reservations with auto-increment ids are located by querying every shard.
+    """
+    with shards.session(1) as db:
+        passenger = Passenger(id=10, first_name="Jane", last_name="Doe", email="jane@example.com")
+        db.add(passenger)
+        db.add(Reservation(id=10, passenger_id=10, flight_id=1, amount=100.0))
+        db.commit()
+    assert shards.shard_for_reservation(10) == 1
+    assert shards.shard_for_reservation(11) is None
+    assert database.database.shard_for(reservation_id=11) == 0
+
+def test_large_legacy_ids_are_not_decoded(shards):
+    """
+    Auto-increment ids above the old shard and sequence bits are still found by scatter-gather.
+    """
+    legacy_id = 4_198_400  # Would decode to shard 1 without the generated id marker
+    with shards.session(0) as db:
+        db.add(Passenger(id=legacy_id, first_name="Jane", last_name="Doe", email="jane@example.com"))
+        db.add(Reservation(id=legacy_id, passenger_id=legacy_id, flight_id=3, amount=100.0))
+        db.commit()
+    assert shard_from_id(legacy_id) is None
+    assert shards.shard_for_reservation(legacy_id) == 0
+
+def test_moved_reservations_are_found_on_their_new_shard(shards):
+    """
+    A generated id whose row was re-homed to another shard is found by scatter-gather.
+    """
+    reservation_id = shards.next_id(1)
+    with shards.session(2) as db:
+        db.add(Passenger(id=reservation_id, first_name="Jane", last_name="Doe", email="jane@example.com"))
+        db.add(Reservation(id=reservation_id, passenger_id=reservation_id, flight_id=2, amount=100.0))
+        db.commit()
+    assert shard_from_id(reservation_id) == 1
+    assert shards.shard_for_reservation(reservation_id) == 2
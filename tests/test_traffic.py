@@ -0,0 +1,101 @@
+"""
+Tests for traffic capture and deterministic replay.
+"""
+
+import time
+import pytest
+from models.models import Reservation
+from utils import traffic
+from utils.traffic import (
+    FlaskTarget, Replayer, TrafficRecorder, diff, load_records, main, mask, summarize,
+)
+
+BASE_URL = "/flightreservation-flask-full"
+BOOKING = {
+    "flight_id": "1", "first_name": "John", "last_name": "Doe", "email": "john.doe@example.com",
+    "phone": "512-555-0100", "card_number": "4111111111111111", "amount": "200.00",
+}
+
+@pytest.fixture(name="capture")
+def fixture_capture(sqlite_session, sqlite_client, tmp_path, monkeypatch, seed_flights):
+    """
+    Capture a search, a booking and its check-in into a file; return the file path.
+    """
+    seed_flights(1)
+    path = tmp_path / "capture.jsonl"
+    recorder = TrafficRecorder(str(path), salt="test")
+    monkeypatch.setattr(traffic, "recorder", recorder)
+    sqlite_client.post(f"{BASE_URL}/findFlights", data={"departure": "AUS", "arrival": "NYC"})
+    sqlite_client.post(f"{BASE_URL}/createReservation", data=BOOKING)
+    with sqlite_session() as db:
+        reservation_id = db.query(Reservation).one().id
+    sqlite_client.post(f"{BASE_URL}/completeCheckIn",
+                       data={"reservation_id": str(reservation_id), "number_of_bags": "2"})
+    recorder.close()
+    monkeypatch.setattr(traffic, "recorder", None)
+    return path
+
+def test_capture_masks_personal_data(capture):
+    """
+    Card numbers, emails, phones and names are replaced by pseudonyms of the same shape.
+    """
+    text = capture.read_text(encoding="utf-8")
+    for value in ("4111111111111111", "john.doe@example.com", "512-555-0100", "John", "Doe"):
+        assert value not in text
+    records = load_records(capture)
+    assert [r["endpoint"] for r in records] == [
+        "flights.find_flights", "flights.create_reservation", "flights.complete_check_in",
+    ]
+    form = records[1]["form"]
+    assert form["card_number"] == mask("4111111111111111", "test") and form["card_number"].isdigit()
+    assert form["email"].count("@") == 1 and len(form["phone"]) == len(BOOKING["phone"])
+    assert (form["flight_id"], form["amount"]) == ("1", "200.00")
+    assert records[1]["reservation_id"] == int(records[2]["form"]["reservation_id"])
+    assert all(r["status"] == 200 and r["ms"] > 0 for r in records)
+
+def test_replay_maps_created_reservations(capture, sqlite_client, sqlite_session):  # pylint: disable=unused-argument
+    """
+    A replayed check-in uses the reservation created by the replayed booking, not the
+    captured one, and the run matches the capture.
+    """
+    records = load_records(capture)
+    with sqlite_session() as db:  # Undo the captured check-in
+        db.query(Reservation).update({"checked_in": False, "number_of_bags": 0})
+        db.commit()
+    results = Replayer(FlaskTarget(sqlite_client.application), speed=0, threads=4).run(records)
+    assert [r["status"] for r in results] == [200, 200, 200]
+    assert diff(records, results)["status_changes"] == []
+    with sqlite_session() as db:
+        captured, replayed = db.query(Reservation).order_by(Reservation.id)
+        assert captured.id == records[1]["reservation_id"] and not captured.checked_in
+        assert (replayed.checked_in, replayed.number_of_bags) == (True, 2)
+    summary = summarize(results)
+    assert summary["all"]["count"] == 3 and summary["all"]["p50"] <= summary["all"]["p99"]
+
+def test_replay_pacing_and_report(tmp_path, capsys):
+    """
+    Requests keep their relative timing divided by the speed; the report compares runs.
+    """
+    class Target:  # pylint: disable=too-few-public-methods
+        """Records when requests arrive."""
+        def __init__(self):
+            self.sent = []
+
+        def send(self, record):
+            """Answer every request with the status in its path."""
+            self.sent.append((record["seq"], time.perf_counter()))
+            return int(record["path"][1:]), b""
+
+    records = [{"seq": i, "ts": 100 + i * 0.5, "method": "GET", "path": f"/{status}",
+                "endpoint": "e", "status": 200, "ms": 1.0} for i, status in enumerate([200, 500, 200])]
+    target = Target()
+    results = Replayer(target, speed=5, threads=2).run(records)
+    assert target.sent[2][1] - target.sent[0][1] >= 0.19  # 1s of capture at 5x
+    assert [c["seq"] for c in diff(records, results)["status_changes"]] == [1]
+    assert summarize(results)["e"]["errors"] == 1
+
+    baseline, current = tmp_path / "baseline.jsonl", tmp_path / "current.jsonl"
+    traffic._write_results(baseline, records)  # pylint: disable=protected-access
+    traffic._write_results(current, results)  # pylint: disable=protected-access
+    assert main(["report", str(current), "--baseline", str(baseline)]) == 0
+    assert "1 requests changed status" in capsys.readouterr().out
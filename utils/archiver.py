@@ -0,0 +1,194 @@
+"""
+Archival of departed flights and their reservations.
+
+``Archiver`` moves flights that departed before a cutoff date, together with their
+reservations, out of the hot ``flight`` and ``reservation`` tables in small batches. Each
+batch is copied to a sink and deleted in one transaction:
+
+* ``TableSink`` copies rows into ``flight_archive`` and ``reservation_archive``.
+* ``JsonlSink`` writes one gzip-compressed JSON Lines file per batch, for cold storage.
+
+Passengers and the booking counters in ``flight_stats``/``daily_stats`` are kept. Run it
+periodically on every shard::
+
+    python -m utils.archiver --older-than-days 30 [--to-files /data/archive]
+
+Setting ``ACTIVE_WINDOW_DAYS`` restricts flight searches and listings to flights departing
+at most that many days ago, so they never touch historical rows (and, with the partitioned
+schema in ``sql-scripts/migrations/003-partitioning.sql``, only read recent partitions).
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import logging
+import argparse
+from datetime import date, timedelta
+from sqlalchemy import delete, insert, select
+import database.database
+from models.models import Flight, FlightArchive, Reservation, ReservationArchive
+from utils.flight_caches import refresh_derived_caches
+
+def active_window_start(today=None):
+    """
+    Return the earliest departure date served by search queries, or ``None`` when
+    ``ACTIVE_WINDOW_DAYS`` is not set.
+    """
+    days = os.getenv("ACTIVE_WINDOW_DAYS")
+    if not days:
+        return None
+    return (today or date.today()) - timedelta(days=int(days))
+
+def only_active(stmt):
+    """
+    Restrict a ``Flight`` query or select to the active window.
+    """
+    start = active_window_start()
+    return stmt if start is None else stmt.where(Flight.date_of_departure >= start)
+
+class TableSink:
+    """
+    Copies archived rows into the archive tables, atomically with their deletion.
+    """
+
+    @staticmethod
+    def _columns(table, rows):
+        names = [column.name for column in table.columns if column.name != "archived_at"]
+        return [{name: row[name] for name in names} for row in rows]
+
+    def write(self, db, _shard, flights, reservations):
+        """
+        Insert the rows of one batch.
+        """
+        if reservations:
+            db.execute(insert(ReservationArchive),
+                       self._columns(ReservationArchive.__table__, reservations))
+        db.execute(insert(FlightArchive), self._columns(FlightArchive.__table__, flights))
+
+class JsonlSink:
+    """
+    Writes each batch to ``<directory>/shard<N>-flights-<first id>-<last id>.jsonl.gz``.
+
+    The file is complete on disk before the rows are deleted. If the deletion fails the
+    same batch is selected again on the next run and its file is overwritten.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, _db, shard, flights, reservations):
+        """
+        Write the rows of one batch, one JSON document per line.
+        """
+        path = os.path.join(
+            self.directory, f"shard{shard}-flights-{flights[0]['id']}-{flights[-1]['id']}.jsonl.gz"
+        )
+        temporary = path + ".tmp"
+        with gzip.open(temporary, "wt", encoding="utf-8") as file:
+            for table, rows in (("flight", flights), ("reservation", reservations)):
+                for row in rows:
+                    file.write(json.dumps({"table": table, **row}, default=str) + "\n")
+        with open(temporary, "rb") as file:
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+
+class Archiver:
+    """
+    Moves departed flights and their reservations of one shard to a sink in batches.
+    """
+
+    def __init__(self, session_factory, sink=None, shard=0, batch_size=200, pause=0.0):
+        self.session_factory = session_factory
+        self.sink = sink or TableSink()
+        self.shard = shard
+        self.batch_size = batch_size
+        self.pause = pause
+
+    def archive_batch(self, cutoff):
+        """
+        Archive up to ``batch_size`` flights departing before ``cutoff``.
+
+        Returns:
+            A ``(flights, reservations)`` tuple with the number of rows archived.
+        """
+        with self.session_factory() as db:
+            flights = [dict(row) for row in db.execute(
+                select(Flight.__table__)
+                .where(Flight.date_of_departure < cutoff)
+                .order_by(Flight.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)  # Held until the flights are deleted
+            ).mappings()]
+            if not flights:
+                return 0, 0
+            flight_ids = [flight["id"] for flight in flights]
+            # There is no foreign key to stop a booking on these flights, so their reservations
+            # are locked too (next-key locks on idx_reservation_flight also block new ones), and
+            # only the reservations that were copied are deleted.
+            reservations = [dict(row) for row in db.execute(
+                select(Reservation.__table__)
+                .where(Reservation.flight_id.in_(flight_ids))
+                .with_for_update()
+            ).mappings()]
+            self.sink.write(db, self.shard, flights, reservations)
+            db.execute(delete(Reservation).where(
+                Reservation.id.in_([reservation["id"] for reservation in reservations])
+            ))
+            db.execute(delete(Flight).where(Flight.id.in_(flight_ids)))
+            db.commit()
+            return len(flights), len(reservations)
+
+    def run(self, cutoff, max_batches=None):
+        """
+        Archive batches until no flight departing before ``cutoff`` is left.
+
+        Returns:
+            The total ``(flights, reservations)`` archived.
+        """
+        total_flights = total_reservations = batches = 0
+        while max_batches is None or batches < max_batches:
+            flights, reservations = self.archive_batch(cutoff)
+            if not flights:
+                break
+            total_flights += flights
+            total_reservations += reservations
+            batches += 1
+            logging.info("MYLOG: Shard %d: archived %d flights and %d reservations",
+                         self.shard, flights, reservations)
+            if self.pause:
+                time.sleep(self.pause)  # Leave room for bookings and replication
+        if total_flights:  # Bulk deletes bypass the ORM listeners
+            with self.session_factory() as db:
+                refresh_derived_caches(db, self.shard)
+        return total_flights, total_reservations
+
+def main(argv=None):
+    """
+    Archive departed flights on every shard.
+    """
+    parser = argparse.ArgumentParser(description="Archive departed flights and their reservations.")
+    parser.add_argument("--before", type=date.fromisoformat,
+                        help="Archive flights departing before this date (YYYY-MM-DD)")
+    parser.add_argument("--older-than-days", type=int,
+                        default=int(os.getenv("ARCHIVE_AFTER_DAYS", "30")))
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--pause", type=float, default=0.1, help="Seconds between batches")
+    parser.add_argument("--to-files", metavar="DIRECTORY",
+                        help="Write compressed JSON Lines files instead of archive tables")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    cutoff = args.before or date.today() - timedelta(days=args.older_than_days)
+    router = database.database.router
+    for shard, factory in enumerate(router.session_factories):
+        sink = JsonlSink(args.to_files) if args.to_files else TableSink()
+        flights, reservations = Archiver(factory, sink, shard, args.batch_size, args.pause).run(cutoff)
+        logging.info("MYLOG: Shard %d: %d flights and %d reservations before %s archived",
+                     shard, flights, reservations, cutoff)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""
+Materialized booking counters for the Flight Reservation Flask Application.
+
+``flight_stats`` holds the reservations, check-ins, bags and booked revenue of each flight
+and ``daily_stats`` the same totals per departure day, so reporting never scans the
+``reservation`` table. The counters are changed by a ``before_flush`` listener in the same
+transaction as the reservation rows, whichever code path adds, updates or deletes them
+through the ORM. Each shard keeps the counters of its own reservations.
+
+Bulk statements that bypass the ORM are not seen by the listener. ``reconcile`` recomputes
+the counters from the reservation table and repairs any drift. Counters of flights that are
+no longer in the ``flight`` table (moved away by ``utils.archiver``) are kept as they are,
+since their reservations are gone from the reservation table too::
+
+    python -m utils.booking_stats reconcile [--fix]
+    python -m utils.booking_stats rebuild
+"""
+
+import sys
+import logging
+import argparse
+from collections import defaultdict
+from sqlalchemy import case, delete, event, func, inspect, select
+from sqlalchemy.orm import Session
+import database.database
+from models.models import DailyStats, Flight, FlightStats, Reservation
+from utils.sql_utils import increment_counters
+
+COUNTERS = ("reservations", "checked_in", "bags", "revenue")
+TRACKED = ("flight_id", "checked_in", "number_of_bags", "amount")
+
+def stats_to_dict(row):
+    """
+    Serialize the counters of a ``FlightStats`` or ``DailyStats`` row (zeros for ``None``).
+    """
+    if row is None:
+        return {"reservations": 0, "checked_in": 0, "bags": 0, "revenue": 0.0}
+    return {
+        "reservations": row.reservations,
+        "checked_in": row.checked_in,
+        "bags": row.bags,
+        "revenue": round(float(row.revenue), 2),
+    }
+
+def _contribution(values):
+    """
+    Return what a reservation with ``values`` adds to its flight's counters.
+    """
+    return (1, 1 if values["checked_in"] else 0, int(values["number_of_bags"] or 0),
+            float(values["amount"] or 0))
+
+def _values(session, reservation, previous):
+    """
+    Read the tracked attributes of a reservation as they are now or, with ``previous``,
+    as they were when it was loaded. Attributes that were never loaded are read from the
+    database, which still holds the values from before this flush.
+    """
+    state = inspect(reservation)
+    values, missing = {}, []
+    for name in TRACKED:
+        history = state.attrs[name].history
+        if previous and history.deleted:
+            values[name] = history.deleted[0]
+        elif not previous and history.added:
+            values[name] = history.added[0]
+        elif history.unchanged:
+            values[name] = history.unchanged[0]
+        elif state.pending:  # Not inserted yet: unset attributes take their defaults
+            values[name] = None
+        else:
+            missing.append(name)
+    if missing:
+        row = session.connection().execute(
+            select(*(getattr(Reservation, name) for name in missing))
+            .where(Reservation.id == reservation.id)
+        ).one()
+        values.update(zip(missing, row))
+    return values
+
+def _record_changes(session, _flush_context, _instances):
+    """
+    Apply the counter changes of the reservations about to be flushed.
+    """
+    deltas = defaultdict(lambda: [0, 0, 0, 0.0])
+
+    def add(values, sign):
+        if values["flight_id"] is None:
+            return
+        for position, amount in enumerate(_contribution(values)):
+            deltas[int(values["flight_id"])][position] += sign * amount
+
+    for obj in session.new:
+        if isinstance(obj, Reservation):
+            add(_values(session, obj, previous=False), 1)
+    for obj in session.deleted:
+        if isinstance(obj, Reservation):
+            add(_values(session, obj, previous=True), -1)
+    for obj in session.dirty:
+        if isinstance(obj, Reservation) and session.is_modified(obj):
+            add(_values(session, obj, previous=True), -1)
+            add(_values(session, obj, previous=False), 1)
+    deltas = {flight_id: delta for flight_id, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+
+    connection = session.connection()
+    dates = {obj.id: obj.date_of_departure for obj in session.new
+             if isinstance(obj, Flight) and obj.id in deltas}
+    dates.update(connection.execute(
+        select(Flight.id, Flight.date_of_departure)
+        .where(Flight.id.in_(set(deltas) - set(dates)))
+    ).all())
+    daily = defaultdict(lambda: [0, 0, 0, 0.0])
+    # Lock rows in a fixed order (flights, then days) so concurrent bookings cannot deadlock
+    for flight_id in sorted(deltas):
+        if flight_id not in dates:
+            logging.warning("MYLOG: No flight %s for booking counters", flight_id)
+            continue
+        increment_counters(connection, FlightStats.__table__,
+                           {"flight_id": flight_id, "date_of_departure": dates[flight_id]},
+                           dict(zip(COUNTERS, deltas[flight_id])))
+        for position, amount in enumerate(deltas[flight_id]):
+            daily[dates[flight_id]][position] += amount
+    for day in sorted(daily):
+        increment_counters(connection, DailyStats.__table__, {"date_of_departure": day},
+                           dict(zip(COUNTERS, daily[day])))
+
+def install_stats_tracking():
+    """
+    Maintain the counters for reservations flushed by any ORM session.
+    """
+    if not event.contains(Session, "before_flush", _record_changes):
+        event.listen(Session, "before_flush", _record_changes)
+
+def compute_flight_stats(db):
+    """
+    Aggregate the reservation table of one shard into ``{flight_id: (date, counters)}``.
+    """
+    rows = db.execute(
+        select(Reservation.flight_id, Flight.date_of_departure, func.count(Reservation.id),
+               func.sum(case((Reservation.checked_in, 1), else_=0)),
+               func.coalesce(func.sum(Reservation.number_of_bags), 0),
+               func.coalesce(func.sum(Reservation.amount), 0))
+        .join(Flight, Flight.id == Reservation.flight_id)
+        .group_by(Reservation.flight_id, Flight.date_of_departure)
+    )
+    return {
+        flight_id: (day, (count, int(checked_in), int(bags), round(float(revenue), 2)))
+        for flight_id, day, count, checked_in, bags, revenue in rows
+    }
+
+def _counters(row):
+    return (row.reservations, row.checked_in, row.bags, round(float(row.revenue), 2))
+
+def _archived_flight_stats(db):
+    """
+    Return the stored counters of flights that are no longer in the ``flight`` table as
+    ``{flight_id: (date, counters)}``. They cannot be recomputed and are kept as they are.
+    """
+    active = set(db.scalars(select(Flight.id)))
+    return {row.flight_id: (row.date_of_departure, _counters(row))
+            for row in db.scalars(select(FlightStats)) if row.flight_id not in active}
+
+def _daily_totals(*flight_stats):
+    daily = defaultdict(lambda: (0, 0, 0, 0.0))
+    for stats in flight_stats:
+        for day, counters in stats.values():
+            daily[day] = tuple(round(a + b, 2) for a, b in zip(daily[day], counters))
+    return daily
+
+def reconcile(db, fix=False):
+    """
+    Compare the stored counters of one shard with the reservation table.
+
+    Returns:
+        A list of ``(table, key, stored, actual)`` tuples for every row that differs. With
+        ``fix`` the differences are added to the stored counters and committed. Bookings that
+        commit while this runs can leave a transient difference for the next run to repair.
+    """
+    actual = compute_flight_stats(db)
+    archived = _archived_flight_stats(db)
+    actual_daily = _daily_totals(actual, archived)
+    stored_flights = {row.flight_id: _counters(row) for row in db.scalars(select(FlightStats))
+                      if row.flight_id not in archived}
+    stored_daily = {row.date_of_departure: _counters(row) for row in db.scalars(select(DailyStats))}
+    differences = []
+    zero = (0, 0, 0, 0.0)
+    for flight_id in set(actual) | set(stored_flights):
+        expected = actual[flight_id][1] if flight_id in actual else zero
+        if stored_flights.get(flight_id, zero) != expected:
+            differences.append(("flight_stats", flight_id, stored_flights.get(flight_id), expected))
+    for day in set(actual_daily) | set(stored_daily):
+        if stored_daily.get(day, zero) != actual_daily.get(day, zero):
+            differences.append(("daily_stats", day, stored_daily.get(day), actual_daily.get(day, zero)))
+
+    if fix and differences:
+        connection = db.connection()
+        for table, key, before, after in differences:
+            delta = {name: round(new - old, 2)
+                     for name, new, old in zip(COUNTERS, after, before or zero)}
+            if table == "flight_stats":
+                day = actual[key][0] if key in actual else db.get(FlightStats, key).date_of_departure
+                increment_counters(connection, FlightStats.__table__,
+                                   {"flight_id": key, "date_of_departure": day}, delta)
+            else:
+                increment_counters(connection, DailyStats.__table__,
+                                   {"date_of_departure": key}, delta)
+        db.commit()
+    return differences
+
+def rebuild(db):
+    """
+    Replace the counters of one shard with values recomputed from the reservation table,
+    keeping those of archived flights. Meant for backfills while bookings are paused.
+    """
+    actual = compute_flight_stats(db)
+    archived = _archived_flight_stats(db)
+    db.execute(delete(FlightStats).where(FlightStats.flight_id.not_in(list(archived))))
+    db.execute(delete(DailyStats))
+    for flight_id, (day, counters) in actual.items():
+        db.add(FlightStats(flight_id=flight_id, date_of_departure=day,
+                           **dict(zip(COUNTERS, counters))))
+    db.add_all(DailyStats(date_of_departure=day, **dict(zip(COUNTERS, counters)))
+               for day, counters in _daily_totals(actual, archived).items())
+    db.commit()
+    return len(actual)
+
+install_stats_tracking()
+
+def main(argv=None):
+    """
+    Reconcile or rebuild the counters of every shard.
+    """
+    router = database.database.router
+    parser = argparse.ArgumentParser(description="Maintain the materialized booking counters.")
+    parser.add_argument("command", choices=["reconcile", "rebuild"])
+    parser.add_argument("--fix", action="store_true", help="Repair the differences found")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    drift = 0
+    for shard in range(len(router.session_factories)):
+        with router.session(shard) as db:
+            if args.command == "rebuild":
+                logging.info("MYLOG: Shard %d: rebuilt counters of %d flights", shard, rebuild(db))
+                continue
+            differences = reconcile(db, fix=args.fix)
+            for table, key, before, after in differences:
+                logging.warning("MYLOG: Shard %d: %s %s is %s, expected %s",
+                                shard, table, key, before, after)
+            drift += len(differences)
+    return 1 if drift and not args.fix else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
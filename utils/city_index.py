@@ -0,0 +1,209 @@
+"""
+In-memory city autocomplete for the Flight Reservation Flask Application.
+
+``CityIndex`` keeps every searchable key (the normalized city name and each of its later
+words, so "york" finds "New York") in one sorted array. A prefix lookup is a binary search.
+Short prefixes that match many keys have their best suggestions precomputed when the index
+is built, so no lookup ranks more than ``threshold`` candidates.
+
+Suggestions are ranked by popularity: the number of reservations on flights departing from
+or arriving at the city. ``CityPopularity`` loads those counts incrementally, reading only
+flights and reservations with an id above the last one it has seen on each shard, and is
+fully reloaded every ``CITY_INDEX_REBUILD`` seconds to pick up changed or deleted rows and
+reservations that committed after one with a higher id.
+"""
+
+import os
+import time
+import heapq
+import logging
+import threading
+from bisect import bisect_left
+from itertools import groupby
+from sqlalchemy import func, select, union
+from sqlalchemy.exc import SQLAlchemyError
+import database.database
+from models.models import Flight, Reservation
+
+REFRESH_SECONDS = float(os.getenv("CITY_INDEX_REFRESH", "60"))
+REBUILD_SECONDS = float(os.getenv("CITY_INDEX_REBUILD", "3600"))
+MAX_SUGGESTIONS = 20
+
+def normalize(text):
+    """
+    Case-fold a city name or query and collapse its whitespace.
+    """
+    return " ".join(text.casefold().split())
+
+class CityIndex:
+    """
+    Immutable prefix index over city names weighted by popularity.
+    """
+
+    def __init__(self, weights, top_k=MAX_SUGGESTIONS, threshold=64):
+        self.weights = dict(weights)
+        self.top_k = top_k
+        self.built_at = time.monotonic()
+        entries = []
+        for city in self.weights:
+            words = normalize(city).split(" ")
+            for start in range(len(words)):
+                entries.append((" ".join(words[start:]), city))
+        entries.sort()
+        self._keys = [key for key, _ in entries]
+        self._cities = [city for _, city in entries]
+        self._top = self._precompute(threshold)
+
+    def _rank(self, city):
+        return -self.weights[city], city
+
+    def _best(self, cities, limit):
+        return heapq.nsmallest(limit, set(cities), key=self._rank)
+
+    def _precompute(self, threshold):
+        """
+        Store the best suggestions of every prefix matching more than ``threshold`` keys.
+        Prefixes are only extended inside ranges that were still too large one level up.
+        """
+        top = {}
+        ranges, depth = [(0, len(self._keys))], 1
+        while ranges:
+            larger = []
+            for lo, hi in ranges:
+                position = lo
+                for prefix, group in groupby(self._keys[lo:hi], key=lambda key: key[:depth]):
+                    count = sum(1 for _ in group)
+                    if len(prefix) == depth and count > threshold:
+                        top[prefix] = self._best(self._cities[position:position + count], self.top_k)
+                        larger.append((position, position + count))
+                    position += count
+            ranges, depth = larger, depth + 1
+        return top
+
+    def suggest(self, query, limit=10):
+        """
+        Return up to ``limit`` cities with a word starting with ``query``, most popular first.
+        """
+        prefix = normalize(query)
+        limit = min(limit, self.top_k)
+        if not prefix or limit <= 0:
+            return []
+        cached = self._top.get(prefix)
+        if cached is not None:
+            return cached[:limit]
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + "\uffff", lo)
+        return self._best(self._cities[lo:hi], limit)
+
+    def __len__(self):
+        return len(self.weights)
+
+class CityPopularity:
+    """
+    Reservation counts per city, loaded incrementally from every shard.
+    """
+
+    def __init__(self):
+        self.weights = {}
+        self.last_flight_id = 0
+        self.last_reservation_ids = {}  # shard -> highest reservation id counted
+
+    def copy(self):
+        """
+        Return an independent copy, so a failed load leaves the original untouched.
+        """
+        clone = CityPopularity()
+        clone.weights = dict(self.weights)
+        clone.last_flight_id = self.last_flight_id
+        clone.last_reservation_ids = dict(self.last_reservation_ids)
+        return clone
+
+    def load(self, router):
+        """
+        Add cities and reservations created since the previous load.
+        Returns True if any weight changed.
+        """
+        changed = False
+        with router.session(0) as db:  # Flights are replicated to every shard
+            new_flights = Flight.id > self.last_flight_id
+            cities = union(
+                select(Flight.departure_city.label("city"), Flight.id).where(new_flights),
+                select(Flight.arrival_city.label("city"), Flight.id).where(new_flights),
+            ).subquery()
+            for city, last_id in db.execute(
+                select(cities.c.city, func.max(cities.c.id)).group_by(cities.c.city)
+            ):
+                if city not in self.weights:
+                    self.weights[city] = 0
+                    changed = True
+                self.last_flight_id = max(self.last_flight_id, last_id)
+
+        for shard in range(len(router.session_factories)):
+            last_id = self.last_reservation_ids.get(shard, 0)
+            with router.session(shard) as db:
+                rows = db.execute(
+                    select(Flight.departure_city, Flight.arrival_city,
+                           func.count(Reservation.id), func.max(Reservation.id))
+                    .join(Reservation, Reservation.flight_id == Flight.id)
+                    .where(Reservation.id > last_id)
+                    .group_by(Flight.departure_city, Flight.arrival_city)
+                ).all()
+            for departure, arrival, count, max_id in rows:
+                for city in (departure, arrival):
+                    self.weights[city] = self.weights.get(city, 0) + count
+                last_id = max(last_id, max_id)
+                changed = True
+            self.last_reservation_ids[shard] = last_id
+        return changed
+
+_INDEX = None
+_POPULARITY = None
+_LOADED_AT = 0.0
+_REBUILT_AT = 0.0
+_LOCK = threading.Lock()
+
+def _refresh(now):
+    """
+    Bring the index up to date. Called with ``_LOCK`` held.
+    """
+    global _INDEX, _POPULARITY, _LOADED_AT, _REBUILT_AT  # pylint: disable=global-statement
+    rebuild = _POPULARITY is None or now - _REBUILT_AT > REBUILD_SECONDS
+    popularity = CityPopularity() if rebuild else _POPULARITY.copy()
+    started = time.perf_counter()
+    changed = popularity.load(database.database.router)
+    if rebuild or changed:
+        _INDEX = CityIndex(popularity.weights)
+        logging.info("MYLOG: Built city index with %d cities in %.3fs",
+                     len(_INDEX), time.perf_counter() - started)
+    _POPULARITY, _LOADED_AT = popularity, now
+    if rebuild:
+        _REBUILT_AT = now
+
+def get_city_index():
+    """
+    Return the process-wide city index, refreshing it every ``CITY_INDEX_REFRESH`` seconds.
+
+    Only the first build blocks. Afterwards one request refreshes the index while concurrent
+    requests keep using the previous one, which is also kept if the refresh fails.
+    """
+    now = time.monotonic()
+    if _INDEX is None:
+        with _LOCK:
+            if _INDEX is None:
+                _refresh(now)
+    elif now - _LOADED_AT > REFRESH_SECONDS and _LOCK.acquire(blocking=False):
+        try:
+            _refresh(now)
+        except SQLAlchemyError as exc:
+            logging.error("MYLOG: Failed to refresh city index: %s", exc)
+        finally:
+            _LOCK.release()
+    return _INDEX
+
+def invalidate_city_index():
+    """
+    Drop the index so the next request reloads it from scratch.
+    """
+    global _INDEX, _POPULARITY  # pylint: disable=global-statement
+    with _LOCK:
+        _INDEX, _POPULARITY = None, None
@@ -0,0 +1,91 @@
+"""
+Optimistic concurrency control helpers for the Flight Reservation Flask Application.
+
+``Reservation`` and ``Flight`` carry a ``version`` column that SQLAlchemy checks on every
+ORM update (``version_id_col``): an update whose row was changed by someone else since it
+was read matches no row and raises ``StaleDataError`` instead of silently overwriting it.
+``retry_on_conflict`` re-runs a route handler when that happens, and ``conditional_update``
+performs the same check for bulk updates that bypass the ORM.
+"""
+
+import time
+import random
+import logging
+import threading
+import functools
+from flask import jsonify
+from sqlalchemy import update
+from sqlalchemy.orm.exc import StaleDataError
+
+class ConflictStats:
+    """
+    Thread-safe counters of optimistic concurrency retries.
+    """
+
+    def __init__(self):
+        self.attempts = 0
+        self.conflicts = 0
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def record(self, attempts=0, conflicts=0, exhausted=0):
+        """
+        Add to the counters.
+        """
+        with self._lock:
+            self.attempts += attempts
+            self.conflicts += conflicts
+            self.exhausted += exhausted
+
+    def as_dict(self):
+        """
+        Return the counters as a JSON-serializable dictionary.
+        """
+        return {"attempts": self.attempts, "conflicts": self.conflicts,
+                "exhausted": self.exhausted}
+
+stats = ConflictStats()
+
+def conditional_update(db, model, row_id, expected_version, **values):
+    """
+    Update a row only if its version is still ``expected_version``, bumping the version.
+
+    Returns:
+        True if the row was updated, False if it was changed concurrently or does not exist.
+    """
+    result = db.execute(
+        update(model)
+        .where(model.id == row_id, model.version == expected_version)
+        .values(version=expected_version + 1, **values)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+def retry_on_conflict(max_attempts=3, base_delay=0.01, conflict_response=None):
+    """
+    Decorator re-running a function when an optimistic concurrency conflict is detected.
+
+    The function must open its own session, so every attempt reads fresh rows. Attempts are
+    spaced by a jittered exponential backoff. Once ``max_attempts`` is reached the result of
+    ``conflict_response()`` is returned (a 409 JSON response by default).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(1, max_attempts + 1):
+                try:
+                    result = func(*args, **kwargs)
+                    stats.record(attempts=1)
+                    return result
+                except StaleDataError as exc:
+                    stats.record(attempts=1, conflicts=1)
+                    logging.warning("MYLOG: Concurrent update in %s (attempt %d): %s",
+                                    func.__name__, attempt, exc)
+                    if attempt < max_attempts:
+                        time.sleep(random.uniform(0, base_delay * 2 ** (attempt - 1)))
+            stats.record(exhausted=1)
+            if conflict_response is not None:
+                return conflict_response()
+            return jsonify({"error": "The reservation was modified concurrently, please retry"}), 409
+        return wrapper
+    return decorator
@@ -0,0 +1,313 @@
+"""
+Reservation status events delivered over server-sent events (SSE) or long polling.
+
+Route handlers publish an event after a reservation change commits. Events go through a
+backend to the ``EventBroker`` of every process: ``LocalBackend`` delivers within the
+process, ``RedisBackend`` fans out through Redis pub/sub with a single listener thread per
+process. The broker keeps a short history per topic, so clients can resume with
+``Last-Event-ID`` or ``since``. Histories of topics without events for
+``EVENTS_HISTORY_SECONDS`` are dropped, and at most ``EVENTS_HISTORY_TOPICS`` are kept (least
+recently updated first out). The broker also gives each connection a bounded buffer that drops the
+oldest events when a client falls behind. Set ``EVENTS_REDIS_URL`` to use Redis.
+
+Subscriptions are plain objects woken by a condition variable; no thread is started per
+client. To hold thousands of idle connections in one worker, run the app under a
+cooperative server such as ``gunicorn -k gevent``, where each waiting connection is a
+greenlet rather than an OS thread.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+
+HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+MAX_STREAM_SECONDS = float(os.getenv("SSE_MAX_SECONDS", "300"))
+HISTORY_SECONDS = float(os.getenv("EVENTS_HISTORY_SECONDS", "3600"))
+HISTORY_TOPICS = int(os.getenv("EVENTS_HISTORY_TOPICS", "10000"))
+
+class Subscription:
+    """
+    One client's bounded queue of pending events.
+    """
+
+    def __init__(self, topic, buffer_size):
+        self.topic = topic
+        self.events = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._condition = threading.Condition()
+
+    def push(self, event):
+        """
+        Queue an event, dropping the oldest one if the buffer is full.
+        """
+        with self._condition:
+            if len(self.events) == self.events.maxlen:
+                self.dropped += 1
+            self.events.append(event)
+            self._condition.notify()
+
+    def get(self, timeout):
+        """
+        Return the queued events, waiting up to ``timeout`` seconds for at least one.
+        """
+        with self._condition:
+            if not self.events:
+                self._condition.wait(timeout)
+            events = list(self.events)
+            self.events.clear()
+            return events
+
+class EventBroker:
+    """
+    In-process pub/sub of reservation events with per-topic history.
+    """
+
+    def __init__(self, buffer_size=64, history_size=32, history_seconds=HISTORY_SECONDS,
+                 history_topics=HISTORY_TOPICS, clock=time.monotonic):
+        self.buffer_size = buffer_size
+        self.history_size = history_size
+        self.history_seconds = history_seconds
+        self.history_topics = history_topics
+        self._clock = clock
+        self._subscribers = {}  # topic -> set of Subscription
+        # topic -> (deque of recent events, time of the last event), least recently updated first
+        self._history = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recent(self, topic):
+        """
+        Return the history of ``topic``, or an empty tuple if it expired. Needs ``_lock``.
+        """
+        entry = self._history.get(topic)
+        if entry is None or self._clock() - entry[1] > self.history_seconds:
+            return ()
+        return entry[0]
+
+    def dispatch(self, event):
+        """
+        Deliver an event to the local subscribers of its topic.
+        """
+        topic = event["topic"]
+        with self._lock:
+            now = self._clock()
+            entry = self._history.pop(topic, None)
+            history = entry[0] if entry is not None else deque(maxlen=self.history_size)
+            history.append(event)
+            self._history[topic] = (history, now)
+            while len(self._history) > self.history_topics \
+                    or now - next(iter(self._history.values()))[1] > self.history_seconds:
+                self._history.popitem(last=False)
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            subscription.push(event)
+
+    def subscribe(self, topic, last_event_id=None):
+        """
+        Subscribe to ``topic``. Events after ``last_event_id`` still in history are queued.
+        """
+        subscription = Subscription(topic, self.buffer_size)
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+            if last_event_id is not None:
+                for event in self._recent(topic):
+                    if event["id"] > last_event_id:
+                        subscription.push(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Remove a subscription.
+        """
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.topic]
+
+    def history(self, topic, since=None):
+        """
+        Return the recent events of ``topic`` newer than ``since``.
+        """
+        with self._lock:
+            return [event for event in self._recent(topic)
+                    if since is None or event["id"] > since]
+
+    def subscriber_count(self):
+        """
+        Return the number of open subscriptions.
+        """
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+class LocalBackend:
+    """
+    Delivers events to the broker of the current process only.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def publish(self, event):
+        """
+        Deliver an event.
+        """
+        self.broker.dispatch(event)
+
+class RedisBackend:
+    """
+    Delivers events to the brokers of every process through Redis pub/sub.
+
+    Any client exposing ``publish`` and ``pubsub`` (e.g. ``redis.Redis``) can be passed in.
+    One listener thread per process forwards messages to the local broker. When the
+    subscription fails with one of ``errors``, the listener logs it and subscribes again
+    after ``retry_delay`` seconds, doubling the delay up to ``max_retry_delay``. Events
+    published in the meantime are not delivered to this process.
+    """
+
+    def __init__(self, broker, client, channel="reservation-events",
+                 errors=(ConnectionError, TimeoutError, OSError), retry_delay=0.5,
+                 max_retry_delay=30.0):
+        self.broker = broker
+        self.client = client
+        self.channel = channel
+        self.errors = errors
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._closed = threading.Event()
+        self._listener = threading.Thread(target=self._listen, name="event-listener", daemon=True)
+        self._listener.start()
+
+    def publish(self, event):
+        """
+        Publish an event to every process.
+        """
+        self.client.publish(self.channel, json.dumps(event))
+
+    def close(self):
+        """
+        Stop the listener once its current subscription ends.
+        """
+        self._closed.set()
+
+    def _listen(self):
+        delay = self.retry_delay
+        while not self._closed.is_set():
+            pubsub = None
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                delay = self.retry_delay
+                for message in pubsub.listen():
+                    self._deliver(message)
+                    if self._closed.is_set():
+                        return
+                logging.error("MYLOG: Event subscription ended, subscribing again in %.1fs", delay)
+            except self.errors as exc:
+                logging.error("MYLOG: Event subscription failed (%s), retrying in %.1fs", exc, delay)
+            finally:
+                if pubsub is not None:
+                    pubsub.close()
+            if self._closed.wait(delay):
+                return
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def _deliver(self, message):
+        try:
+            self.broker.dispatch(json.loads(message["data"]))
+        except (TypeError, ValueError, KeyError) as exc:
+            logging.error("MYLOG: Invalid event message: %s", exc)
+
+def create_backend(event_broker):
+    """
+    Return the backend selected by ``EVENTS_REDIS_URL``, or a local one when it is unset.
+    """
+    url = os.getenv("EVENTS_REDIS_URL")
+    if not url:
+        return LocalBackend(event_broker)
+    import redis  # pylint: disable=import-outside-toplevel
+    return RedisBackend(event_broker, redis.Redis.from_url(url), errors=(redis.RedisError, OSError))
+
+broker = EventBroker()
+backend = create_backend(broker)
+_last_id = 0
+_id_lock = threading.Lock()
+
+def _next_event_id():
+    """
+    Return an increasing event id based on the wall clock in microseconds, so ids from
+    different processes interleave in publish order.
+    """
+    global _last_id  # pylint: disable=global-statement
+    with _id_lock:
+        _last_id = max(_last_id + 1, int(time.time() * 1_000_000))
+        return _last_id
+
+def reservation_topic(reservation_id):
+    """
+    Return the topic carrying a reservation's status changes.
+    """
+    return f"reservation:{reservation_id}"
+
+def publish_reservation_event(reservation_id, event_type, data=None):
+    """
+    Publish a status change of a reservation. Call it after the change has committed.
+    """
+    event = {
+        "id": _next_event_id(),
+        "topic": reservation_topic(reservation_id),
+        "type": event_type,
+        "data": dict(data or {}, reservation_id=reservation_id),
+    }
+    try:
+        backend.publish(event)
+    except Exception as exc:  # pylint: disable=broad-except
+        # Status events are best effort and must never fail the booking itself
+        logging.error("MYLOG: Failed to publish %s event: %s", event_type, exc)
+    return event
+
+def format_sse(event):
+    """
+    Format an event as a server-sent events message.
+    """
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+def sse_stream(topic, last_event_id=None, heartbeat=None, max_duration=None, event_broker=None):
+    """
+    Yield SSE messages for ``topic`` with periodic heartbeat comments.
+
+    The stream ends after ``max_duration`` seconds; browsers reconnect automatically and
+    resume from the ``Last-Event-ID`` they received.
+    """
+    event_broker = event_broker or broker
+    heartbeat = HEARTBEAT_SECONDS if heartbeat is None else heartbeat
+    deadline = time.monotonic() + (MAX_STREAM_SECONDS if max_duration is None else max_duration)
+    subscription = event_broker.subscribe(topic, last_event_id)
+    try:
+        yield f"retry: {int(heartbeat * 1000)}\n\n"
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            events = subscription.get(min(heartbeat, remaining))
+            if events:
+                for event in events:
+                    yield format_sse(event)
+            else:
+                yield ": heartbeat\n\n"
+    finally:
+        event_broker.unsubscribe(subscription)
+
+def long_poll(topic, since=None, timeout=25.0, event_broker=None):
+    """
+    Return events of ``topic`` newer than ``since``, waiting up to ``timeout`` for one.
+    """
+    event_broker = event_broker or broker
+    subscription = event_broker.subscribe(topic, since)
+    try:
+        return subscription.get(timeout)
+    finally:
+        event_broker.unsubscribe(subscription)
@@ -0,0 +1,183 @@
+"""
+Vectorized fare analytics for the "cheapest day to fly" price calendar.
+
+Route, departure day and price are loaded from the ``flight`` table into compact NumPy
+arrays once per snapshot. Per-day min/median/mean fares are computed for every route with
+sorted, vectorized group-bys when the snapshot is built, so serving a month view is a pair
+of binary searches instead of an SQL ``GROUP BY`` per request.
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import date, timedelta
+import numpy as np
+from sqlalchemy import select
+from models.models import Flight
+
+SNAPSHOT_TTL = float(os.getenv("FARE_SNAPSHOT_TTL", "300"))
+_EPOCH = date(1970, 1, 1).toordinal()
+
+class FareSnapshot:
+    """
+    Columnar snapshot of flight fares with precomputed per-route, per-day aggregates.
+    """
+
+    def __init__(self, routes, route_ids, days, prices):
+        """
+        Args:
+            routes: List of ``(departure_city, arrival_city)`` pairs, indexed by route id.
+            route_ids: Route id of every flight.
+            days: Departure day of every flight, as days since 1970-01-01.
+            prices: Price of every flight.
+        """
+        self.routes = routes
+        self._route_index = {route: index for index, route in enumerate(routes)}
+        self.built_at = time.monotonic()
+
+        route_ids = np.asarray(route_ids, dtype=np.int32)
+        days = np.asarray(days, dtype=np.int32)
+        prices = np.asarray(prices, dtype=np.float64)
+        order = np.lexsort((prices, days, route_ids))
+        self.route_ids = route_ids[order]
+        self.days = days[order]
+        self.prices = prices[order]
+        self._group()
+
+    def _group(self):
+        """
+        Compute per-(route, day) aggregates from the sorted flight columns.
+        """
+        size = len(self.prices)
+        if size == 0:
+            empty_int, empty_float = np.empty(0, np.int32), np.empty(0, np.float64)
+            self.group_routes = self.group_days = self.group_counts = empty_int
+            self.group_min = self.group_median = self.group_mean = empty_float
+            return
+        boundary = np.empty(size, dtype=bool)
+        boundary[0] = True
+        np.not_equal(self.route_ids[1:], self.route_ids[:-1], out=boundary[1:])
+        boundary[1:] |= self.days[1:] != self.days[:-1]
+        starts = np.flatnonzero(boundary)
+        counts = np.diff(np.append(starts, size))
+
+        self.group_routes = self.route_ids[starts]
+        self.group_days = self.days[starts]
+        self.group_counts = counts.astype(np.int32)
+        # Prices are sorted within each group, so the first one is the minimum and the
+        # median sits in the middle of the group.
+        self.group_min = self.prices[starts]
+        lower = self.prices[starts + (counts - 1) // 2]
+        upper = self.prices[starts + counts // 2]
+        self.group_median = (lower + upper) / 2
+        self.group_mean = np.add.reduceat(self.prices, starts) / counts
+
+    @classmethod
+    def from_db(cls, db, chunk_size=50_000):
+        """
+        Build a snapshot from the ``flight`` table with a single streaming scan.
+        """
+        routes, route_index = [], {}
+        route_ids, days, prices = [], [], []
+        stmt = select(
+            Flight.departure_city, Flight.arrival_city, Flight.date_of_departure, Flight.price
+        ).execution_options(yield_per=chunk_size)
+        for departure, arrival, day, price in db.execute(stmt):
+            route = (departure.upper(), arrival.upper())
+            index = route_index.get(route)
+            if index is None:
+                index = route_index[route] = len(routes)
+                routes.append(route)
+            route_ids.append(index)
+            days.append(day.toordinal() - _EPOCH)
+            prices.append(price)
+        snapshot = cls(routes, route_ids, days, prices)
+        logging.info("MYLOG: Fare snapshot built with %d flights on %d routes",
+                     len(prices), len(routes))
+        return snapshot
+
+    def _route_slice(self, ids, departure, arrival):
+        """
+        Return the ``[start, end)`` range of ``ids`` belonging to a route.
+        """
+        index = self._route_index.get((departure.upper(), arrival.upper()))
+        if index is None:
+            return 0, 0
+        return (int(np.searchsorted(ids, index, "left")),
+                int(np.searchsorted(ids, index, "right")))
+
+    def calendar(self, departure, arrival, first_day, last_day):
+        """
+        Return per-day fare aggregates for a route between two dates inclusive.
+        """
+        start, end = self._route_slice(self.group_routes, departure, arrival)
+        days = self.group_days[start:end]
+        lo = start + int(np.searchsorted(days, first_day.toordinal() - _EPOCH, "left"))
+        hi = start + int(np.searchsorted(days, last_day.toordinal() - _EPOCH, "right"))
+        return [{
+            "date": date.fromordinal(int(day) + _EPOCH).isoformat(),
+            "min": round(float(low), 2),
+            "median": round(float(median), 2),
+            "mean": round(float(mean), 2),
+            "flights": int(count),
+        } for day, low, median, mean, count in zip(
+            self.group_days[lo:hi], self.group_min[lo:hi], self.group_median[lo:hi],
+            self.group_mean[lo:hi], self.group_counts[lo:hi],
+        )]
+
+    def route_summary(self, departure, arrival, bins=10):
+        """
+        Return route-level fare aggregates and a price histogram.
+        """
+        start, end = self._route_slice(self.route_ids, departure, arrival)
+        prices = self.prices[start:end]
+        if prices.size == 0:
+            return None
+        counts, edges = np.histogram(prices, bins=bins)
+        return {
+            "flights": int(prices.size),
+            "min": round(float(prices.min()), 2),
+            "max": round(float(prices.max()), 2),
+            "mean": round(float(prices.mean()), 2),
+            "median": round(float(np.median(prices)), 2),
+            "histogram": {
+                "edges": [round(float(edge), 2) for edge in edges],
+                "counts": counts.tolist(),
+            },
+        }
+
+_SNAPSHOT = None
+_SNAPSHOT_LOCK = threading.Lock()
+
+def get_fare_snapshot(db, ttl=SNAPSHOT_TTL):
+    """
+    Return the process-wide fare snapshot, rebuilding it with ``db`` once it is older than ``ttl``.
+    """
+    global _SNAPSHOT  # pylint: disable=global-statement
+
+    def stale(snapshot):
+        return snapshot is None or time.monotonic() - snapshot.built_at > ttl
+
+    snapshot = _SNAPSHOT
+    if stale(snapshot):
+        with _SNAPSHOT_LOCK:
+            if stale(_SNAPSHOT):
+                _SNAPSHOT = FareSnapshot.from_db(db)
+            snapshot = _SNAPSHOT
+    return snapshot
+
+def invalidate_fare_snapshot():
+    """
+    Drop the cached snapshot so the next request rebuilds it.
+    """
+    global _SNAPSHOT  # pylint: disable=global-statement
+    _SNAPSHOT = None
+
+def month_bounds(month):
+    """
+    Return the first and last day of a ``YYYY-MM`` month.
+    """
+    first = date.fromisoformat(f"{month}-01")
+    following = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return first, following - timedelta(days=1)
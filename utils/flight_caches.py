@@ -0,0 +1,28 @@
+"""
+Refresh of the in-process caches derived from the ``flight`` table.
+
+The route graph, fare snapshot, city index and flight catalog are built from ``flight`` rows.
+The route graph also follows committed ORM changes, but bulk statements such as imports and
+archiving bypass the ORM, so their callers refresh every derived cache here. Caches added
+later belong in ``refresh_derived_caches`` too.
+"""
+
+from utils.city_index import invalidate_city_index
+from utils.fare_analytics import invalidate_fare_snapshot
+from utils.flight_catalog import rebuild_flight_catalog
+from utils.route_graph import invalidate_route_graph
+
+def refresh_derived_caches(db, shard):
+    """
+    Drop this process's caches built from the ``flight`` table after flights were changed with
+    bulk statements, and rewrite the shared flight catalog file from ``db``.
+
+    The catalog is rewritten only for shard 0, since every shard holds the same flights.
+    Other workers map the new catalog file on their next request and rebuild their route
+    graphs and fare snapshots when those expire (``ROUTE_GRAPH_TTL``, ``FARE_SNAPSHOT_TTL``).
+    """
+    if shard == 0:
+        rebuild_flight_catalog(db)
+    invalidate_route_graph()
+    invalidate_fare_snapshot()
+    invalidate_city_index()
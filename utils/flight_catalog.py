@@ -0,0 +1,289 @@
+"""
+Read-only, array-backed flight catalog shared between worker processes.
+
+The schedule is stored column by column in typed arrays instead of as SQLAlchemy ``Flight``
+objects: strings (flight numbers, airlines, cities) are interned into one string table and
+referenced by index, departure dates are packed as days since 1970-01-01 and departure times
+as epoch seconds. Rows are exposed through ``FlightView`` objects that use ``__slots__`` and
+read the columns lazily.
+
+A catalog is built with one streaming scan of the ``flight`` table and can be saved to a file
+that every worker memory-maps, so the operating system shares a single copy of the pages.
+Build it once before starting the workers::
+
+    python -m utils.flight_catalog /tmp/flight_catalog.bin
+
+Rewriting the file (for example after an import or an archiving run) replaces it atomically;
+each worker notices the new file on its next request and maps it instead of the old one.
+"""
+
+import os
+import sys
+import mmap
+import json
+import struct
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from sqlalchemy import select
+from models.models import Flight
+
+MAGIC = b"FLTCAT01"
+_EPOCH_DATE = date(1970, 1, 1)
+_EPOCH = datetime(1970, 1, 1)
+
+# Column name -> array typecode. Columns are written in this order.
+COLUMNS = {
+    "id": "q",
+    "flight_number": "I",
+    "operating_airlines": "I",
+    "departure_city": "I",
+    "arrival_city": "I",
+    "date_of_departure": "i",
+    "estimated_departure_time": "q",
+    "price": "d",
+}
+_STRING_COLUMNS = ("flight_number", "operating_airlines", "departure_city", "arrival_city")
+
+class FlightView:
+    """
+    Lightweight read-only view of one catalog row with the same attributes as ``Flight``.
+    """
+    __slots__ = ("_catalog", "_row")
+
+    def __init__(self, catalog, row):
+        self._catalog = catalog
+        self._row = row
+
+    def _string(self, column):
+        catalog = self._catalog
+        return catalog.strings[catalog.columns[column][self._row]]
+
+    @property
+    def id(self):  # pylint: disable=invalid-name
+        """Flight id."""
+        return self._catalog.columns["id"][self._row]
+
+    @property
+    def flight_number(self):
+        """Flight number."""
+        return self._string("flight_number")
+
+    @property
+    def operating_airlines(self):
+        """Operating airline."""
+        return self._string("operating_airlines")
+
+    @property
+    def departure_city(self):
+        """Departure city."""
+        return self._string("departure_city")
+
+    @property
+    def arrival_city(self):
+        """Arrival city."""
+        return self._string("arrival_city")
+
+    @property
+    def date_of_departure(self):
+        """Departure date."""
+        return _EPOCH_DATE + timedelta(days=self._catalog.columns["date_of_departure"][self._row])
+
+    @property
+    def estimated_departure_time(self):
+        """Estimated departure time."""
+        seconds = self._catalog.columns["estimated_departure_time"][self._row]
+        return _EPOCH + timedelta(seconds=seconds)
+
+    @property
+    def price(self):
+        """Ticket price."""
+        return self._catalog.columns["price"][self._row]
+
+class FlightCatalog:
+    """
+    Columnar, read-only flight schedule sorted by flight id.
+    """
+
+    def __init__(self, columns, strings, buffer=None, file_id=None):
+        self.columns = columns
+        self.strings = strings
+        self._buffer = buffer  # Keeps a memory-mapped file open while columns point into it
+        self.file_id = file_id  # Identity of the mapped file, see _file_id
+
+    def __len__(self):
+        return len(self.columns["id"])
+
+    def __iter__(self):
+        return (FlightView(self, row) for row in range(len(self)))
+
+    @classmethod
+    def build(cls, rows):
+        """
+        Build a catalog from ``Flight``-like rows, consuming them one at a time.
+        """
+        columns = {name: array(code) for name, code in COLUMNS.items()}
+        strings, interned = [], {}
+
+        def intern(value):
+            index = interned.get(value)
+            if index is None:
+                index = interned[value] = len(strings)
+                strings.append(value)
+            return index
+
+        for row in rows:
+            columns["id"].append(row.id)
+            for name in _STRING_COLUMNS:
+                columns[name].append(intern(getattr(row, name)))
+            columns["date_of_departure"].append((row.date_of_departure - _EPOCH_DATE).days)
+            columns["estimated_departure_time"].append(
+                int((row.estimated_departure_time - _EPOCH).total_seconds())
+            )
+            columns["price"].append(float(row.price))
+
+        ids = columns["id"]
+        if any(ids[i] > ids[i + 1] for i in range(len(ids) - 1)):
+            order = sorted(range(len(ids)), key=ids.__getitem__)
+            columns = {name: array(column.typecode, (column[i] for i in order))
+                       for name, column in columns.items()}
+        return cls(columns, strings)
+
+    @classmethod
+    def from_db(cls, db, chunk_size=50_000):
+        """
+        Build a catalog from the ``flight`` table with a single streaming scan.
+        """
+        stmt = select(
+            Flight.id, Flight.flight_number, Flight.operating_airlines, Flight.departure_city,
+            Flight.arrival_city, Flight.date_of_departure, Flight.estimated_departure_time,
+            Flight.price,
+        ).order_by(Flight.id).execution_options(yield_per=chunk_size)
+        catalog = cls.build(db.execute(stmt))
+        logging.info("MYLOG: Flight catalog built with %d flights", len(catalog))
+        return catalog
+
+    def get(self, flight_id):
+        """
+        Return the view for ``flight_id`` or ``None``.
+        """
+        ids = self.columns["id"]
+        row = bisect_left(ids, flight_id)
+        if row < len(ids) and ids[row] == flight_id:
+            return FlightView(self, row)
+        return None
+
+    def save(self, path):
+        """
+        Write the catalog to ``path`` atomically so readers never see a partial file.
+
+        Layout: magic, header length, JSON header (row count, string table, column offsets),
+        then every column aligned to 8 bytes.
+        """
+        offsets, position = {}, 0
+        for name, column in self.columns.items():
+            offsets[name] = position
+            position += _aligned(len(column) * column.itemsize)
+        header = json.dumps({"rows": len(self), "strings": self.strings, "offsets": offsets})
+        header = header.encode("utf-8")
+        data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(MAGIC + struct.pack("<Q", len(header)) + header)
+            for name, column in self.columns.items():
+                file.seek(data_start + offsets[name])
+                file.write(column.tobytes())
+            file.truncate(data_start + position)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Memory-map a catalog file written by ``save``. Columns are zero-copy views of the file.
+        """
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            file_id = _file_id(os.fstat(file.fileno()))
+        if buffer[:len(MAGIC)] != MAGIC:
+            buffer.close()
+            raise ValueError(f"{path} is not a flight catalog file")
+        header_size = struct.unpack_from("<Q", buffer, len(MAGIC))[0]
+        header_start = len(MAGIC) + 8
+        header = json.loads(buffer[header_start:header_start + header_size])
+        data_start = _aligned(header_start + header_size)
+
+        view = memoryview(buffer)
+        rows = header["rows"]
+        columns = {}
+        for name, code in COLUMNS.items():
+            start = data_start + header["offsets"][name]
+            size = array(code).itemsize
+            columns[name] = view[start:start + rows * size].cast(code)
+        return cls(columns, header["strings"], buffer, file_id)
+
+def _aligned(size):
+    return (size + 7) & ~7
+
+def _file_id(stat):
+    return stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+_CATALOG = None
+_CATALOG_LOCK = threading.Lock()
+
+def get_flight_catalog(db):
+    """
+    Return the process-wide catalog, or ``None`` when ``FLIGHT_CATALOG_PATH`` is not set.
+
+    The file is memory-mapped if it exists; otherwise it is built with ``db`` and saved first.
+    It is mapped again when the file was replaced since it was opened.
+    """
+    global _CATALOG  # pylint: disable=global-statement
+    path = os.getenv("FLIGHT_CATALOG_PATH")
+    if not path:
+        return None
+
+    def current(catalog):
+        try:
+            return catalog is not None and catalog.file_id == _file_id(os.stat(path))
+        except FileNotFoundError:
+            return False
+
+    catalog = _CATALOG
+    if not current(catalog):
+        with _CATALOG_LOCK:
+            if not current(_CATALOG):
+                if not os.path.exists(path):
+                    FlightCatalog.from_db(db).save(path)
+                _CATALOG = FlightCatalog.open(path)
+            catalog = _CATALOG
+    return catalog
+
+def invalidate_flight_catalog():
+    """
+    Drop this process's catalog so the next request reopens the file.
+    """
+    global _CATALOG  # pylint: disable=global-statement
+    _CATALOG = None
+
+def rebuild_flight_catalog(db):
+    """
+    Rewrite the catalog file from ``db`` when ``FLIGHT_CATALOG_PATH`` is set, e.g. after
+    flights were imported or archived. Workers map the new file on their next request.
+    """
+    path = os.getenv("FLIGHT_CATALOG_PATH")
+    if path:
+        FlightCatalog.from_db(db).save(path)
+        invalidate_flight_catalog()
+
+if __name__ == "__main__":
+    from database import SessionLocal  # pylint: disable=ungrouped-imports
+
+    target = sys.argv[1] if len(sys.argv) > 1 else os.getenv("FLIGHT_CATALOG_PATH")
+    if not target:
+        sys.exit("Usage: python -m utils.flight_catalog <path>")
+    with SessionLocal() as session:
+        FlightCatalog.from_db(session).save(target)
+    print(f"Flight catalog written to {target}")
@@ -0,0 +1,305 @@
+"""
+Streaming import of airline schedule files into the ``flight`` table.
+
+Schedules are read as CSV (with a header row) or JSON Lines, one flight per row, with the
+columns of ``Flight``: ``flight_number``, ``operating_airlines``, ``departure_city``,
+``arrival_city``, ``date_of_departure``, ``estimated_departure_time`` and ``price``.
+Rows are validated and normalized in chunks; the last row for a flight number and
+departure date wins. Each chunk is upserted on ``(flight_number, date_of_departure)`` in
+one transaction (``INSERT ... ON DUPLICATE KEY UPDATE`` on MySQL, ``ON CONFLICT`` on
+SQLite, update-then-insert elsewhere), so re-running an import is safe. Invalid rows are reported, not imported::
+
+    python -m utils.flight_import schedule.csv [--rejects rejects.jsonl]
+
+Flights are reference data copied to every shard: they are upserted on the primary
+database first and the resulting rows, with their ids, are copied to the other shards.
+"""
+
+import io
+import re
+import csv
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import date, datetime
+from dataclasses import dataclass, field
+from sqlalchemy import and_, insert, select, tuple_, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+import database.database
+from models.models import Flight
+from utils.flight_caches import refresh_derived_caches
+
+CHUNK_SIZE = 5_000
+MAX_REJECTS_REPORTED = 100
+FIELDS = ("flight_number", "operating_airlines", "departure_city", "arrival_city",
+          "date_of_departure", "estimated_departure_time", "price")
+UPDATED = FIELDS[1:]
+_FLIGHT_NUMBER = re.compile(r"^[A-Z0-9]{2,20}$")
+
+@dataclass
+class ImportReport:
+    """
+    Progress and outcome of an import.
+    """
+    rows: int = 0
+    imported: int = 0  # Distinct flights written
+    duplicates: int = 0
+    rejected: int = 0
+    rejects: list = field(default_factory=list)  # First MAX_REJECTS_REPORTED rejected rows
+    started: float = field(default_factory=time.perf_counter)
+
+    def reject(self, line, reason, row):
+        """
+        Record an invalid row.
+        """
+        self.rejected += 1
+        if len(self.rejects) < MAX_REJECTS_REPORTED:
+            self.rejects.append({"line": line, "error": reason, "row": row})
+
+    def as_dict(self):
+        """
+        Return the report as a JSON-serializable dictionary.
+        """
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows, "imported": self.imported, "duplicates": self.duplicates,
+            "rejected": self.rejected, "rejects": self.rejects,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows / elapsed) if elapsed else 0,
+        }
+
+def read_rows(stream, fmt):
+    """
+    Yield ``(line_number, row)`` pairs from a text stream in ``csv`` or ``jsonl`` format.
+    Malformed JSON lines are yielded as strings so they can be rejected.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError:
+                    yield number, line.strip()
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+def _parse_date(value):
+    value = str(value).strip()
+    if "/" in value:  # MM/DD/YYYY, as typed in the search form
+        month, day, year = value.split("/")
+        return date(int(year), int(month), int(day))
+    return date.fromisoformat(value)
+
+def _parse_departure_time(value, day):
+    value = str(value).strip()
+    if len(value) <= 8:  # [H]H:MM or [H]H:MM:SS on the departure date
+        value = f"{day.isoformat()} {value.zfill(len(value) + (value.index(':') == 1))}"
+    return datetime.fromisoformat(value)
+
+def _text(row, name, limit=20):
+    value = row.get(name)
+    value = str(value).strip() if value is not None else ""
+    if "  " in value:
+        value = " ".join(value.split())
+    if not value:
+        raise ValueError(f"{name} is required")
+    if len(value) > limit:
+        raise ValueError(f"{name} is longer than {limit} characters")
+    return value
+
+def normalize_row(row):
+    """
+    Validate a raw schedule row and return it with normalized values.
+    Raises ValueError describing the first problem found.
+    """
+    if not isinstance(row, dict):
+        raise ValueError("row is not a JSON object")
+    flight_number = _text(row, "flight_number").replace(" ", "").upper()
+    if not _FLIGHT_NUMBER.match(flight_number):
+        raise ValueError("flight_number must be letters and digits")
+    departure_city = _text(row, "departure_city").upper()
+    arrival_city = _text(row, "arrival_city").upper()
+    if departure_city == arrival_city:
+        raise ValueError("departure_city and arrival_city are the same")
+    try:
+        day = _parse_date(row.get("date_of_departure"))
+    except (TypeError, ValueError) as exc:
+        raise ValueError("date_of_departure must be YYYY-MM-DD or MM/DD/YYYY") from exc
+    try:
+        departure = _parse_departure_time(row.get("estimated_departure_time"), day)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("estimated_departure_time must be HH:MM or an ISO datetime") from exc
+    if departure.date() != day:
+        raise ValueError("estimated_departure_time is not on date_of_departure")
+    try:
+        price = round(float(row.get("price")), 2)
+    except (TypeError, ValueError) as exc:
+        raise ValueError("price must be a number") from exc
+    if not 0 <= price < 100_000_000:
+        raise ValueError("price is out of range")
+    return {
+        "flight_number": flight_number,
+        "operating_airlines": _text(row, "operating_airlines"),
+        "departure_city": departure_city,
+        "arrival_city": arrival_city,
+        "date_of_departure": day,
+        "estimated_departure_time": departure,
+        "price": price,
+    }
+
+def upsert_flights(connection, rows):
+    """
+    Insert flights or update the ones with the same flight number and departure date.
+    Updated rows get a new version so optimistic concurrency readers notice the change.
+    """
+    table = Flight.__table__
+    dialect = connection.dialect.name
+    if dialect == "mysql":
+        statement = mysql_insert(table)
+        statement = statement.on_duplicate_key_update(
+            dict({name: statement.inserted[name] for name in UPDATED}, version=table.c.version + 1)
+        )
+    elif dialect == "sqlite":
+        statement = sqlite_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=["flight_number", "date_of_departure"],
+            set_=dict({name: statement.excluded[name] for name in UPDATED},
+                      version=table.c.version + 1),
+        )
+    else:
+        missing = []
+        for row in rows:
+            condition = and_(table.c.flight_number == row["flight_number"],
+                             table.c.date_of_departure == row["date_of_departure"])
+            result = connection.execute(update(table).where(condition).values(
+                dict({name: row[name] for name in UPDATED}, version=table.c.version + 1)
+            ))
+            if not result.rowcount:
+                missing.append(row)
+        if not missing:
+            return
+        statement, rows = insert(table), missing
+    connection.execute(statement, [dict(row, version=1) for row in rows])
+
+class FlightImporter:
+    """
+    Imports a schedule in chunks into every shard.
+    """
+
+    def __init__(self, router=None, chunk_size=CHUNK_SIZE, progress=None, on_reject=None):
+        self.router = router or database.database.router
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.on_reject = on_reject
+
+    def _write_chunk(self, chunk):
+        rows = stored = list(chunk.values())
+        with self.router.session(0) as db:
+            upsert_flights(db.connection(), rows)
+            if self.router.sharded:
+                keys = [(row["flight_number"], row["date_of_departure"]) for row in rows]
+                stored = [dict(row) for row in db.execute(
+                    select(Flight.__table__)
+                    .where(tuple_(Flight.flight_number, Flight.date_of_departure).in_(keys))
+                ).mappings()]
+            db.commit()
+        for shard in range(1, len(self.router.session_factories)):
+            with self.router.session(shard) as db:
+                upsert_flights(db.connection(), stored)
+                db.commit()
+
+    def run(self, rows):
+        """
+        Import ``(line_number, row)`` pairs and return the ``ImportReport``.
+        """
+        report = ImportReport()
+        chunk = {}
+        seen = set()  # Hashes of every flight key, to count duplicates across chunks
+        for line, raw in rows:
+            report.rows += 1
+            try:
+                row = normalize_row(raw)
+            except ValueError as exc:
+                report.reject(line, str(exc), raw)
+                if self.on_reject:
+                    self.on_reject(line, str(exc), raw)
+                continue
+            key = (row["flight_number"], row["date_of_departure"])
+            key_hash = hash(key)
+            if key_hash in seen:
+                report.duplicates += 1
+            else:
+                seen.add(key_hash)
+                report.imported += 1
+            chunk[key] = row  # The last row for a flight wins, also across chunks
+            if len(chunk) >= self.chunk_size:
+                self._write_chunk(chunk)
+                chunk = {}
+                if self.progress:
+                    self.progress(report)
+        if chunk:
+            self._write_chunk(chunk)
+        if report.imported:  # Core upserts bypass the ORM listeners
+            with self.router.session(0) as db:
+                refresh_derived_caches(db, 0)
+        return report
+
+def detect_format(name, content_type=""):
+    """
+    Guess the format of a schedule from its file name or content type.
+    """
+    if name.endswith((".jsonl", ".ndjson")) or "json" in content_type:
+        return "jsonl"
+    return "csv"
+
+def import_stream(binary_stream, fmt, **options):
+    """
+    Import a schedule from a binary stream, e.g. an open file or an HTTP request body.
+    """
+    text = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    return FlightImporter(**options).run(read_rows(text, fmt))
+
+def main(argv=None):
+    """
+    Import a schedule file given on the command line.
+    """
+    parser = argparse.ArgumentParser(description="Import an airline schedule (CSV or JSONL).")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--rejects", help="Write every rejected row to this JSONL file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    def progress(report):
+        logging.info("MYLOG: %d rows read, %d imported, %d rejected (%d rows/s)",
+                     report.rows, report.imported, report.rejected,
+                     report.as_dict()["rows_per_second"])
+
+    rejects_file = open(args.rejects, "w", encoding="utf-8") if args.rejects else None  # pylint: disable=consider-using-with
+
+    def on_reject(line, error, row):
+        rejects_file.write(json.dumps({"line": line, "error": error, "row": row}) + "\n")
+
+    try:
+        with open(args.path, "rb") as file:
+            report = import_stream(file, args.format or detect_format(args.path),
+                                   chunk_size=args.chunk_size, progress=progress,
+                                   on_reject=on_reject if rejects_file else None)
+    finally:
+        if rejects_file:
+            rejects_file.close()
+    summary = report.as_dict()
+    summary.pop("rejects")
+    logging.info("MYLOG: Import finished: %s", summary)
+    return 1 if report.rejected else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
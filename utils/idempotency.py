@@ -0,0 +1,274 @@
+"""
+Idempotent handling of POST requests carrying an ``Idempotency-Key`` header.
+
+The first request with a key runs normally and its response is stored together with a
+fingerprint of the request. A retry with the same key gets the stored response back without
+touching the booking tables; a concurrent duplicate waits for the first request to finish.
+Reusing a key for a different request is rejected with 422.
+
+Responses are kept in memory by default (``IDEMPOTENCY_STORE=memory``) or in the
+``idempotency_key`` table (``IDEMPOTENCY_STORE=database``) when several workers must share
+them. Entries expire after ``IDEMPOTENCY_TTL`` seconds. In the table, a running request
+holds its key for ``IDEMPOTENCY_LEASE`` seconds only, so a retry can take the key over if
+the worker running the request died.
+"""
+
+import os
+import time
+import zlib
+import hashlib
+import logging
+import threading
+import functools
+from datetime import datetime, timedelta
+from dataclasses import dataclass
+from flask import jsonify, make_response, request
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+import database.database
+from models.models import IdempotencyKey
+
+HEADER = "Idempotency-Key"
+NEW, REPLAY, MISMATCH, IN_PROGRESS = "new", "replay", "mismatch", "in_progress"
+
+@dataclass
+class StoredResponse:
+    """
+    A response saved for replay.
+    """
+    status_code: int
+    body: bytes
+    content_type: str
+
+class MemoryIdempotencyStore:
+    """
+    In-process store. Concurrent duplicates wait on a condition variable.
+    """
+
+    def __init__(self, ttl=86400, wait_timeout=10.0):
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._entries = {}  # key -> [fingerprint, StoredResponse or None, expires_at]
+        self._condition = threading.Condition()
+        self._next_purge = 0.0
+
+    def begin(self, key, fingerprint):
+        """
+        Claim ``key`` for a new request, or return the state of an existing one.
+
+        Returns:
+            A ``(state, stored_response)`` tuple; ``state`` is one of NEW, REPLAY,
+            MISMATCH or IN_PROGRESS (still running after ``wait_timeout``).
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        with self._condition:
+            self._purge()
+            while True:
+                entry = self._entries.get(key)
+                if entry is None or entry[2] < time.monotonic():
+                    self._entries[key] = [fingerprint, None, time.monotonic() + self.ttl]
+                    return NEW, None
+                if entry[0] != fingerprint:
+                    return MISMATCH, None
+                if entry[1] is not None:
+                    return REPLAY, entry[1]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return IN_PROGRESS, None
+                self._condition.wait(remaining)
+
+    def complete(self, key, response):
+        """
+        Store the response of a finished request and wake up waiting duplicates.
+        """
+        with self._condition:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1] = response
+            self._condition.notify_all()
+
+    def abandon(self, key):
+        """
+        Forget a request that failed so the client can retry it.
+        """
+        with self._condition:
+            self._entries.pop(key, None)
+            self._condition.notify_all()
+
+    def _purge(self):
+        """
+        Drop expired entries, at most once every tenth of the TTL. Called with the lock held.
+        """
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.ttl / 10
+        for key in [key for key, entry in self._entries.items() if entry[2] < now]:
+            del self._entries[key]
+
+class SqlIdempotencyStore:
+    """
+    Store backed by the ``idempotency_key`` table, shared by every worker process.
+    Bodies are zlib-compressed. Concurrent duplicates poll until the first request finishes,
+    or take the key over once the first request's ``lease`` has run out.
+    """
+
+    def __init__(self, session_factory, ttl=86400, wait_timeout=10.0, poll_interval=0.05,
+                 lease=60.0):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.lease = lease
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+
+    def begin(self, key, fingerprint):
+        """
+        Claim ``key`` for a new request, or return the state of an existing one.
+        See ``MemoryIdempotencyStore.begin``.
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            with self.session_factory() as db:
+                row = db.execute(select(IdempotencyKey).where(IdempotencyKey.key == key)).scalar()
+                if row is not None and row.expires_at < datetime.now():
+                    db.delete(row)
+                    db.commit()
+                    row = None
+                if row is None:
+                    db.add(IdempotencyKey(
+                        key=key, fingerprint=fingerprint,
+                        expires_at=datetime.now() + timedelta(seconds=self.ttl),
+                        locked_until=datetime.now() + timedelta(seconds=self.lease),
+                    ))
+                    try:
+                        db.commit()
+                        return NEW, None
+                    except IntegrityError:
+                        db.rollback()  # A concurrent duplicate claimed it first
+                        continue
+                if row.fingerprint != fingerprint:
+                    return MISMATCH, None
+                if row.status_code is not None:
+                    return REPLAY, StoredResponse(
+                        row.status_code, zlib.decompress(row.body), row.content_type
+                    )
+                if row.locked_until is None or row.locked_until < datetime.now():
+                    # The worker running the request died; take the key over unless another
+                    # duplicate did so first
+                    taken = db.execute(
+                        update(IdempotencyKey)
+                        .where(IdempotencyKey.key == key, IdempotencyKey.status_code.is_(None),
+                               IdempotencyKey.locked_until == row.locked_until)
+                        .values(locked_until=datetime.now() + timedelta(seconds=self.lease))
+                        .execution_options(synchronize_session=False)
+                    ).rowcount
+                    db.commit()
+                    if taken:
+                        logging.warning("MYLOG: Took over the expired lease of %s", key)
+                        return NEW, None
+                    continue
+            if time.monotonic() >= deadline:
+                return IN_PROGRESS, None
+            time.sleep(self.poll_interval)
+
+    def complete(self, key, response):
+        """
+        Store the response of a finished request.
+        """
+        with self.session_factory() as db:
+            db.execute(update(IdempotencyKey).where(IdempotencyKey.key == key).values(
+                status_code=response.status_code, body=zlib.compress(response.body),
+                content_type=response.content_type,
+            ))
+            db.commit()
+
+    def abandon(self, key):
+        """
+        Forget a request that failed so the client can retry it.
+        """
+        with self.session_factory() as db:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+            db.commit()
+
+    def purge_expired(self):
+        """
+        Delete expired keys. Returns the number of rows removed.
+        """
+        with self.session_factory() as db:
+            result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.now()))
+            db.commit()
+            return result.rowcount
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+def get_store():
+    """
+    Return the process-wide store selected by ``IDEMPOTENCY_STORE``.
+    """
+    global _STORE  # pylint: disable=global-statement
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                ttl = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+                if os.getenv("IDEMPOTENCY_STORE", "memory") == "database":
+                    # Resolve SessionLocal at call time so it always uses the primary database
+                    _STORE = SqlIdempotencyStore(
+                        lambda: database.database.SessionLocal(), ttl,
+                        lease=float(os.getenv("IDEMPOTENCY_LEASE", "60")),
+                    )
+                else:
+                    _STORE = MemoryIdempotencyStore(ttl)
+    return _STORE
+
+def request_fingerprint():
+    """
+    Hash the method, path and form fields of the current request.
+    """
+    digest = hashlib.sha256(f"{request.method} {request.path}".encode("utf-8"))
+    for name, value in sorted(request.form.items(multi=True)):
+        digest.update(b"\0" + name.encode("utf-8") + b"=" + value.encode("utf-8"))
+    return digest.hexdigest()
+
+def idempotent(store=None):
+    """
+    Decorator making a POST route idempotent for requests carrying ``Idempotency-Key``.
+
+    Only responses with a status below 500 are stored; failed requests can be retried.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            client_key = request.headers.get(HEADER)
+            if not client_key:
+                return func(*args, **kwargs)
+            if len(client_key) > 200:
+                return jsonify({"error": f"{HEADER} must be at most 200 characters"}), 400
+            active_store = store or get_store()
+            key = f"{request.path}:{client_key}"
+            state, stored = active_store.begin(key, request_fingerprint())
+            if state == REPLAY:
+                logging.info("MYLOG: Replaying stored response for %s", key)
+                response = make_response(stored.body, stored.status_code)
+                response.content_type = stored.content_type
+                response.headers["Idempotent-Replayed"] = "true"
+                return response
+            if state == MISMATCH:
+                return jsonify({"error": f"{HEADER} was already used for a different request"}), 422
+            if state == IN_PROGRESS:
+                return jsonify({"error": "A request with this key is still in progress"}), 409
+
+            try:
+                response = make_response(func(*args, **kwargs))
+            except Exception:
+                active_store.abandon(key)
+                raise
+            if response.status_code >= 500:
+                active_store.abandon(key)
+            else:
+                active_store.complete(key, StoredResponse(
+                    response.status_code, response.get_data(), response.content_type
+                ))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,235 @@
+"""
+Transactional outbox and background worker for post-booking side effects.
+
+Route handlers call ``enqueue`` to add an ``OutboxMessage`` in the same transaction as the
+reservation change, so a side effect is recorded if and only if the booking commits. An
+``OutboxWorker`` then drains the table in batches outside the request path, retrying failed
+messages with exponential backoff and moving them to ``outbox_dead_letter`` after
+``max_attempts``.
+
+Run a worker process next to the application with::
+
+    python -m utils.outbox
+"""
+
+import json
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timedelta
+from dataclasses import dataclass, field
+from sqlalchemy import select
+from models.models import OutboxMessage, OutboxDeadLetter
+
+HANDLERS = {}
+
+def register_handler(topic):
+    """
+    Decorator registering a function as the handler for ``topic``.
+    The handler receives the decoded payload and raises to signal a failure.
+    """
+    def decorator(func):
+        HANDLERS[topic] = func
+        return func
+    return decorator
+
+def enqueue(db, topic, payload):
+    """
+    Add a message to the outbox. It is only delivered if ``db``'s transaction commits.
+    """
+    message = OutboxMessage(
+        topic=topic, payload=json.dumps(payload), attempts=0, available_at=datetime.now()
+    )
+    db.add(message)
+    return message
+
+@dataclass
+class OutboxMetrics:
+    """
+    Counters describing the work done by an outbox worker.
+    """
+    batches: int = 0
+    delivered: int = 0
+    retried: int = 0
+    dead_lettered: int = 0
+    busy_seconds: float = 0.0
+    started: float = field(default_factory=time.monotonic)
+
+    def throughput(self):
+        """
+        Messages delivered per second of processing time.
+        """
+        return self.delivered / self.busy_seconds if self.busy_seconds else 0.0
+
+    def as_dict(self):
+        """
+        Return the metrics as a JSON-serializable dictionary.
+        """
+        return {
+            "batches": self.batches,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "throughput_per_second": round(self.throughput(), 2),
+            "uptime_seconds": round(time.monotonic() - self.started, 2),
+        }
+
+class OutboxWorker:
+    """
+    Drains the outbox in batches, with retries, backoff and a dead-letter store.
+    """
+
+    def __init__(self, session_factory, handlers=None, batch_size=100, max_attempts=5,
+                 base_delay=1.0, max_delay=300.0, clock=datetime.now):
+        self.session_factory = session_factory
+        self.handlers = HANDLERS if handlers is None else handlers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = OutboxMetrics()
+        self._clock = clock
+        self._stop = threading.Event()
+        self._thread = None
+
+    def backoff(self, attempts):
+        """
+        Delay before the next attempt: exponential with full jitter, capped at ``max_delay``.
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempts - 1)))
+
+    def run_once(self):
+        """
+        Claim and process one batch of due messages.
+
+        Returns:
+            The number of messages processed (delivered, retried or dead-lettered).
+        """
+        started = time.perf_counter()
+        with self.session_factory() as db:
+            now = self._clock()
+            # SKIP LOCKED lets several workers drain the table without blocking each other;
+            # databases without row locks (SQLite) ignore it.
+            messages = db.execute(
+                select(OutboxMessage)
+                .where(OutboxMessage.available_at <= now)
+                .order_by(OutboxMessage.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            for message in messages:
+                self._process(db, message, now)
+            db.commit()
+        if messages:
+            self.metrics.batches += 1
+            self.metrics.busy_seconds += time.perf_counter() - started
+        return len(messages)
+
+    def _process(self, db, message, now):
+        handler = self.handlers.get(message.topic)
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for topic {message.topic}")
+            handler(json.loads(message.payload))
+        except Exception as exc:  # pylint: disable=broad-except
+            message.attempts += 1
+            message.last_error = repr(exc)
+            if message.attempts >= self.max_attempts:
+                logging.error("MYLOG: Outbox message %s dead-lettered: %s", message.id, exc)
+                db.add(OutboxDeadLetter(
+                    message_id=message.id, topic=message.topic, payload=message.payload,
+                    attempts=message.attempts, last_error=message.last_error,
+                ))
+                db.delete(message)
+                self.metrics.dead_lettered += 1
+            else:
+                delay = self.backoff(message.attempts)
+                logging.warning("MYLOG: Outbox message %s failed (attempt %d), retrying in %.1fs",
+                                message.id, message.attempts, delay)
+                message.available_at = now + timedelta(seconds=delay)
+                self.metrics.retried += 1
+            return
+        db.delete(message)
+        self.metrics.delivered += 1
+
+    def drain(self):
+        """
+        Process batches until no message is due. Useful for tests and one-off runs.
+        """
+        total = 0
+        while True:
+            processed = self.run_once()
+            total += processed
+            if processed == 0:
+                return total
+
+    def run_forever(self, poll_interval=1.0):
+        """
+        Process batches until ``stop`` is called, sleeping while the outbox is empty.
+        """
+        while not self._stop.is_set():
+            try:
+                if self.run_once() == 0:
+                    self._stop.wait(poll_interval)
+            except Exception as exc:  # pylint: disable=broad-except
+                logging.error("MYLOG: Outbox worker error: %s", exc)
+                self._stop.wait(poll_interval)
+
+    def start(self, poll_interval=1.0):
+        """
+        Run the worker in a background thread of the current process.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self.run_forever, args=(poll_interval,), name="outbox-worker", daemon=True
+        )
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        """
+        Ask the worker to stop and wait for its thread to finish.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+@register_handler("reservation.created")
+def send_reservation_received(payload):
+    """
+    Notify the passenger that the reservation was received.
+    """
+    logging.info("MYLOG: Sending reservation received email for reservation %s",
+                 payload["reservation_id"])
+
+@register_handler("reservation.paid")
+def send_confirmation(payload):
+    """
+    Send the booking confirmation once payment succeeded.
+    """
+    logging.info("MYLOG: Sending confirmation email for reservation %s",
+                 payload["reservation_id"])
+
+@register_handler("reservation.checked_in")
+def issue_boarding_pass(payload):
+    """
+    Issue the boarding pass after check-in.
+    """
+    logging.info("MYLOG: Issuing boarding pass for reservation %s with %s bags",
+                 payload["reservation_id"], payload["number_of_bags"])
+
+if __name__ == "__main__":
+    from database import router  # pylint: disable=ungrouped-imports
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    # Each reservation shard has its own outbox table and worker
+    workers = [OutboxWorker(factory) for factory in router.session_factories]
+    for shard_worker in workers[1:]:
+        shard_worker.start()
+    try:
+        workers[0].run_forever()
+    except KeyboardInterrupt:
+        for shard_worker in workers:
+            shard_worker.stop()
+            logging.info("MYLOG: Outbox worker stopped: %s", shard_worker.metrics.as_dict())
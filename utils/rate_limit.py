@@ -0,0 +1,308 @@
+"""
+Rate limiting and admission control for the Flight Reservation Flask Application.
+
+Two independent layers protect the database from being saturated by search traffic:
+
+* A token-bucket rate limiter keyed by client and route. Buckets live in a pluggable
+  backend: ``MemoryBackend`` for a single process, ``RedisBackend`` for state shared
+  between workers. Set ``RATE_LIMIT_REDIS_URL`` to use Redis; otherwise every worker
+  process keeps its own buckets, which multiplies the effective limit by the number of workers.
+* A concurrency-based admission controller that sheds low-priority requests (searches)
+  when the number of in-flight requests, the observed latency or the DB pool usage
+  crosses a threshold, so bookings keep priority.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import islice
+from flask import g, jsonify, request
+
+PRIORITY_HIGH = "high"
+PRIORITY_LOW = "low"
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    """
+    Rate limit and admission settings for one group of endpoints.
+    """
+    name: str
+    priority: str
+    rate: float  # Tokens added per second
+    burst: int  # Bucket capacity
+
+class MemoryBackend:
+    """
+    In-process token bucket storage. Suitable for a single worker or for tests.
+
+    Buckets are kept in least recently used order with the refill parameters of the policy
+    that last used them. Every ``evict_every`` calls, the ``evict_batch`` least recently
+    used buckets are checked and dropped if they have refilled completely, since a full
+    bucket carries no state. Above ``max_keys`` buckets, the least recently used ones are
+    dropped even if they are not full yet.
+    """
+
+    def __init__(self, max_keys=100_000, evict_every=1_000, evict_batch=100):
+        self._buckets = OrderedDict()  # key -> (tokens, last, seconds to refill completely)
+        self._lock = threading.Lock()
+        self._max_keys = max_keys
+        self._evict_every = evict_every
+        self._evict_batch = evict_batch
+        self._calls = 0
+
+    def consume(self, key, rate, burst, now, cost=1):
+        """
+        Take ``cost`` tokens from the bucket identified by ``key``.
+
+        Returns:
+            A ``(allowed, retry_after)`` tuple; ``retry_after`` is in seconds.
+        """
+        full_after = burst / rate if rate else float("inf")
+        with self._lock:
+            tokens, last, _ = self._buckets.pop(key, (float(burst), now, full_after))
+            tokens = min(float(burst), tokens + (now - last) * rate)
+            if tokens >= cost:
+                tokens -= cost
+                allowed, retry_after = True, 0.0
+            else:
+                allowed, retry_after = False, (cost - tokens) / rate if rate else float("inf")
+            self._buckets[key] = (tokens, now, full_after)  # Now the most recently used
+            self._calls += 1
+            if self._calls % self._evict_every == 0 or len(self._buckets) > self._max_keys:
+                self._evict(now)
+            return allowed, retry_after
+
+    def _evict(self, now):
+        """
+        Drop full buckets among the least recently used ones, then any bucket over
+        ``max_keys``. Called with the lock held.
+        """
+        for key in list(islice(self._buckets, self._evict_batch)):
+            _, last, full_after = self._buckets[key]
+            if now - last >= full_after:
+                del self._buckets[key]
+        while len(self._buckets) > self._max_keys:
+            self._buckets.popitem(last=False)
+
+class RedisBackend:
+    """
+    Token bucket storage shared between processes through Redis.
+
+    The bucket update runs as a Lua script so concurrent workers see a consistent count.
+    Any client exposing ``register_script`` (e.g. ``redis.Redis``) can be passed in.
+    """
+
+    SCRIPT = """
+    local key = KEYS[1]
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local state = redis.call('HMGET', key, 'tokens', 'last')
+    local tokens = tonumber(state[1]) or burst
+    local last = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + (now - last) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', key, 'tokens', tokens, 'last', now)
+    redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, client, prefix="ratelimit:"):
+        self._script = client.register_script(self.SCRIPT)
+        self._prefix = prefix
+
+    def consume(self, key, rate, burst, now, cost=1):
+        """
+        Take ``cost`` tokens from the shared bucket identified by ``key``.
+        """
+        allowed, tokens = self._script(
+            keys=[self._prefix + key], args=[rate, burst, now, cost]
+        )
+        if int(allowed):
+            return True, 0.0
+        return False, (cost - float(tokens)) / rate
+
+def create_backend():
+    """
+    Return the backend selected by ``RATE_LIMIT_REDIS_URL``, or a ``MemoryBackend`` when it
+    is unset.
+    """
+    url = os.getenv("RATE_LIMIT_REDIS_URL")
+    if not url:
+        return MemoryBackend()
+    import redis  # pylint: disable=import-outside-toplevel
+    return RedisBackend(redis.Redis.from_url(url))
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter keyed by client and route.
+    """
+
+    def __init__(self, backend=None, clock=time.time):
+        self.backend = backend or create_backend()
+        self._clock = clock
+
+    def hit(self, policy, client_id):
+        """
+        Record one request for ``client_id`` against ``policy``.
+        """
+        key = f"{policy.name}:{client_id}"
+        return self.backend.consume(key, policy.rate, policy.burst, self._clock())
+
+class AdmissionController:
+    """
+    Concurrency-based admission control with priority shedding.
+
+    High-priority requests may use every slot up to ``max_concurrency``. Low-priority
+    requests are limited to ``max_concurrency - reserved_high`` slots and are shed
+    while the latency moving average or the DB pool usage is above its threshold.
+    """
+
+    def __init__(self, max_concurrency=32, reserved_high=8, latency_threshold=0.5,
+                 pool_threshold=0.8, pool_usage=None, smoothing=0.2):
+        self.max_concurrency = max_concurrency
+        self.reserved_high = reserved_high
+        self.latency_threshold = latency_threshold
+        self.pool_threshold = pool_threshold
+        self.pool_usage = pool_usage
+        self.smoothing = smoothing
+        self.latency_ewma = 0.0
+        self.in_flight = {PRIORITY_HIGH: 0, PRIORITY_LOW: 0}
+        self.shed_count = 0
+        self._lock = threading.Lock()
+
+    def try_admit(self, priority):
+        """
+        Try to admit a request.
+
+        Returns:
+            ``None`` if the request was admitted, otherwise the reason it was shed.
+        """
+        with self._lock:
+            total = self.in_flight[PRIORITY_HIGH] + self.in_flight[PRIORITY_LOW]
+            reason = None
+            if total >= self.max_concurrency:
+                reason = "concurrency"
+            elif priority == PRIORITY_LOW:
+                reason = self._low_priority_reason(total)
+            if reason:
+                self.shed_count += 1
+                return reason
+            self.in_flight[priority] += 1
+            return None
+
+    def _low_priority_reason(self, total):
+        """
+        Decide whether a low-priority request has to be shed. Called with the lock held.
+        """
+        if total >= self.max_concurrency - self.reserved_high:
+            return "concurrency"
+        # Let one low-priority request through at a time as a probe so the latency
+        # average can recover once the overload is gone.
+        probing = self.in_flight[PRIORITY_LOW] == 0
+        if self.latency_ewma > self.latency_threshold and not probing:
+            return "latency"
+        if self.pool_usage is not None and self.pool_usage() > self.pool_threshold:
+            return "db_pool"
+        return None
+
+    def release(self, priority, elapsed):
+        """
+        Release a slot and feed the request latency into the moving average.
+        """
+        with self._lock:
+            self.in_flight[priority] -= 1
+            self.latency_ewma += self.smoothing * (elapsed - self.latency_ewma)
+
+def pool_usage_for(engine):
+    """
+    Build a callable returning the fraction of the engine's connection pool in use.
+    Returns ``None`` for pools that do not expose their size.
+    """
+    pool = engine.pool
+    if not all(hasattr(pool, attr) for attr in ("checkedout", "size", "_max_overflow")):
+        return None
+
+    def usage():
+        capacity = pool.size() + max(pool._max_overflow, 0)  # pylint: disable=protected-access
+        return pool.checkedout() / capacity if capacity else 0.0
+    return usage
+
+def _parse_policy(name, priority, default):
+    """
+    Read a ``<rate>,<burst>`` pair from ``RATE_LIMIT_<NAME>``.
+    """
+    raw = os.getenv(f"RATE_LIMIT_{name.upper()}", default)
+    rate, burst = (part.strip() for part in raw.split(","))
+    return RoutePolicy(name, priority, float(rate), int(burst))
+
+def default_policies():
+    """
+    Map blueprint endpoints to their rate limit and admission policy.
+    """
+    search = _parse_policy("search", PRIORITY_LOW, "5,20")
+    booking = _parse_policy("booking", PRIORITY_HIGH, "2,10")
+    return {
+        "flights.find_flights": search,
+        "flights.find_connections": search,
+        "flights.create_reservation": booking,
+        "flights.complete_reservation": booking,
+    }
+
+def install_traffic_controls(blueprint, limiter=None, admission=None, policies=None,
+                             pool_usage=None):
+    """
+    Register rate limiting and admission control hooks on a blueprint.
+
+    Must be called before the blueprint is registered on the app.
+    """
+    limiter = limiter or RateLimiter()
+    admission = admission or AdmissionController(
+        max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", "32")),
+        reserved_high=int(os.getenv("ADMISSION_RESERVED_HIGH", "8")),
+        latency_threshold=float(os.getenv("ADMISSION_LATENCY_THRESHOLD", "0.5")),
+        pool_usage=pool_usage,
+    )
+    policies = default_policies() if policies is None else policies
+
+    @blueprint.before_request
+    def _admit():
+        policy = policies.get(request.endpoint)
+        if policy is None:
+            return None
+        allowed, retry_after = limiter.hit(policy, request.remote_addr or "unknown")
+        if not allowed:
+            logging.info("MYLOG: Rate limited %s for %s", policy.name, request.remote_addr)
+            return _reject(429, "Too many requests", retry_after)
+        reason = admission.try_admit(policy.priority)
+        if reason:
+            logging.info("MYLOG: Shed %s request (%s)", policy.name, reason)
+            return _reject(503, "Service busy, please retry", 1.0)
+        g.admission = (policy.priority, time.perf_counter())
+        return None
+
+    @blueprint.teardown_request
+    def _release(_exc):
+        ticket = g.pop("admission", None)
+        if ticket is not None:
+            priority, started = ticket
+            admission.release(priority, time.perf_counter() - started)
+
+    return limiter, admission
+
+def _reject(status, message, retry_after):
+    """
+    Build a JSON error response with a ``Retry-After`` header.
+    """
+    response = jsonify({"error": message})
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, int(retry_after + 0.999)))
+    return response
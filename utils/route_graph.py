@@ -0,0 +1,332 @@
+"""
+Precomputed route graph for multi-leg (connecting) flight searches.
+
+The graph is an adjacency index of flights keyed by ``(departure_city, date_of_departure)``
+with each bucket sorted by departure time, so the legs leaving a city inside a connection
+window are found with a binary search. It is built once from the ``flight`` table with a
+streaming scan and then kept up to date incrementally from committed ORM changes. Changes
+made by other processes, or with bulk statements, are picked up when the graph is rebuilt
+after ``ROUTE_GRAPH_TTL`` seconds (300 by default).
+
+The schema has no arrival time, so each leg is assumed to take ``block_time``
+(``DEFAULT_BLOCK_MINUTES``, 120 minutes by default).
+"""
+
+import os
+import time
+import heapq
+import logging
+import threading
+from bisect import bisect_left
+from datetime import timedelta
+from typing import NamedTuple
+from sqlalchemy import event, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from models.models import Flight
+
+DEFAULT_BLOCK_TIME = timedelta(minutes=int(os.getenv("DEFAULT_BLOCK_MINUTES", "120")))
+GRAPH_TTL = float(os.getenv("ROUTE_GRAPH_TTL", "300"))
+
+class Leg(NamedTuple):
+    """
+    A single flight as stored in the route graph.
+    """
+    flight_id: int
+    flight_number: str
+    operating_airlines: str
+    departure_city: str
+    arrival_city: str
+    departure: object  # datetime
+    arrival: object  # datetime
+    price: float
+
+class Itinerary(NamedTuple):
+    """
+    A sequence of connecting legs from origin to destination.
+    """
+    legs: tuple
+    price: float
+    duration: timedelta
+
+    def to_dict(self):
+        """
+        Serialize the itinerary for a JSON response.
+        """
+        return {
+            "price": round(self.price, 2),
+            "duration_minutes": int(self.duration.total_seconds() // 60),
+            "stops": len(self.legs) - 1,
+            "legs": [{
+                "flight_id": leg.flight_id,
+                "flight_number": leg.flight_number,
+                "operating_airlines": leg.operating_airlines,
+                "departure_city": leg.departure_city,
+                "arrival_city": leg.arrival_city,
+                "departure": leg.departure.isoformat(),
+                "arrival": leg.arrival.isoformat(),
+                "price": leg.price,
+            } for leg in self.legs],
+        }
+
+class RouteGraph:
+    """
+    Time-aware adjacency index of flights with connection search.
+
+    Buckets are replaced copy-on-write under a writer lock, so searches read a
+    consistent bucket without taking the lock.
+    """
+
+    def __init__(self, block_time=DEFAULT_BLOCK_TIME):
+        self.block_time = block_time
+        self._buckets = {}  # (city, date) -> (departure times, legs), both sorted
+        self._legs = {}  # flight_id -> Leg
+        self._lock = threading.Lock()
+        self.loaded_at = None  # time.monotonic() of the last full load
+
+    def __len__(self):
+        return len(self._legs)
+
+    def leg_from_row(self, row):
+        """
+        Build a leg from a ``Flight`` instance or a row with the same attributes.
+        """
+        return Leg(
+            row.id, row.flight_number, row.operating_airlines,
+            row.departure_city.upper(), row.arrival_city.upper(),
+            row.estimated_departure_time,
+            row.estimated_departure_time + self.block_time,
+            float(row.price),
+        )
+
+    def load(self, legs):
+        """
+        Replace the graph contents with ``legs``.
+        """
+        grouped = {}
+        by_id = {}
+        for leg in legs:
+            grouped.setdefault((leg.departure_city, leg.departure.date()), []).append(leg)
+            by_id[leg.flight_id] = leg
+        buckets = {}
+        for key, bucket in grouped.items():
+            bucket.sort(key=lambda leg: leg.departure)
+            buckets[key] = (tuple(leg.departure for leg in bucket), tuple(bucket))
+        with self._lock:
+            self._buckets, self._legs = buckets, by_id
+            self.loaded_at = time.monotonic()
+
+    def load_from_db(self, db, chunk_size=10_000):
+        """
+        Build the graph from the ``flight`` table with a single streaming scan.
+        """
+        stmt = select(
+            Flight.id, Flight.flight_number, Flight.operating_airlines,
+            Flight.departure_city, Flight.arrival_city,
+            Flight.estimated_departure_time, Flight.price,
+        ).execution_options(yield_per=chunk_size)
+        self.load(self.leg_from_row(row) for row in db.execute(stmt))
+        logging.info("MYLOG: Route graph loaded with %d flights", len(self))
+
+    def upsert(self, leg):
+        """
+        Add a flight, or move it if its schedule changed.
+        """
+        with self._lock:
+            self._discard(leg.flight_id)
+            key = (leg.departure_city, leg.departure.date())
+            times, legs = self._buckets.get(key, ((), ()))
+            index = bisect_left(times, leg.departure)
+            self._buckets[key] = (
+                times[:index] + (leg.departure,) + times[index:],
+                legs[:index] + (leg,) + legs[index:],
+            )
+            self._legs[leg.flight_id] = leg
+
+    def remove(self, flight_id):
+        """
+        Remove a flight from the graph if present.
+        """
+        with self._lock:
+            self._discard(flight_id)
+
+    def _discard(self, flight_id):
+        """
+        Remove a flight. Called with the writer lock held.
+        """
+        leg = self._legs.pop(flight_id, None)
+        if leg is None:
+            return
+        key = (leg.departure_city, leg.departure.date())
+        times, legs = self._buckets[key]
+        index = next(i for i, other in enumerate(legs) if other.flight_id == flight_id)
+        if len(legs) == 1:
+            del self._buckets[key]
+        else:
+            self._buckets[key] = (times[:index] + times[index + 1:], legs[:index] + legs[index + 1:])
+
+    def departures(self, city, earliest, latest):
+        """
+        Yield legs leaving ``city`` between ``earliest`` and ``latest`` inclusive.
+        """
+        day = earliest.date()
+        while day <= latest.date():
+            times, legs = self._buckets.get((city, day), ((), ()))
+            for index in range(bisect_left(times, earliest), len(times)):
+                if times[index] > latest:
+                    break
+                yield legs[index]
+            day += timedelta(days=1)
+
+    def search(self, origin, destination, date, max_legs=3,
+               min_connection=timedelta(minutes=45), max_connection=timedelta(hours=12),
+               rank_by="price", limit=10, max_expansions=5_000):
+        """
+        Find up to ``limit`` itineraries from ``origin`` to ``destination`` departing on ``date``.
+
+        Runs a label-setting Dijkstra search over legs, where a leg can follow another if
+        it leaves the arrival city between ``min_connection`` and ``max_connection`` after
+        landing. Itineraries are returned cheapest (``rank_by="price"``) or shortest
+        (``rank_by="duration"``) first.
+
+        A partial itinerary is not expanded once ``limit`` already expanded ones at the same
+        city dominate it (no more expensive, landed no later, no more legs, and for duration
+        ranking departed no earlier). ``max_expansions`` bounds the work done at large hubs.
+        """
+        if rank_by not in ("price", "duration"):
+            raise ValueError("rank_by must be 'price' or 'duration'")
+        by_duration = rank_by == "duration"
+        origin, destination = origin.upper(), destination.upper()
+        _, first_legs = self._buckets.get((origin, date), ((), ()))
+
+        heap = []
+        counter = 0  # Tie breaker so the heap never compares paths
+        for leg in first_legs:
+            cost = (leg.arrival - leg.departure).total_seconds() if by_duration else leg.price
+            heapq.heappush(heap, (cost, counter, leg.price, (leg,)))
+            counter += 1
+
+        results = []
+        expanded = {}  # city -> [(arrival, start, legs), ...] of expanded labels
+        while heap and len(results) < limit:
+            _, _, price, path = heapq.heappop(heap)
+            last, start = path[-1], path[0].departure
+            if last.arrival_city == destination:
+                results.append(Itinerary(path, price, last.arrival - start))
+                continue
+            if len(path) >= max_legs:
+                continue
+            labels = expanded.setdefault(last.arrival_city, [])
+            dominators = sum(
+                1 for arrival, other_start, legs in labels
+                if arrival <= last.arrival and legs <= len(path)
+                and (not by_duration or other_start >= start)
+            )
+            if dominators >= limit:
+                continue
+            max_expansions -= 1
+            if max_expansions < 0:
+                break
+            labels.append((last.arrival, start, len(path)))
+
+            visited = {leg.departure_city for leg in path}
+            final_leg = len(path) == max_legs - 1
+            for nxt in self.departures(last.arrival_city, last.arrival + min_connection,
+                                       last.arrival + max_connection):
+                if nxt.arrival_city in visited or (final_leg and nxt.arrival_city != destination):
+                    continue
+                total = price + nxt.price
+                cost = (nxt.arrival - start).total_seconds() if by_duration else total
+                heapq.heappush(heap, (cost, counter, total, path + (nxt,)))
+                counter += 1
+        return results
+
+    def track_changes(self):
+        """
+        Keep the graph in sync with ``Flight`` rows committed through any ORM session.
+
+        Changes are collected at flush time and applied only after the transaction commits.
+        """
+        event.listen(Session, "after_flush", self._collect_changes)
+        event.listen(Session, "after_commit", self._apply_changes)
+        event.listen(Session, "after_rollback", self._discard_changes)
+
+    def untrack_changes(self):
+        """
+        Stop following ``Flight`` changes.
+        """
+        event.remove(Session, "after_flush", self._collect_changes)
+        event.remove(Session, "after_commit", self._apply_changes)
+        event.remove(Session, "after_rollback", self._discard_changes)
+
+    def _collect_changes(self, session, _flush_context):
+        pending = session.info.setdefault("route_graph_changes", [])
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, Flight):
+                pending.append((obj.id, self.leg_from_row(obj)))
+        for obj in session.deleted:
+            if isinstance(obj, Flight):
+                pending.append((obj.id, None))
+
+    def _apply_changes(self, session):
+        for flight_id, leg in session.info.pop("route_graph_changes", []):
+            if leg is None:
+                self.remove(flight_id)
+            else:
+                self.upsert(leg)
+
+    def _discard_changes(self, session):  # A bound method, so each graph has its own listener
+        session.info.pop("route_graph_changes", None)
+
+_GRAPH = None
+_GRAPH_LOCK = threading.Lock()
+
+def get_route_graph(db, ttl=GRAPH_TTL):
+    """
+    Return the process-wide route graph, building it with ``db`` on first use and rebuilding
+    it once it is older than ``ttl`` seconds.
+
+    Only the first build blocks. Afterwards one request rebuilds the graph while concurrent
+    searches keep using the previous one, which is also kept if the rebuild fails.
+    """
+    graph = _GRAPH
+    if graph is None:
+        with _GRAPH_LOCK:
+            if _GRAPH is None:
+                _rebuild(db)
+            graph = _GRAPH
+    elif time.monotonic() - graph.loaded_at > ttl and _GRAPH_LOCK.acquire(blocking=False):
+        try:
+            if _GRAPH is graph:  # Not rebuilt or invalidated since we read it
+                _rebuild(db)
+        except SQLAlchemyError as exc:
+            db.rollback()
+            logging.error("MYLOG: Failed to rebuild route graph: %s", exc)
+        finally:
+            _GRAPH_LOCK.release()
+        if _GRAPH is not None:
+            graph = _GRAPH
+    return graph
+
+def _rebuild(db):
+    """
+    Load a new graph and swap it in. Called with ``_GRAPH_LOCK`` held.
+    """
+    global _GRAPH  # pylint: disable=global-statement
+    graph = RouteGraph()
+    graph.load_from_db(db)
+    if _GRAPH is not None:
+        _GRAPH.untrack_changes()
+    graph.track_changes()
+    _GRAPH = graph
+
+def invalidate_route_graph():
+    """
+    Drop the graph so the next request rebuilds it, e.g. after flights were changed with
+    bulk statements that the ORM listeners do not see.
+    """
+    global _GRAPH  # pylint: disable=global-statement
+    with _GRAPH_LOCK:
+        if _GRAPH is not None:
+            _GRAPH.untrack_changes()
+        _GRAPH = None
@@ -2,6 +2,9 @@
 Utility functions for handling SQL operations in the Flight Reservation Flask Application.
 """
 
+from sqlalchemy import and_, insert, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.sql import text
 
 def execute_sql_script(session, file_path):
@@ -19,3 +22,38 @@ def execute_sql_script(session, file_path):
             statement = statement.strip()
             if statement:  # Skip empty statements
                 session.execute(text(statement))
+
+def increment_counters(connection, table, row, deltas):
+    """
+    Add ``deltas`` to the counter columns of the row whose primary key is given in ``row``,
+    inserting ``row`` with the deltas as initial counters if it does not exist yet.
+
+    Uses a single atomic upsert on MySQL and SQLite, and update-then-insert elsewhere.
+
+    Args:
+        connection: The SQLAlchemy connection to use (``session.connection()``).
+        table: The ``Table`` holding the counters.
+        row: Mapping of the primary key and other non-counter columns to values.
+        deltas: Mapping of counter columns to the amounts to add.
+    """
+    dialect = connection.dialect.name
+    if dialect == "mysql":
+        statement = mysql_insert(table).values(**row, **deltas)
+        statement = statement.on_duplicate_key_update(
+            {name: table.c[name] + statement.inserted[name] for name in deltas}
+        )
+    elif dialect == "sqlite":
+        statement = sqlite_insert(table).values(**row, **deltas)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(table.primary_key.columns),
+            set_={name: table.c[name] + statement.excluded[name] for name in deltas},
+        )
+    else:
+        condition = and_(*(column == row[column.name] for column in table.primary_key.columns))
+        result = connection.execute(update(table).where(condition).values(
+            {name: table.c[name] + value for name, value in deltas.items()}
+        ))
+        if result.rowcount:
+            return
+        statement = insert(table).values(**row, **deltas)
+    connection.execute(statement)
@@ -214,6 +214,136 @@ def get_swagger_json(request, base_url):
                         }
                     }
                 }
+            },
+            "/flights/import": {
+                "post": {
+                    "summary": "Import a flight schedule (CSV or JSON Lines request body)",
+                    "consumes": ["text/csv", "application/x-ndjson"],
+                    "parameters": [
+                        {
+                            "name": "Authorization", "in": "header", "required": True,
+                            "type": "string", "description": "Bearer <IMPORT_TOKEN>"
+                        },
+                        {"name": "format", "in": "query", "type": "string", "enum": ["csv", "jsonl"]},
+                        {"name": "body", "in": "body", "required": True, "schema": {"type": "string"}}
+                    ],
+                    "produces": ["application/json"],
+                    "responses": {
+                        "200": {"description": "Import report with counts and rejected rows."},
+                        "400": {"description": "Unreadable schedule."},
+                        "403": {"description": "Import disabled or wrong token."}
+                    }
+                }
+            },
+            "/stats": {
+                "get": {
+                    "summary": "Booking counters per flight and per departure day",
+                    "parameters": [
+                        {
+                            "name": "flight_id", "in": "query", "type": "array",
+                            "items": {"type": "integer"}, "collectionFormat": "multi"
+                        },
+                        {
+                            "name": "date", "in": "query", "type": "array",
+                            "items": {"type": "string"}, "collectionFormat": "multi",
+                            "description": "YYYY-MM-DD"
+                        }
+                    ],
+                    "produces": ["application/json"],
+                    "responses": {
+                        "200": {"description": "Reservations, check-ins, bags and revenue."},
+                        "400": {"description": "Invalid input data."}
+                    }
+                }
+            },
+            "/cities/suggest": {
+                "get": {
+                    "summary": "Autocomplete city names, most booked first",
+                    "parameters": [
+                        {"name": "q", "in": "query", "required": True, "type": "string"},
+                        {"name": "limit", "in": "query", "type": "integer", "default": 10}
+                    ],
+                    "produces": ["application/json"],
+                    "responses": {
+                        "200": {"description": "Matching cities with their reservation counts."},
+                        "400": {"description": "Invalid input data."}
+                    }
+                }
+            },
+            "/connections": {
+                "get": {
+                    "summary": "Search direct and connecting flights",
+                    "parameters": [
+                        {"name": "departure", "in": "query", "required": True, "type": "string"},
+                        {"name": "arrival", "in": "query", "required": True, "type": "string"},
+                        {
+                            "name": "date_of_departure", "in": "query", "required": True,
+                            "type": "string", "description": "MM/DD/YYYY or YYYY-MM-DD"
+                        },
+                        {"name": "max_legs", "in": "query", "type": "integer", "default": 3},
+                        {
+                            "name": "min_connection_minutes", "in": "query",
+                            "type": "integer", "default": 45, "minimum": 0
+                        },
+                        {
+                            "name": "sort", "in": "query", "type": "string",
+                            "enum": ["price", "duration"], "default": "price"
+                        }
+                    ],
+                    "produces": ["application/json"],
+                    "responses": {
+                        "200": {"description": "Itineraries ranked by price or duration."},
+                        "400": {"description": "Invalid input data."}
+                    }
+                }
+            },
+            "/fares/calendar": {
+                "get": {
+                    "summary": "Cheapest and median fares per day for a route",
+                    "parameters": [
+                        {"name": "departure", "in": "query", "required": True, "type": "string"},
+                        {"name": "arrival", "in": "query", "required": True, "type": "string"},
+                        {
+                            "name": "month", "in": "query", "required": True,
+                            "type": "string", "description": "YYYY-MM"
+                        },
+                        {"name": "bins", "in": "query", "type": "integer", "default": 10}
+                    ],
+                    "produces": ["application/json"],
+                    "responses": {
+                        "200": {"description": "Per-day fares, route summary and histogram."},
+                        "400": {"description": "Invalid input data."}
+                    }
+                }
+            },
+            "/reservations/{reservation_id}/events": {
+                "get": {
+                    "summary": "Stream reservation status changes as server-sent events",
+                    "parameters": [
+                        {"name": "reservation_id", "in": "path", "required": True, "type": "integer"},
+                        {"name": "Last-Event-ID", "in": "header", "type": "integer"}
+                    ],
+                    "produces": ["text/event-stream"],
+                    "responses": {
+                        "200": {"description": "Event stream with periodic heartbeats."},
+                        "404": {"description": "Reservation not found."}
+                    }
+                }
+            },
+            "/reservations/{reservation_id}/status": {
+                "get": {
+                    "summary": "Long-poll reservation status changes",
+                    "parameters": [
+                        {"name": "reservation_id", "in": "path", "required": True, "type": "integer"},
+                        {"name": "since", "in": "query", "type": "integer"},
+                        {"name": "timeout", "in": "query", "type": "number", "default": 25}
+                    ],
+                    "produces": ["application/json"],
+                    "responses": {
+                        "200": {"description": "Events newer than since, possibly empty."},
+                        "404": {"description": "Reservation not found."}
+                    }
+                }
             }
         }
     })
@@ -0,0 +1,479 @@
+"""
+Capture of live traffic and deterministic replay for load testing.
+
+Capture is off unless ``TRAFFIC_CAPTURE_PATH`` is set. Each request to ``flight_bp`` is then
+appended to that JSON Lines file with its arrival time, endpoint, query, form or JSON body,
+response status and duration. Personal and payment fields (card numbers, emails, phones,
+names, tokens) are replaced by salted pseudonyms of the same shape, so replayed bookings
+still validate and repeated values stay correlated. ``TRAFFIC_CAPTURE_SAMPLE`` records only
+a share of requests. Set ``TRAFFIC_CAPTURE_SALT`` to the same value on every worker so their
+pseudonyms match; without it each process uses a random salt.
+
+Replay plays a capture against the app in-process (Flask test client, usually on a SQLite
+stand-in) or against a running server, at the original pacing or ``--speed`` times faster,
+from a thread pool::
+
+    python -m utils.traffic replay capture.jsonl --sqlite replay.db --schedule flights.csv \\
+        --speed 4 --out run1.jsonl
+    python -m utils.traffic replay capture.jsonl --base-url http://localhost:5000 --out run2.jsonl
+    python -m utils.traffic report run2.jsonl --baseline run1.jsonl
+
+Reservation ids differ between runs, so ids created during the capture are mapped to the
+ids created during the replay: a request using a reservation waits until the replayed
+request that created it has finished.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import secrets
+import logging
+import argparse
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+from flask import g, request
+
+SENSITIVE = re.compile(r"card|cvv|cvc|email|phone|password|token|secret|name$", re.IGNORECASE)
+KEPT_HEADERS = ("Content-Type", "Idempotency-Key", "Last-Event-ID", "Accept")
+_RESPONSE_RESERVATION_ID = re.compile(rb'reservation_id(?:" value="|=|": ?)(\d+)')
+_PATH_RESERVATION_ID = re.compile(r"/reservations/(\d+)/")
+
+def mask(value, salt=""):
+    """
+    Replace digits and letters of ``value`` by pseudorandom ones derived from a salted hash,
+    keeping its length and punctuation (``@``, ``.``, ``-``).
+    """
+    text = str(value)
+    digest = hashlib.sha256((salt + text).encode()).digest()
+    masked = []
+    for index, char in enumerate(text):
+        byte = digest[index % len(digest)] ^ index
+        if char.isdigit():
+            masked.append(str(byte % 10))
+        elif char.isalpha():
+            masked.append(chr((ord("a") if char.islower() else ord("A")) + byte % 26))
+        else:
+            masked.append(char)
+    masked = "".join(masked)
+    return int(masked) if isinstance(value, int) and not isinstance(value, bool) else masked
+
+def sanitize(data, salt=""):
+    """
+    Return a copy of a form, query or JSON body with sensitive fields masked.
+    """
+    if isinstance(data, dict):
+        return {
+            key: mask(value, salt) if SENSITIVE.search(key) and isinstance(value, (str, int))
+            else sanitize(value, salt)
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [sanitize(value, salt) for value in data]
+    return data
+
+class TrafficRecorder:
+    """
+    Appends sanitized request records to a JSON Lines file.
+    """
+
+    def __init__(self, path, sample=1.0, salt=None):
+        self.path = path
+        self.sample = sample
+        self.salt = salt if salt is not None else secrets.token_hex(16)
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")  # pylint: disable=consider-using-with
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a recorder from the environment, or return None when capture is off.
+        """
+        path = os.getenv("TRAFFIC_CAPTURE_PATH")
+        if not path:
+            return None
+        return cls(path, float(os.getenv("TRAFFIC_CAPTURE_SAMPLE", "1")),
+                   os.getenv("TRAFFIC_CAPTURE_SALT"))
+
+    def record(self, response, started, elapsed):
+        """
+        Write the record of the current request and its response.
+        """
+        record = {
+            "ts": round(started, 6),
+            "client": hashlib.sha256((self.salt + (request.remote_addr or "")).encode()).hexdigest()[:8],
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "query": sanitize(request.args.to_dict(), self.salt),
+            "headers": {name: request.headers[name] for name in KEPT_HEADERS if name in request.headers},
+            "status": response.status_code,
+            "ms": round(elapsed * 1000, 3),
+        }
+        if request.mimetype == "application/json":
+            record["json"] = sanitize(request.get_json(silent=True), self.salt)
+        elif request.form:
+            record["form"] = sanitize(request.form.to_dict(), self.salt)
+        elif request.method in ("POST", "PUT", "PATCH") and request.content_length:
+            record["body_omitted"] = True  # Raw uploads, e.g. schedule imports
+        if response.is_streamed:
+            record["streamed"] = True
+        else:
+            match = _RESPONSE_RESERVATION_ID.search(response.get_data())
+            if match:
+                record["reservation_id"] = int(match.group(1))
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        """
+        Close the capture file.
+        """
+        with self._lock:
+            self._file.close()
+
+recorder = TrafficRecorder.from_env()
+
+def install_traffic_capture(blueprint):
+    """
+    Register the capture hooks on a blueprint. They do nothing while ``recorder`` is None.
+
+    Must be called before the blueprint is registered on the app, and before other hooks
+    whose time should be included in the recorded duration.
+    """
+
+    @blueprint.before_request
+    def _start_capture():
+        if recorder is not None and (recorder.sample >= 1 or random.random() < recorder.sample):
+            g.capture = (time.time(), time.perf_counter())
+
+    @blueprint.after_request
+    def _capture(response):
+        started = g.pop("capture", None)
+        if started is not None and recorder is not None:
+            try:
+                recorder.record(response, started[0], time.perf_counter() - started[1])
+            except (OSError, ValueError) as exc:
+                logging.error("MYLOG: Failed to capture request: %s", exc)
+        return response
+
+def load_records(path):
+    """
+    Read a capture or replay results file. Capture records are ordered by arrival time and
+    numbered with a ``seq`` field, which replay results keep.
+    """
+    with open(path, encoding="utf-8") as file:
+        records = [json.loads(line) for line in file if line.strip()]
+    if records and "seq" not in records[0]:
+        records.sort(key=lambda record: record["ts"])
+        for seq, record in enumerate(records):
+            record["seq"] = seq
+    return records
+
+def _referenced_reservation(record):
+    for source in (record.get("form") or {}, record.get("query") or {}, record.get("json") or {}):
+        if isinstance(source, dict) and str(source.get("reservation_id", "")).isdigit():
+            return int(source["reservation_id"])
+    match = _PATH_RESERVATION_ID.search(record["path"])
+    return int(match.group(1)) if match else None
+
+def _with_reservation(record, new_id):
+    record = dict(record)
+    for name in ("form", "query", "json"):
+        if isinstance(record.get(name), dict) and "reservation_id" in record[name]:
+            record[name] = dict(record[name], reservation_id=str(new_id))
+    record["path"] = _PATH_RESERVATION_ID.sub(f"/reservations/{new_id}/", record["path"])
+    return record
+
+class FlaskTarget:
+    """
+    Sends requests to a Flask app in-process through one test client per thread.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def send(self, record):
+        """
+        Send a recorded request and return ``(status, body)``.
+        """
+        if not hasattr(self._local, "client"):
+            self._local.client = self.app.test_client()
+        client_hash = bytes.fromhex(record.get("client") or "00000000")
+        response = self._local.client.open(
+            record["path"], method=record["method"], query_string=record.get("query"),
+            data=record.get("form"), json=record.get("json"),
+            headers={k: v for k, v in record.get("headers", {}).items() if k != "Content-Type"},
+            environ_base={"REMOTE_ADDR": f"10.{client_hash[0]}.{client_hash[1]}.{client_hash[2]}"},
+        )
+        return response.status_code, response.get_data()
+
+class HttpTarget:
+    """
+    Sends requests to a running server.
+    """
+
+    def __init__(self, base_url, timeout=30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def send(self, record):
+        """
+        Send a recorded request and return ``(status, body)``; status 0 if the server is
+        unreachable.
+        """
+        url = self.base_url + record["path"]
+        if record.get("query"):
+            url += "?" + urlencode(record["query"])
+        headers = {k: v for k, v in record.get("headers", {}).items() if k != "Content-Type"}
+        data = None
+        if record.get("json") is not None:
+            data = json.dumps(record["json"]).encode()
+            headers["Content-Type"] = "application/json"
+        elif record.get("form") is not None:
+            data = urlencode(record["form"]).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        try:
+            with urlopen(Request(url, data=data, headers=headers, method=record["method"]),
+                         timeout=self.timeout) as response:
+                return response.status, response.read()
+        except HTTPError as exc:
+            return exc.code, exc.read()
+        except (URLError, OSError) as exc:
+            logging.error("MYLOG: Replay request to %s failed: %s", url, exc)
+            return 0, b""
+
+class Replayer:
+    """
+    Replays captured records against a target from a thread pool.
+
+    ``speed`` divides the gaps between requests (0 sends them as fast as the pool allows).
+    Streamed responses (server-sent events) and raw uploads are skipped unless
+    ``include_streams`` is set, as they cannot be reproduced from the capture.
+    """
+
+    def __init__(self, target, speed=1.0, threads=8, include_streams=False, id_timeout=10.0):
+        self.target = target
+        self.speed = speed
+        self.threads = threads
+        self.include_streams = include_streams
+        self.id_timeout = id_timeout
+        self._creators = {}  # seq of the request that created a reservation -> captured id
+        self._created = {}  # Captured reservation id -> Event set once the replay created it
+        self._ids = {}  # Captured reservation id -> replayed reservation id
+
+    def _send(self, record, due):
+        lag = time.perf_counter() - due
+        creates = self._creators.get(record["seq"])
+        reference = _referenced_reservation(record)
+        if reference in self._created:
+            self._created[reference].wait(self.id_timeout)
+            record = _with_reservation(record, self._ids.get(reference, reference))
+        started = time.perf_counter()
+        status, body = self.target.send(record)
+        elapsed = time.perf_counter() - started
+        if creates is not None:
+            match = _RESPONSE_RESERVATION_ID.search(body)
+            if match:
+                self._ids[creates] = int(match.group(1))
+            self._created[creates].set()  # Waiters fall back to the captured id on failure
+        return {
+            "seq": record["seq"], "endpoint": record.get("endpoint"), "method": record["method"],
+            "path": record["path"], "status": status, "ms": round(elapsed * 1000, 3),
+            "lag_ms": round(max(lag, 0.0) * 1000, 3),
+            "captured_status": record.get("status"), "captured_ms": record.get("ms"),
+        }
+
+    def run(self, records):
+        """
+        Replay the records (as returned by ``load_records``) and return one result per request.
+        """
+        records = [r for r in records
+                   if self.include_streams or not (r.get("streamed") or r.get("body_omitted"))]
+        if not records:
+            return []
+        self._creators, self._created, self._ids = {}, {}, {}
+        for record in records:  # The first record returning an id it was not given created it
+            created = record.get("reservation_id")
+            if created is not None and created not in self._created \
+                    and _referenced_reservation(record) is None:
+                self._creators[record["seq"]] = created
+                self._created[created] = threading.Event()
+        first = records[0]["ts"]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            futures = []
+            for record in records:
+                due = start + (record["ts"] - first) / self.speed if self.speed else start
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(self._send, record, due))
+            return [future.result() for future in futures]
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, max(0, int(fraction * len(ordered) + 0.999999) - 1))]
+
+def summarize(records):
+    """
+    Return latency percentiles (ms) and error counts per endpoint and for ``all`` requests.
+    """
+    groups = defaultdict(list)
+    errors = defaultdict(int)
+    for record in records:
+        for name in (record.get("endpoint") or record["path"], "all"):
+            groups[name].append(record["ms"])
+            if not 0 < record["status"] < 500:
+                errors[name] += 1
+    summary = {}
+    for name, values in sorted(groups.items()):
+        values.sort()
+        summary[name] = {
+            "count": len(values), "p50": _percentile(values, 0.5), "p95": _percentile(values, 0.95),
+            "p99": _percentile(values, 0.99), "max": values[-1], "errors": errors[name],
+        }
+    return summary
+
+def diff(baseline, current):
+    """
+    Compare two runs (or a capture and a run): latency percentile changes per endpoint and
+    the requests whose status changed, matched by ``seq``.
+    """
+    before, after = summarize(baseline), summarize(current)
+    latency = {}
+    for name in sorted(set(before) & set(after)):
+        latency[name] = {
+            quantile: {
+                "before": before[name][quantile], "after": after[name][quantile],
+                "change": round((after[name][quantile] / before[name][quantile] - 1) * 100, 1)
+                if before[name][quantile] else None,
+            }
+            for quantile in ("p50", "p95", "p99")
+        }
+    statuses = {record["seq"]: record["status"] for record in baseline}
+    changed = [
+        {"seq": record["seq"], "endpoint": record.get("endpoint"),
+         "before": statuses[record["seq"]], "after": record["status"]}
+        for record in current
+        if record["seq"] in statuses and statuses[record["seq"]] != record["status"]
+    ]
+    return {"latency": latency, "status_changes": changed,
+            "missing": len(set(statuses) - {record["seq"] for record in current})}
+
+def format_summary(summary):
+    """
+    Render a summary as a text table.
+    """
+    lines = [f"{'endpoint':40} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'errors':>6}"]
+    for name, row in summary.items():
+        lines.append(f"{name:40} {row['count']:7d} {row['p50']:9.2f} {row['p95']:9.2f} "
+                     f"{row['p99']:9.2f} {row['max']:9.2f} {row['errors']:6d}")
+    return "\n".join(lines)
+
+def format_diff(result):
+    """
+    Render a comparison as text.
+    """
+    lines = [f"{'endpoint':40} {'p50 ms':>21} {'p95 ms':>21} {'p99 ms':>21}"]
+    for name, row in result["latency"].items():
+        cells = [f"{c['before']:.2f}->{c['after']:.2f} ({c['change'] if c['change'] is not None else '-':>6}%)"
+                 for c in row.values()]
+        lines.append(f"{name:40} " + " ".join(f"{cell:>21}" for cell in cells))
+    lines.append(f"{len(result['status_changes'])} requests changed status, "
+                 f"{result['missing']} not replayed")
+    lines.extend(f"  #{c['seq']} {c['endpoint']}: {c['before']} -> {c['after']}"
+                 for c in result["status_changes"][:20])
+    return "\n".join(lines)
+
+def use_sqlite_stand_in(path, schedule=None):
+    """
+    Point the application at a SQLite database file with the schema, optionally loading
+    flights from a schedule file, instead of MySQL.
+    """
+    # pylint: disable=import-outside-toplevel
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    import database.database
+    from database.base import Base
+    from database.sharding import ShardRouter
+    from utils.flight_import import detect_format, import_stream
+
+    engine = create_engine(f"sqlite:///{path}",
+                           connect_args={"check_same_thread": False, "timeout": 60})
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(connection, _record):
+        connection.execute("PRAGMA journal_mode=WAL")
+
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    database.database.SessionLocal = session_factory
+    database.database.router = ShardRouter([session_factory])
+    if schedule:
+        with open(schedule, "rb") as file:
+            import_stream(file, detect_format(schedule))
+
+def _write_results(path, results):
+    with open(path, "w", encoding="utf-8") as file:
+        for result in results:
+            file.write(json.dumps(result) + "\n")
+
+def main(argv=None):
+    """
+    Replay a capture, or report on and compare results files.
+    """
+    parser = argparse.ArgumentParser(description="Replay captured traffic and compare runs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay = commands.add_parser("replay")
+    replay.add_argument("capture")
+    target = replay.add_mutually_exclusive_group(required=True)
+    target.add_argument("--base-url", help="Replay against a running server")
+    target.add_argument("--sqlite", help="Replay in-process against this SQLite database file")
+    replay.add_argument("--schedule", help="Flight schedule to load into the SQLite database")
+    replay.add_argument("--speed", type=float, default=1.0,
+                        help="Replay this many times faster (0: no pacing)")
+    replay.add_argument("--threads", type=int, default=8)
+    replay.add_argument("--include-streams", action="store_true")
+    replay.add_argument("--out", help="Write one result per request to this JSONL file")
+    report = commands.add_parser("report")
+    report.add_argument("results")
+    report.add_argument("--baseline", help="Capture or results file to compare with")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.command == "report":
+        results = load_records(args.results)
+        print(format_summary(summarize(results)))
+        if args.baseline:
+            print(format_diff(diff(load_records(args.baseline), results)))
+        return 0
+
+    if args.sqlite:
+        use_sqlite_stand_in(args.sqlite, args.schedule)
+        from app import app  # pylint: disable=import-outside-toplevel
+        replay_target = FlaskTarget(app)
+    else:
+        replay_target = HttpTarget(args.base_url)
+    records = load_records(args.capture)
+    started = time.perf_counter()
+    results = Replayer(replay_target, args.speed, args.threads, args.include_streams).run(records)
+    logging.info("MYLOG: Replayed %d of %d requests in %.1fs", len(results), len(records),
+                 time.perf_counter() - started)
+    if args.out:
+        _write_results(args.out, results)
+    print(format_summary(summarize(results)))
+    print(format_diff(diff(records, results)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())